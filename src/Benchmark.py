@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Benchmarks of Ector's hot paths.
+
+- tokens: throughput of the tokenizer (Entry.getTokens), in tokens per
+  second, on the sentences of corpus files (one entry per line) or on
+  synthetic sentences.
+- network: latencies of the propagations (fastPropagateActivations,
+  frontierPropagateActivations and propagateActivations) on a synthetic
+  Concept Network, whose links follow a Zipfian distribution of the nodes.
+- dialogue: latencies of the steps of a dialogue (addEntry, propagate,
+  generateSentence), on synthetic entries made of Zipfian tokens, or on
+  the entries replayed from Ector's logs.
+
+The latencies are given in milliseconds (count, mean, p50, p95, p99 and
+max), with the throughput of each operation (per second) and the peak
+memory of the process; they can be written in a JSON file, to compare
+several revisions.
+"""
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+from ConceptNetwork import ConceptNetwork, Node, SparseState, AliasSampler
+from Ector import Ector, ENCODING
+from Entry import Entry, getTokens
+from Server import LatencyStats
+import json
+import platform
+import random
+import sys
+import time
+try:
+    import resource
+except ImportError:
+    resource = None
+
+WORDS = ["hello", "you", "how", "are", "I", "am", "fine", "the", "bot",
+         "@bot@", "@user@", "it's", "12:30", u"ça", "va", "very", "good"]
+PUNCTUATION = [",", ".", "!", "?", "...", ":)", ":-(", "XD", "(", ")"]
+
+
+def getSyntheticSentences(nb, rng=None):
+    """Get nb synthetic sentences, made of words, punctuation and smileys
+
+    rng: random number generator (random.Random)"""
+    rng = rng or random.Random(0)
+    sentences = []
+    for i in range(nb):
+        tokens = [rng.choice(rng.random() < 0.8 and WORDS or PUNCTUATION)
+                  for j in range(rng.randint(3, 20))]
+        sentences.append(u" ".join(tokens))
+    return sentences
+
+
+def getCorpusSentences(filenames, encoding="utf-8"):
+    "Get the sentences of the entries of corpus files (one entry per line)"
+    sentences = []
+    for filename in filenames:
+        f = open(filename, "r")
+        for line in f:
+            entry = unicode(line.strip(), encoding, "replace")
+            if entry:
+                sentences.extend(Entry(entry).getSentences())
+        f.close()
+    return sentences
+
+
+def getZipfianSampler(items, exponent=1.0, rng=None):
+    """Get an AliasSampler choosing the items with a Zipfian distribution:
+    the weight of the item of rank r (from 1) is 1 / r^exponent"""
+    return AliasSampler([(item, 1.0 / ((rank + 1) ** exponent))
+                         for rank, item in enumerate(items)], rng=rng)
+
+
+def getZipfianEntries(nb, vocabulary=1000, exponent=1.0, rng=None):
+    """Get nb synthetic entries, made of one to three sentences of tokens
+    of a vocabulary following a Zipfian distribution
+
+    rng: random number generator (random.Random)"""
+    rng = rng or random.Random(0)
+    words = getZipfianSampler(["w%d" % i for i in range(vocabulary)],
+                              exponent, rng)
+    entries = []
+    for i in range(nb):
+        sentences = []
+        for j in range(rng.randint(1, 3)):
+            tokens = [words.choose() for k in range(rng.randint(3, 15))]
+            sentences.append(u" ".join(tokens) + rng.choice(u".?!"))
+        entries.append(u" ".join(sentences))
+    return entries
+
+
+def getLogEntries(filenames, botname="Ector", encoding=ENCODING or "utf-8"):
+    """Get the entries of Ector's logs (date, utterer and entry, separated
+    by tabs), but the bot's ones
+
+    Return a list of tuples (utterer, entry)"""
+    entries = []
+    for filename in filenames:
+        f = open(filename, "r")
+        for line in f:
+            fields = line.rstrip("\r\n").split("\t", 2)
+            if len(fields) < 3 or fields[1] == botname:
+                continue
+            entry = unicode(fields[2].strip(), encoding, "replace")
+            if entry:
+                entries.append((unicode(fields[1], encoding, "replace"), entry))
+        f.close()
+    return entries
+
+
+def buildNetwork(nbNodes, nbLinks, exponent=1.0, rng=None):
+    """Build a Concept Network of nbNodes nodes, and about nbLinks links
+    between nodes chosen with a Zipfian distribution (the same link may be
+    chosen several times: its co-occurrence is incremented)
+
+    The occurrence of a node is the number of links coming from it.
+
+    rng: random number generator (random.Random)"""
+    rng = rng or random.Random(0)
+    nodes = getZipfianSampler(range(nbNodes), exponent, rng)
+    links = [(nodes.choose(), nodes.choose()) for i in range(nbLinks)]
+    occ = [0] * nbNodes
+    for i, j in links:
+        occ[i] += 1
+    cn = ConceptNetwork()
+    for i in range(nbNodes):
+        cn.addNode(Node(u"n%d" % i, max(occ[i], 1)))
+    for i, j in links:
+        cn.addLink(cn.getNode(u"n%d" % i), cn.getNode(u"n%d" % j))
+    return cn
+
+
+def getPeakMemory():
+    "Get the peak memory of the process (in kB), or None when unknown"
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def getOperationStats(latencies):
+    """Get the statistics of the latencies of an operation (see
+    LatencyStats.getStats), with its throughput (perSecond)"""
+    stats = latencies.getStats()
+    stats["perSecond"] = latencies.total and latencies.count / latencies.total or 0
+    return stats
+
+
+def benchmarkNetwork(cn, nbActivated=100, repeat=10, slow=False, rng=None):
+    """Measure the latencies of the propagations in cn.
+
+    Each propagation method runs repeat times on its own state, where
+    nbActivated nodes are fully activated first.
+
+    slow: measure propagateActivations too (it walks all the nodes)
+
+    Return a dictionary (operation name -> statistics)"""
+    rng = rng or random.Random(0)
+    activated = rng.sample(cn.node.keys(), min(nbActivated, len(cn.node)))
+    methods = [("fastPropagateActivations",
+                lambda state: cn.fastPropagateActivations(state)),
+               ("frontierPropagateActivations",
+                lambda state: cn.frontierPropagateActivations(state, epsilon=1))]
+    if slow:
+        methods.append(("propagateActivations",
+                        lambda state: cn.propagateActivations(state, 2)))
+    operations = {}
+    for name, propagate in methods:
+        state = SparseState(name)
+        for symbol, typeName in activated:
+            state.fullyActivate(symbol, typeName)
+        latencies = LatencyStats(None)
+        for i in range(repeat):
+            start = time.time()
+            propagate(state)
+            latencies.add(time.time() - start)
+        operations[name] = getOperationStats(latencies)
+    return operations
+
+
+def benchmarkDialogue(entries, botname="Ector", rng=None):
+    """Measure the latencies of the steps of a dialogue with Ector: for
+    each entry, addEntry, propagate (cleaning the state and propagating
+    twice) and generateSentence.
+
+    entries: list of tuples (utterer, entry)
+
+    Return a dictionary (operation name -> statistics)"""
+    ector = Ector(botname, entries and entries[0][0] or "User",
+                  cn=ConceptNetwork())
+    ector.rng = rng or random.Random(0)
+    steps = [("addEntry", None), ("propagate", None),
+             ("generateSentence", None)]
+    latencies = dict([(name, LatencyStats(None)) for name, _ in steps])
+    for username, entry in entries:
+        if username not in ector.cn.state:
+            ector.cn.addState(SparseState(username))
+        ector.setUser(username)
+        start = time.time()
+        ector.addEntry(entry)
+        latencies["addEntry"].add(time.time() - start)
+        start = time.time()
+        ector.cleanState()
+        ector.propagate(2)
+        latencies["propagate"].add(time.time() - start)
+        start = time.time()
+        ector.generateSentence()
+        latencies["generateSentence"].add(time.time() - start)
+    return dict([(name, getOperationStats(stats))
+                 for name, stats in latencies.iteritems()])
+
+
+def benchmarkTokens(sentences, tokenize=getTokens, repeat=3):
+    """Measure the throughput of tokenize on the sentences (the best of
+    repeat runs)
+
+    Return a dictionary (sentences, tokens, seconds, tokensPerSecond)"""
+    best = None
+    nbTokens = 0
+    for i in range(repeat):
+        start = time.time()
+        nbTokens = 0
+        for sentence in sentences:
+            nbTokens += len(tokenize(sentence))
+        duration = time.time() - start
+        if best is None or duration < best:
+            best = duration
+    return {"sentences": len(sentences),
+            "tokens": nbTokens,
+            "seconds": best,
+            "tokensPerSecond": best and nbTokens / best or 0}
+
+
+def printOperations(operations):
+    "Print the statistics of the operations"
+    print "%-30s %8s %10s %10s %10s %10s %10s" % ("operation (ms)", "count",
+                                                 "mean", "p50", "p95", "p99",
+                                                 "per second")
+    for name in sorted(operations):
+        stats = operations[name]
+        print "%-30s %8d %10.3f %10.3f %10.3f %10.3f %10.1f" % (
+            name, stats["count"], stats["mean"], stats["p50"], stats["p95"],
+            stats["p99"], stats["perSecond"])
+
+
+def main():
+    from optparse import OptionParser
+
+    usage = "usage: %prog [-b tokens|network|dialogue][-n number][-r repeat][-c][-N nodes][-K links][-z exponent][-a activated][-S][-s seed][-o output][-h] [corpus|log...]"
+    parser = OptionParser(usage=usage, version="%prog 0.3")
+    parser.add_option("-b", "--benchmark", dest="benchmark", default="tokens",
+                      choices=["tokens", "network", "dialogue"],
+                      help="benchmark to run: tokens (default), network or dialogue")
+    parser.add_option("-n", "--sentences", dest="sentences", type="int", default=10000,
+                      help="number of synthetic sentences or entries (when no corpus is given)")
+    parser.add_option("-r", "--repeat", dest="repeat", type="int", default=3,
+                      help="keep the best of REPEAT runs (tokens), or run REPEAT propagations (network)")
+    parser.add_option("-c", "--compare", action="store_true", dest="compare", default=False,
+                      help="measure the former tokenizer too (see EntryTest)")
+    parser.add_option("-N", "--nodes", dest="nodes", type="int", default=10000,
+                      help="number of nodes of the synthetic Concept Network")
+    parser.add_option("-K", "--links", dest="links", type="int", default=50000,
+                      help="number of links of the synthetic Concept Network")
+    parser.add_option("-z", "--zipf", dest="exponent", type="float", default=1.0,
+                      help="exponent of the Zipfian distribution of the nodes and tokens")
+    parser.add_option("-a", "--activated", dest="activated", type="int", default=100,
+                      help="number of nodes activated before the propagations")
+    parser.add_option("-S", "--slow", action="store_true", dest="slow", default=False,
+                      help="measure propagateActivations too")
+    parser.add_option("-s", "--seed", dest="seed", type="int", default=0,
+                      help="seed of the random number generator")
+    parser.add_option("-o", "--output", dest="output", default=None,
+                      help="write the results in the JSON file OUTPUT")
+
+    (options, args) = parser.parse_args()
+
+    rng = random.Random(options.seed)
+    results = {"benchmark": options.benchmark,
+               "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+               "python": platform.python_version(),
+               "platform": platform.platform(),
+               "parameters": {"seed": options.seed}}
+    if options.benchmark == "tokens":
+        if args:
+            sentences = getCorpusSentences(args)
+        else:
+            sentences = getSyntheticSentences(options.sentences, rng)
+        tokenizers = [("getTokens", getTokens)]
+        if options.compare:
+            from EntryTest import getMaskedTokens
+            tokenizers.append(("masks", getMaskedTokens))
+        results["operations"] = {}
+        for name, tokenize in tokenizers:
+            result = benchmarkTokens(sentences, tokenize, options.repeat)
+            results["operations"][name] = result
+            print "%-10s %d sentences, %d tokens in %.3f s: %.0f tokens/s" % (
+                name, result["sentences"], result["tokens"], result["seconds"],
+                result["tokensPerSecond"])
+    elif options.benchmark == "network":
+        results["parameters"].update({"nodes": options.nodes,
+                                      "links": options.links,
+                                      "exponent": options.exponent,
+                                      "activated": options.activated,
+                                      "repeat": options.repeat})
+        start = time.time()
+        cn = buildNetwork(options.nodes, options.links, options.exponent, rng)
+        results["buildSeconds"] = time.time() - start
+        results["network"] = {"nodes": len(cn.node), "links": len(cn.link)}
+        print "%d nodes, %d links built in %.1f s" % (len(cn.node), len(cn.link),
+                                                     results["buildSeconds"])
+        results["operations"] = benchmarkNetwork(cn, options.activated,
+                                                 options.repeat, options.slow,
+                                                 rng)
+        printOperations(results["operations"])
+    else:
+        if args:
+            entries = getLogEntries(args)
+            results["parameters"]["logs"] = args
+        else:
+            entries = [("User", entry) for entry in
+                       getZipfianEntries(options.sentences, options.nodes,
+                                         options.exponent, rng)]
+            results["parameters"].update({"entries": options.sentences,
+                                          "vocabulary": options.nodes,
+                                          "exponent": options.exponent})
+        start = time.time()
+        results["operations"] = benchmarkDialogue(entries, rng=rng)
+        duration = time.time() - start
+        results["entriesPerSecond"] = duration and len(entries) / duration or 0
+        printOperations(results["operations"])
+        print "%d entries in %.1f s: %.1f entries/s" % (
+            len(entries), duration, results["entriesPerSecond"])
+    results["peakMemoryKB"] = getPeakMemory()
+    if results["peakMemoryKB"] is not None:
+        print "peak memory: %d kB" % results["peakMemoryKB"]
+    if options.output:
+        f = open(options.output, "w")
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Unit test for Benchmark.py
+
+Test the workloads of the benchmarks, on small sizes.
+"""
+
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+from Benchmark import *
+import os
+import tempfile
+import unittest
+
+
+class BenchmarkTest(unittest.TestCase):
+    "Test the workloads of the benchmarks"
+    def testZipfianSampler(self):
+        "The first items are the most frequent"
+        sampler = getZipfianSampler(range(10), 1.0, random.Random(0))
+        counts = [0] * 10
+        for i in range(5000):
+            counts[sampler.choose()] += 1
+        self.assertTrue(counts[0] > counts[1] > counts[9])
+
+    def testBuildNetwork(self):
+        "The synthetic network has the nodes, and at most the links asked"
+        cn = buildNetwork(50, 200, rng=random.Random(0))
+        self.assertEqual(50, len(cn.node))
+        self.assertTrue(0 < len(cn.link) <= 200)
+        for link in cn.link.itervalues():
+            self.assertTrue(link.getWeight() <= 1)
+
+    def testNetwork(self):
+        "The propagations are measured"
+        cn = buildNetwork(50, 200, rng=random.Random(0))
+        operations = benchmarkNetwork(cn, 5, 3, True)
+        self.assertEqual(["fastPropagateActivations",
+                          "frontierPropagateActivations",
+                          "propagateActivations"], sorted(operations))
+        for stats in operations.itervalues():
+            self.assertEqual(3, stats["count"])
+            self.assertTrue(stats["p50"] <= stats["max"])
+
+    def testDialogue(self):
+        "The entries of a log are replayed"
+        fd, filename = tempfile.mkstemp()
+        os.write(fd, "2008/11/11 - 10:00:00\tBill\tHello Ector.\n"
+                     "2008/11/11 - 10:00:01\tEctor\tHello Bill.\n"
+                     "not a log line\n"
+                     "2008/11/11 - 10:00:05\tJoe\tHow are you?\n")
+        os.close(fd)
+        try:
+            entries = getLogEntries([filename], encoding="utf-8")
+        finally:
+            os.remove(filename)
+        self.assertEqual([(u"Bill", u"Hello Ector."), (u"Joe", u"How are you?")],
+                         entries)
+        entries += [("User", entry) for entry in getZipfianEntries(3, 20)]
+        operations = benchmarkDialogue(entries)
+        self.assertEqual(["addEntry", "generateSentence", "propagate"],
+                         sorted(operations))
+        self.assertEqual(5, operations["addEntry"]["count"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -34,6 +34,9 @@ __copyright__ = "Copyright (c) 2008 François Parmentier"
 __license__ = "GPL"
 
 from math import log, exp
+from inspect import getmro
+from bisect import bisect_right
+import heapq
 import random
 import time
 import pickle
@@ -44,6 +47,13 @@ import locale
 ENCODING = locale.getdefaultlocale()[1]
 DEFAULT_ENCODING = sys.getdefaultencoding()
 
+# Number of buckets of activation values of an ActivationIndex
+NB_BUCKETS = 101
+
+# Number of bits of a node id in a link key (see linkKey)
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+
 
 class ConceptNetworkError(Exception):
     pass
@@ -93,6 +103,61 @@ class ConceptNetworkDuplicateState(ConceptNetworkError):
     pass
 
 
+def linkKey(fromId, toId, labelId=None):
+    """Pack the integer ids of the nodes of a link into an integer key
+
+    The label id is stored plus one, so that 0 means there is no label"""
+    key = fromId << ID_BITS | toId
+    if labelId is not None:
+        key |= (labelId + 1) << (2 * ID_BITS)
+    return key
+
+
+def splitLinkKey(key):
+    "Get the ids (from, to, label) packed by linkKey (label may be None)"
+    labelId = (key >> (2 * ID_BITS)) - 1
+    if labelId < 0:
+        labelId = None
+    return ((key >> ID_BITS) & ID_MASK, key & ID_MASK, labelId)
+
+
+def hasTypeName(obj, strType):
+    """Tell whether the class of obj, or one of its base classes, is named strType
+
+    A compact class (see CompactNode) has the type of the class it is a
+    compact variant of."""
+    classes = getmro(obj.__class__)
+    if hasattr(obj.__class__, "compactOf"):
+        classes += getmro(obj.__class__.compactOf)
+    return strType in [cls.__name__ for cls in classes]
+
+
+def compactNetwork(cn):
+    """Copy cn into a CompactConceptNetwork.
+
+    The nodes, links, and states of the copy use the compact classes.
+    Return the copy"""
+    compactCn = CompactConceptNetwork()
+    for node in cn.node.itervalues():
+        compactCn.addNode(node)
+    for link in cn.link.itervalues():
+        compactLink = compactCn.addLink(link.fro, link.to, link.label)
+        compactLink.coOcc = link.coOcc
+    for stateId, state in cn.state.iteritems():
+        compactCn.state[stateId] = compactState(state)
+    return compactCn
+
+
+def compactState(state):
+    """Make state use CompactNodeStates, for its current and future nodes
+
+    Return the state"""
+    state.compact = True
+    for (symbol, type), nodeState in state.nodeState.items():
+        state.addNodeState(symbol, type, nodeState.compact())
+    return state
+
+
 class ConceptNetwork:
     """A ConceptNetwork is a graph of nodes and links.
 
@@ -102,22 +167,129 @@ class ConceptNetwork:
     #   (symbol, type) to a node
     # - self.state is a dictionary which associates a state id
     #   (a string) to a state
-    # - self.link is a dictionary which associates three nodes' id
-    #   (node from symbol, node from type,
-    #    node to symbol, node to type,
-    #    node label symbol, node label type) to a link
-    #   If the link has no label, None is used for label symbol and
-    #   label type.
+    # - self.nodeId is a dictionary which associates a node id
+    #   (symbol, type) to an integer id, and self.nodeById the list of
+    #   the nodes, indexed by their integer id.
+    #   Nodes only known as the destination or the label of a link get
+    #   an integer id too.
+    # - self.link is a dictionary which associates the integer ids of
+    #   three nodes (node from, node to, node label), packed by linkKey,
+    #   to a link.
+    # - self.compacted tells whether the nodes' links are LinkSets, made
+    #   of the links between the nodes of the Concept Network (older
+    #   pickled networks are compacted when loaded).
+    # - self.listeners is the list of the objects told about the nodes
+    #   and links added and removed (they are not saved).
+    # - The integer id of a node removed is not given to another node:
+    #   its place in self.nodeById is None.
+    # - self.weights is the WeightCache of the propagations (a listener).
     def __init__(self):
         self.node = {}             # (symbol,type)             -> node
-        self.link = {}             # (fromS,T,toS,T,labelS,T)  -> link
+        self.nodeId = {}           # (symbol,type)             -> integer id
+        self.nodeById = []         # integer id                -> node
+        self.link = {}             # linkKey(from,to,label)    -> link
         self.state = {}            # state id                  -> state
+        self.compacted = True
+        self.listeners = []
+        self.weights = WeightCache(self)
+
+    def __getstate__(self):
+        "Listeners are not saved"
+        state = self.__dict__.copy()
+        state.pop("listeners", None)
+        state.pop("weights", None)
+        return state
+
+    def __setstate__(self, state):
+        """Give integer ids to the nodes of networks pickled before them,
+        and compact the links of networks pickled before LinkSets"""
+        self.__dict__.update(state)
+        self.listeners = []
+        self.weights = WeightCache(self)
+        if "nodeId" not in state:
+            self.__internLinks()
+        if not state.get("compacted"):
+            self.compactLinks()
+
+    def __internLinks(self):
+        "Key self.link, which keys are nodes' symbols and types, by integer ids"
+        links = self.link
+        self.nodeId = {}
+        self.nodeById = []
+        self.link = {}
+        for node in self.node.itervalues():
+            self.internNode(node)
+        for link in links.itervalues():
+            labelId = None
+            if link.label:
+                labelId = self.internNode(link.label)
+            self.link[linkKey(self.internNode(link.fro),
+                              self.internNode(link.to), labelId)] = link
+
+    def addListener(self, listener):
+        """Add a listener, told about the changes of the Concept Network.
+
+        listener must have the methods:
+        - nodeAdded(node): called with the node given to addNode,
+        - linkAdded(nodeFrom, nodeTo, nodeLabel, coOcc): called with the
+          nodes and the co-occurrence given to addLink,
+        - nodeRemoved(node): called with the node of the Concept Network
+          removed by removeNode (after its links were removed),
+        - linkRemoved(nodeFrom, nodeTo, nodeLabel): called with the nodes
+          of the link removed by removeLink."""
+        self.listeners.append(listener)
+
+    def removeListener(self, listener):
+        "Remove a listener added by addListener"
+        self.listeners.remove(listener)
+
+    def compactLinks(self):
+        """Rebuild the links of the nodes from self.link.
+
+        Each link is attached to the nodes of the Concept Network (not to
+        copies of them), and is stored once in each LinkSet."""
+        for node in self.node.itervalues():
+            node.outgoingLinks = LinkSet()
+            node.incomingLinks = LinkSet()
+            node.labelingLinks = LinkSet()
+        for key, link in self.link.iteritems():
+            fromId, toId, labelId = splitLinkKey(key)
+            link.fro = self.nodeById[fromId]
+            link.to = self.nodeById[toId]
+            if labelId is not None:
+                link.label = self.nodeById[labelId]
+                link.label.addLabelingLink(link)
+            link.fro.addOutgoingLink(link)
+            link.to.addIncomingLink(link)
+        self.compacted = True
+
+    def findNodeId(self, node):
+        """Get the integer id of node (or of the node of the Concept Network
+        having its symbol and type).
+
+        Return None when the node has no integer id"""
+        i = getattr(node, "id", None)
+        if i is not None and i < len(self.nodeById) and self.nodeById[i] is node:
+            return i
+        return self.nodeId.get((node.getSymbol(), node.getTypeName()))
+
+    def internNode(self, node):
+        """Get the integer id of node, giving one to it if needed.
+
+        The node is not added to the Concept Network."""
+        i = self.findNodeId(node)
+        if i is None:
+            i = len(self.nodeById)
+            self.nodeId[(node.getSymbol(), node.getTypeName())] = i
+            self.nodeById.append(node)
+            node.id = i
+        return i
 
     def __hasType(self, obj, strType):
-        "Verify strType of the obj"
+        "Verify strType of the obj (which may derive from strType)"
         if not obj:
             raise ConceptNetworkLackingParameter("There lacks a " + strType + "!")
-        if obj.__class__.__name__ != strType:
+        if not hasTypeName(obj, strType):
             raise ConceptNetworkBadType("Not a " + strType + "!")
 
     def getNode(self, symbol, type="basic"):
@@ -130,8 +302,17 @@ class ConceptNetwork:
         except:
             raise ConceptNetworkUnknownNode("Unknown node: \"" + symbol + "\" (" + type + ")")
 
+    def hasNode(self, node):
+        "Tell whether node is a node of the Concept Network (not removed)"
+        return self.node.get((node.getSymbol(), node.getTypeName())) is node
+
     def addNode(self, node):
-        "Add a Node to the Concept Network"
+        """Add a Node to the Concept Network
+
+        If a node with the same symbol and type already exists, node is
+        added to it.
+
+        Return the node of the Concept Network"""
         symbol = node.getSymbol()
         type = node.getTypeName()
         if (symbol, type) in self.node:
@@ -139,6 +320,38 @@ class ConceptNetwork:
             self.node[(symbol, type)].addNode(node)
         else:
             self.node[(symbol, type)] = node
+            # The node may have been known as the destination of a link
+            i = self.internNode(node)
+            self.nodeById[i] = node
+            node.id = i
+        for listener in self.listeners:
+            listener.nodeAdded(node)
+        return self.node[(symbol, type)]
+
+    def removeNode(self, node):
+        """Remove the node having the symbol and type of node from the
+        Concept Network, with its links (outgoing, incoming, and labeled
+        by it), and its node states in the states of the Concept Network.
+
+        Return the node removed"""
+        key = (node.getSymbol(), node.getTypeName())
+        node = self.getNode(*key)
+        links = {}
+        for nodeLinks in (node.outgoingLinks, node.incomingLinks,
+                          node.labelingLinks):
+            for link in nodeLinks:
+                links[self.getLinkKey(link)] = link
+        for link in links.itervalues():
+            self.removeLink(link.getNodeFrom(), link.getNodeTo(),
+                            link.getNodeLabel())
+        for state in self.state.itervalues():
+            if key in state.nodeState:
+                state.removeNodeState(*key)
+        for listener in self.listeners:
+            listener.nodeRemoved(node)
+        del self.node[key]
+        self.nodeById[self.nodeId.pop(key)] = None
+        return node
 
     def showNodes(self):
         "Show all the nodes in the Concept Network"
@@ -147,23 +360,32 @@ class ConceptNetwork:
 
     def showLinks(self, stateId=None):
         "Show all the links in the Concept Network"
-        for (froS, froT, toS, toT, labelS, labelT) in self.link:
-            fro = self.getNode(froS, froT)
-            to = self.getNode(toS, toT)
-            label = labelS and self.getNode(labelS, labelT) \
-                            or None
-            link = self.getLink(fro, to, label)
-            state = stateId and self.getState(stateId) or None
+        state = stateId and self.getState(stateId) or None
+        for link in self.link.itervalues():
             link.show(state)
 
     def getLink(self, nodeFrom, nodeTo, nodeLabel=None):
         "Get the link going from nodeFrom to nodeTo, through nodeLabel (if it exists)"
         if not nodeFrom or not nodeTo:
             raise ConceptNetworkIncompleteLink("There lacks at least one node!")
-        return self.link[(nodeFrom.getSymbol(),  nodeFrom.getTypeName(),
-                          nodeTo.getSymbol(),    nodeTo.getTypeName(),
-                          nodeLabel and nodeLabel.getSymbol() or nodeLabel,
-                          nodeLabel and nodeLabel.getTypeName() or nodeLabel)]
+        fromId = self.findNodeId(nodeFrom)
+        toId = self.findNodeId(nodeTo)
+        labelId = None
+        if nodeLabel:
+            labelId = self.findNodeId(nodeLabel)
+        if fromId is None or toId is None or (nodeLabel and labelId is None):
+            # A node never linked in the Concept Network has no link
+            raise KeyError((nodeFrom.getSymbol(), nodeTo.getSymbol(),
+                            nodeLabel and nodeLabel.getSymbol()))
+        return self.link[linkKey(fromId, toId, labelId)]
+
+    def getLinkKey(self, link):
+        "Get the key of link in self.link (see linkKey)"
+        labelId = None
+        if link.getNodeLabel():
+            labelId = self.findNodeId(link.getNodeLabel())
+        return linkKey(self.findNodeId(link.getNodeFrom()),
+                       self.findNodeId(link.getNodeTo()), labelId)
 
     def getLinksFrom(self, nodeFrom):
         """Get links that go from nodeFrom
@@ -187,31 +409,64 @@ class ConceptNetwork:
            nodeTo is a Node"""
         return [link for link in nodeTo.incomingLinks]
 
-    def addLink(self, nodeFrom, nodeTo, nodeLabel=None):
+    def addLink(self, nodeFrom, nodeTo, nodeLabel=None, coOcc=1):
         """Add a directional link to the ConceptNetwork.
 
-        If the link already exists, its co-occurrence is incremented.
+        If the link already exists, its co-occurrence is incremented (by
+        coOcc).
         If there is no label node, None should be passed as labelNode.
 
         Return the link"""
         if not nodeFrom or not nodeTo:
             raise ConceptNetworkIncompleteLink("There lacks at least one node!")
-        newLink = (nodeFrom.getSymbol(),     nodeFrom.getTypeName(),
-                   nodeTo.getSymbol(),       nodeTo.getTypeName(),
-                   nodeLabel and nodeLabel.getSymbol() or nodeLabel,
-                   nodeLabel and nodeLabel.getTypeName() or nodeLabel)
+        fromId = self.internNode(nodeFrom)
+        toId = self.internNode(nodeTo)
+        labelId = None
+        if nodeLabel:
+            labelId = self.internNode(nodeLabel)
+        newLink = linkKey(fromId, toId, labelId)
 
         if newLink in self.link:
-            self.link[newLink].incrementCoOcc()
+            link = self.link[newLink]
+            link.incrementCoOcc(coOcc)
         else:
-            self.link[newLink] = Link(nodeFrom, nodeTo, nodeLabel)
-        link = self.link[newLink]
-        nodeFrom.addOutgoingLink(link)
-        nodeTo.addIncomingLink(link)
-        if nodeLabel:
-            nodeLabel.addLabelingLink(link)
+            # Link the nodes of the Concept Network, not their copies
+            nodeFrom = self.nodeById[fromId]
+            nodeTo = self.nodeById[toId]
+            if nodeLabel:
+                nodeLabel = self.nodeById[labelId]
+            link = self.createLink(nodeFrom, nodeTo, nodeLabel, coOcc)
+            self.link[newLink] = link
+            nodeFrom.addOutgoingLink(link)
+            nodeTo.addIncomingLink(link)
+            if nodeLabel:
+                nodeLabel.addLabelingLink(link)
+        for listener in self.listeners:
+            listener.linkAdded(nodeFrom, nodeTo, nodeLabel, coOcc)
         return link
 
+    def removeLink(self, nodeFrom, nodeTo, nodeLabel=None):
+        """Remove the link going from nodeFrom to nodeTo, through nodeLabel
+        from the Concept Network (and from the links of its nodes).
+
+        The nodes are not removed, even when they have no link left.
+
+        Return the link removed"""
+        link = self.getLink(nodeFrom, nodeTo, nodeLabel)
+        del self.link[self.getLinkKey(link)]
+        link.getNodeFrom().removeOutgoingLink(link)
+        link.getNodeTo().removeIncomingLink(link)
+        if link.getNodeLabel():
+            link.getNodeLabel().removeLabelingLink(link)
+        for listener in self.listeners:
+            listener.linkRemoved(link.getNodeFrom(), link.getNodeTo(),
+                                 link.getNodeLabel())
+        return link
+
+    def createLink(self, nodeFrom, nodeTo, nodeLabel, coOcc=1):
+        "Create a new link (not added to the Concept Network)"
+        return Link(nodeFrom, nodeTo, nodeLabel, coOcc)
+
     def addBidirectionalLink(self, node1, node2, nodeLabel=None):
         """Add a directional link to the ConceptNetwork.
 
@@ -279,7 +534,8 @@ class ConceptNetwork:
                 newAV = 100
             if newAV < 0:
                 newAV = 0
-            nodeState.setActivationValue(newAV)
+            state.setNodeStateActivationValue(nodeState, newAV,
+                                              symbol, typeName)
 
     def fastPropagateActivations(self, state,
                                  normalNumberComingLinks=2,
@@ -292,7 +548,10 @@ class ConceptNetwork:
         state: in which activation values are found and changed
         normalNumberComingLinks "normal" number of links for the
                             whole influence to be taken into account
-        memoryPerf: memory performance (the higher, the better)"""
+        memoryPerf: memory performance (the higher, the better)
+
+        Return a tuple (number of nodes updated, number of links
+        traversed)"""
         influenceValues = {}    # (symbol, type)    => influence value
         influenceNb = {}    # (symbol, type)    => influence nb
         for _, nodeState in state.nodeState.iteritems():
@@ -303,29 +562,87 @@ class ConceptNetwork:
         for (symbol, typeName), node in self.node.iteritems():
             if symbol:
                 ov = state.getNodeOldActivationValue(symbol, typeName)
-                #links = self.getLinksFrom(node)
-                links = node.outgoingLinks
-                for link in links:
-                    weight = link.getWeight(state)
-                    nodeTo = link.getNodeTo()
-                    linkSymbol = nodeTo.getSymbol()
-                    linkTypeName = nodeTo.getTypeName()
-                    # inflNb = linkSymbol in influenceNb and \
-                    #          influenceNb[(linkSymbol, linkTypeName)] \
-                    #          or 0
-                    infl = linkSymbol in influenceValues and \
-                           influenceValues[(linkSymbol, linkTypeName)] \
-                           or 0
-                    infl += 0.5 + ov * weight
-                    influenceValues[(linkSymbol, linkTypeName)] = infl
-                    influenceNb[(linkSymbol, linkTypeName)] =   \
-                                (linkSymbol in influenceNb and \
-                                 influenceNb[(linkSymbol, linkTypeName)] or 0) \
-                                 + 1
-
-        ## For all nodes in the state ##
-        influenceValueKeys = influenceValues.keys()
-        for (symbol, typeName) in state.nodeState:
+                self.__addInfluences(state, node, ov,
+                                     influenceValues, influenceNb)
+
+        ## For all nodes in the state, and the influenced ones ##
+        # (states may not hold the non-activated nodes)
+        nodeIds = set(state.nodeState)
+        nodeIds.update(nodeId for nodeId in influenceValues
+                       if nodeId[0] and nodeId in self.node)
+        self.__updateActivations(state, nodeIds, influenceValues, influenceNb,
+                                 normalNumberComingLinks, memoryPerf)
+        return len(nodeIds), sum(influenceNb.itervalues())
+
+    def frontierPropagateActivations(self, state,
+                                     normalNumberComingLinks=2,
+                                     memoryPerf=100,
+                                     epsilon=1):
+        """Propagates activation values within state, from its activated
+        nodes only.
+
+        Unlike fastPropagateActivations, only the nodes of the state having
+        an old activation value give influence (along their outgoing
+        links), so that the time taken depends on the activated
+        neighbourhood, not on the size of the Concept Network.
+        Nodes whose new activation value is below epsilon are removed
+        from the state.
+
+        state: in which activation values are found and changed
+        normalNumberComingLinks "normal" number of links for the
+                            whole influence to be taken into account
+        memoryPerf: memory performance (the higher, the better)
+        epsilon:    minimum activation value of the nodes kept in state
+
+        Return a tuple (number of nodes updated, number of links
+        traversed)"""
+        influenceValues = {}    # (symbol, type)    => influence value
+        influenceNb = {}    # (symbol, type)    => influence nb
+        for _, nodeState in state.nodeState.iteritems():
+            nodeState.ageActivationValues()
+
+        ## Fill influence table, from the activated nodes ##
+        for (symbol, typeName), nodeState in state.nodeState.items():
+            ov = nodeState.getOldActivationValue()
+            if symbol and ov:
+                node = self.getNode(symbol, typeName)
+                self.__addInfluences(state, node, ov,
+                                     influenceValues, influenceNb)
+
+        ## For all nodes in the state, and the influenced ones ##
+        nodeIds = set(state.nodeState)
+        nodeIds.update(nodeId for nodeId in influenceValues
+                       if nodeId in self.node)
+        self.__updateActivations(state, nodeIds, influenceValues, influenceNb,
+                                 normalNumberComingLinks, memoryPerf, epsilon)
+        return len(nodeIds), sum(influenceNb.itervalues())
+
+    def __addInfluences(self, state, node, ov, influenceValues, influenceNb):
+        """Add the influence of node to the nodes its outgoing links go to
+
+        The weights of the labeled links use the old activation values of
+        their labels (the activation values when the propagation began).
+
+        ov: old activation value of node"""
+        for linkId, weight, labelId in self.weights.getWeights(node):
+            if labelId is not None:
+                labelState = state.nodeState.get(labelId)
+                if labelState is not None:
+                    weight += (1 - weight) * \
+                              labelState.getOldActivationValue() / 100
+            infl = influenceValues.get(linkId, 0)
+            infl += 0.5 + ov * weight
+            influenceValues[linkId] = infl
+            influenceNb[linkId] = influenceNb.get(linkId, 0) + 1
+
+    def __updateActivations(self, state, nodeIds, influenceValues, influenceNb,
+                            normalNumberComingLinks, memoryPerf,
+                            epsilon=None):
+        """Compute the new activation values of the nodes nodeIds
+
+        When epsilon is given, the nodes whose new activation value is
+        lower than epsilon are removed from the state."""
+        for (symbol, typeName) in nodeIds:
             nodeState = state.getNodeState(symbol, typeName)
             oldAV = nodeState.getOldActivationValue()
             node = self.getNode(symbol, typeName)
@@ -333,7 +650,7 @@ class ConceptNetwork:
             decay = node.getDecay()
             minusAge = 200 / (1 + exp(-age / memoryPerf)) - 100
             # If this node is not influenced at all
-            if not (symbol, typeName) in influenceValueKeys:
+            if not (symbol, typeName) in influenceValues:
                 newAV = oldAV - decay * oldAV / 100 - minusAge
             # If this node receives influence
             else:
@@ -349,7 +666,11 @@ class ConceptNetwork:
                 newAV = 100
             if newAV < 0:
                 newAV = 0
-            nodeState.setActivationValue(newAV)
+            if epsilon is not None and newAV < epsilon:
+                state.removeNodeState(symbol, typeName)
+            else:
+                state.setNodeStateActivationValue(nodeState, newAV,
+                                                  symbol, typeName)
 
     def dump(self, file, protocol=0):
         """Dump the Concept Network in the file
@@ -405,9 +726,17 @@ class Node:
     def __init__(self, symbol, occ=1):
         self.symbol = symbol
         self.occ = occ
-        self.outgoingLinks = []
-        self.incomingLinks = []
-        self.labelingLinks = []
+        self.outgoingLinks = LinkSet()
+        self.incomingLinks = LinkSet()
+        self.labelingLinks = LinkSet()
+
+    def __setstate__(self, state):
+        "Convert the lists of links of older pickled nodes into LinkSets"
+        self.__dict__.update(state)
+        for name in ("outgoingLinks", "incomingLinks", "labelingLinks"):
+            links = getattr(self, name)
+            if not isinstance(links, LinkSet):
+                setattr(self, name, LinkSet(links))
 
     def incrementOcc(self):
         self.occ = self.occ + 1
@@ -437,19 +766,37 @@ class Node:
         """Add an outgoing link.
 
         Should not be called by another class than ConceptNetwork."""
-        self.outgoingLinks += [link]
+        self.outgoingLinks.add(link)
 
     def addIncomingLink(self, link):
         """Add an incoming link
 
         Should not be called by another class than ConceptNetwork."""
-        self.incomingLinks += [link]
+        self.incomingLinks.add(link)
 
     def addLabelingLink(self, link):
         """Add an labeling link
 
         Should not be called by another class than ConceptNetwork."""
-        self.labelingLinks += [link]
+        self.labelingLinks.add(link)
+
+    def removeOutgoingLink(self, link):
+        """Remove an outgoing link.
+
+        Should not be called by another class than ConceptNetwork."""
+        self.outgoingLinks.remove(link)
+
+    def removeIncomingLink(self, link):
+        """Remove an incoming link.
+
+        Should not be called by another class than ConceptNetwork."""
+        self.incomingLinks.remove(link)
+
+    def removeLabelingLink(self, link):
+        """Remove a labeling link.
+
+        Should not be called by another class than ConceptNetwork."""
+        self.labelingLinks.remove(link)
 
     def show(self):
         """Display the node"""
@@ -457,6 +804,10 @@ class Node:
                                self.getTypeName(),
                                self.getOcc())
 
+    def compact(self):
+        "Get a compact copy of the node, without its links (see CompactNode)"
+        return CompactNode(self.symbol, self.occ)
+
 
 class Link:
     """Type of the a Concept Network node
@@ -478,9 +829,9 @@ class Link:
         self.to = nodeTo
         self.label = nodeLabel
 
-    def incrementCoOcc(self):
-        "Increment the co-occurrence of the link by 1"
-        self.coOcc = self.coOcc + 1
+    def incrementCoOcc(self, increment=1):
+        "Increment the co-occurrence of the link by increment (1 by default)"
+        self.coOcc = self.coOcc + increment
 
     def getCoOcc(self):
         return self.coOcc
@@ -488,14 +839,16 @@ class Link:
     def getWeight(self, state=None):
         """Compute the weight of the link, and return it
 
-        state: state of the concept network used to compute the weight"""
-        labelAV = None
+        state: state of the concept network used to compute the weight
+               (reading the activation value of the label creates no
+               NodeState)"""
         occ = self.fro.getOcc()
         weight = float(self.coOcc) / occ
         if self.label and state:
-            symbol = self.label.getSymbol()
-            labelAV = state.getNodeActivationValue(symbol)
-            weight += (1 - weight) * labelAV / 100
+            labelState = state.nodeState.get((self.label.getSymbol(),
+                                              self.label.getTypeName()))
+            if labelState is not None:
+                weight += (1 - weight) * labelState.getActivationValue() / 100
         return weight
 
     def getNodeFrom(self):
@@ -527,6 +880,131 @@ class Link:
                                                  self.to.getSymbol().encode(ENCODING))
 
 
+class WeightCache:
+    """Weights of the outgoing links of the nodes of a Concept Network,
+    without their labels (co-occurrence of the link divided by the
+    occurrence of the node), used by the propagations.
+
+    The weights of a node are computed again when its occurrence has
+    changed, and after a link from it was added or removed (the cache is
+    a listener of the Concept Network). When more than capacity nodes have weights,
+    the cache is emptied.
+    """
+    def __init__(self, cn, capacity=100000):
+        self.cn = cn
+        self.capacity = capacity
+        self.weights = {}   # node id -> (occ, [(to id, weight, label id)])
+        self.hits = 0
+        self.misses = 0
+        cn.addListener(self)
+
+    def getWeights(self, node):
+        """Get the weights of the outgoing links of node
+
+        Return a list of tuples ((symbol, type) of the node to, weight,
+        (symbol, type) of the label or None)"""
+        occ = node.getOcc()
+        nodeId = self.cn.findNodeId(node)
+        entry = self.weights.get(nodeId)
+        if entry is not None and entry[0] == occ:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        weights = []
+        for link in node.outgoingLinks:
+            nodeTo = link.getNodeTo()
+            nodeLabel = link.getNodeLabel()
+            labelId = None
+            if nodeLabel:
+                labelId = (nodeLabel.getSymbol(), nodeLabel.getTypeName())
+            weights.append(((nodeTo.getSymbol(), nodeTo.getTypeName()),
+                            float(link.getCoOcc()) / occ, labelId))
+        if nodeId is not None:
+            if len(self.weights) >= self.capacity:
+                self.weights.clear()
+            self.weights[nodeId] = (occ, weights)
+        return weights
+
+    def nodeAdded(self, node):
+        "The occurrence of a node is checked by getWeights"
+        pass
+
+    def linkAdded(self, nodeFrom, nodeTo, nodeLabel, coOcc):
+        "Remove the weights of the node the link comes from"
+        self.weights.pop(self.cn.findNodeId(nodeFrom), None)
+
+    def nodeRemoved(self, node):
+        "Remove the weights of the node"
+        self.weights.pop(self.cn.findNodeId(node), None)
+
+    def linkRemoved(self, nodeFrom, nodeTo, nodeLabel):
+        "Remove the weights of the node the link comes from"
+        self.weights.pop(self.cn.findNodeId(nodeFrom), None)
+
+    def clear(self):
+        "Remove all the weights"
+        self.weights.clear()
+
+    def getStats(self):
+        """Get the statistics of the cache
+
+        Return a dictionary (nodes, hits, misses, hitRate)"""
+        lookups = self.hits + self.misses
+        return {"nodes": len(self.weights),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": lookups and float(self.hits) / lookups or 0.0}
+
+
+class LinkSet:
+    """An ordered set of links.
+
+    Each link is stored once, whatever the number of times it is added.
+    Adding a link, and checking whether a link is in the set are O(1).
+    Links are iterated in the order they were added.
+    """
+    def __init__(self, links=()):
+        self.links = []            # links, in insertion order
+        self.position = {}         # link -> position in self.links
+        for link in links:
+            self.add(link)
+
+    def __getstate__(self):
+        return self.links
+
+    def __setstate__(self, links):
+        self.__init__(links)
+
+    def add(self, link):
+        """Add the link, if it is not already in the set.
+
+        Return True when the link was added"""
+        if link in self.position:
+            return False
+        self.position[link] = len(self.links)
+        self.links.append(link)
+        return True
+
+    def remove(self, link):
+        """Remove the link from the set
+
+        The last link of the set takes its place."""
+        i = self.position.pop(link)
+        last = self.links.pop()
+        if last is not link:
+            self.links[i] = last
+            self.position[last] = i
+
+    def __contains__(self, link):
+        return link in self.position
+
+    def __iter__(self):
+        return iter(self.links)
+
+    def __len__(self):
+        return len(self.links)
+
+
 class State:
     """   A ConceptNetwork.State is the state of each activated nodes.
 
@@ -538,22 +1016,44 @@ class State:
 
     The State keeps the link between a node's symbol and typeName to its
     NodeState.
+
+    When compact is True, the NodeStates created are CompactNodeStates.
     """
+    compact = False
 
     def __init__(self, stateId):
         self.id = stateId
         self.nodeState = {}         # (node symbol, node type) -> node state
 
+    def createNodeState(self):
+        "Create a NodeState, for a node getting in the state"
+        if self.compact:
+            return CompactNodeState()
+        return NodeState()
+
     def getNodeState(self, symbol, type="basic"):
         """Get the the state of the node which symbol is given.
 
         If the state did not exist, it is created with default arguments.
         """
         if (symbol, type) not in self.nodeState:
-            self.nodeState[(symbol, type)] = NodeState()
+            self.addNodeState(symbol, type, self.createNodeState())
         self.checkNodes()
         return self.nodeState[(symbol, type)]
 
+    def addNodeState(self, symbol, type, nodeState):
+        """Add the nodeState of the node which symbol and type are given
+
+        return the node state"""
+        self.nodeState[(symbol, type)] = nodeState
+        return nodeState
+
+    def removeNodeState(self, symbol, type="basic"):
+        """Remove the state of the node which symbol and type are given
+
+        return the removed node state"""
+        return self.nodeState.pop((symbol, type))
+
     def setNodeActivationValue(self, activationValue, symbol, type="basic"):
         """Set the activationValue to the node which symbol is given in Concept Network State.
 
@@ -561,18 +1061,28 @@ class State:
         nodeState = self.getNodeState(symbol, type)
         self.__hasType(nodeState, "NodeState")
         if activationValue:
-            nodeState.setActivationValue(activationValue)
+            self.setNodeStateActivationValue(nodeState, activationValue,
+                                             symbol, type)
         else:
             # If it is deleted, the age is no more known
             age = nodeState.age
             if age > 50:
-                self.nodeState.pop((symbol, type))
+                self.removeNodeState(symbol, type)
         return nodeState
 
+    def setNodeStateActivationValue(self, nodeState, activationValue,
+                                    symbol, type="basic"):
+        """Set the activationValue of nodeState, the state of the node
+        which symbol and type are given.
+
+        The activation values of the node states of the State must be
+        changed by this method (or setNodeActivationValue)."""
+        nodeState.setActivationValue(activationValue)
+
     def getNodeActivationValue(self, symbol, type="basic"):
         """Get the activationValue of the node which symbol is given from Concept Network State."""
         nodeState = self.getNodeState(symbol, type)
-        if nodeState.__class__.__name__ != "NodeState":
+        if not hasTypeName(nodeState, "NodeState"):
             raise ConceptNetworkStateBadType(
                 "The state of \"" + symbol + "\" is not a NodeState!"
             )
@@ -622,14 +1132,28 @@ class State:
             av = self.getNodeActivationValue(symbol, typeName)
             if av > threshold:
                 if typeName in typeNames:
-                    nodes = nodes + [(node, av)]
+                    nodes.append((node, av))
         return nodes
 
+    def getMostActivatedTypedNodes(self, cn, typeNames, number):
+        """Get the number most activated nodes of cn, whose type is in
+        typeNames
+
+        Return a list of tuples (node, activation value), the most
+        activated first"""
+        nodeStates = [(nodeId, nodeState)
+                      for nodeId, nodeState in self.nodeState.iteritems()
+                      if nodeId[1] in typeNames and nodeId in cn.node]
+        return [(cn.node[nodeId], nodeState.getActivationValue())
+                for nodeId, nodeState in
+                heapq.nlargest(number, nodeStates,
+                               key=lambda item: item[1].getActivationValue())]
+
     def __hasType(self, obj, strType):
-        "Check that object has the typeName"
+        "Check that object has the typeName (or derives from it)"
         if not obj:
             raise ConceptNetworkLackingParameter("There lacks a " + strType + "!")
-        if obj.__class__.__name__ != strType:
+        if not hasTypeName(obj, strType):
             raise ConceptNetworkBadType("Not a " + strType + "!")
 
     def checkNodes(self):
@@ -656,10 +1180,265 @@ class State:
             if nodeState.getActivationValue() < 1:
                 toDel += [(symbol, type)]
         for (symbol, type) in toDel:
-            self.nodeState.pop((symbol, type))
+            self.removeNodeState(symbol, type)
 #            print "del %s, %s" % (symbol.encode(ENCODING), type.encode(ENCODING))
 
 
+def getActivationBucket(activationValue):
+    "Get the bucket of an ActivationIndex holding the activationValue"
+    return min(max(int(activationValue), 0), NB_BUCKETS - 1)
+
+
+class ActivationIndex:
+    """Index of the node states of a SparseState, by node type and by
+    activation value.
+
+    The node states of a type are kept in buckets of activation values
+    (one per integer value, from 0 to 100), so that the most activated
+    nodes of a type are found without scanning all its node states.
+    """
+    def __init__(self):
+        self.buckets = {}   # node type -> list of (node symbol -> node state)
+        self.size = {}      # node type -> number of node states
+
+    def add(self, symbol, type, nodeState):
+        "Add the nodeState of the node which symbol and type are given"
+        buckets = self.buckets.get(type)
+        if buckets is None:
+            buckets = self.buckets[type] = [{} for i in range(NB_BUCKETS)]
+            self.size[type] = 0
+        buckets[getActivationBucket(nodeState.getActivationValue())][symbol] = \
+            nodeState
+        self.size[type] += 1
+
+    def remove(self, symbol, type, nodeState):
+        "Remove the nodeState of the node which symbol and type are given"
+        buckets = self.buckets[type]
+        del buckets[getActivationBucket(nodeState.getActivationValue())][symbol]
+        self.size[type] -= 1
+        if not self.size[type]:
+            del self.buckets[type]
+            del self.size[type]
+
+    def move(self, symbol, type, nodeState, oldActivationValue):
+        """Move the nodeState, whose activation value was
+        oldActivationValue, to the bucket of its activation value"""
+        old = getActivationBucket(oldActivationValue)
+        new = getActivationBucket(nodeState.getActivationValue())
+        if old != new:
+            buckets = self.buckets[type]
+            del buckets[old][symbol]
+            buckets[new][symbol] = nodeState
+
+    def getTypedBuckets(self, typeNames):
+        "Get the list of tuples (type, buckets) of the types in typeNames"
+        return [(typeName, buckets)
+                for typeName, buckets in self.buckets.iteritems()
+                if typeName in typeNames]
+
+    def iterNodeStates(self, typeNames, minimum=0):
+        """Iterate over the node states of the types in typeNames, from the
+        bucket of the highest activation values down to the bucket minimum
+
+        Yield tuples ((symbol, type), node state)"""
+        typedBuckets = self.getTypedBuckets(typeNames)
+        for i in xrange(NB_BUCKETS - 1, minimum - 1, -1):
+            for typeName, buckets in typedBuckets:
+                for symbol, nodeState in buckets[i].iteritems():
+                    yield (symbol, typeName), nodeState
+
+    def getMaximum(self, typeNames):
+        """Get the maximum activation value of the node states of the types
+        in typeNames"""
+        typedBuckets = self.getTypedBuckets(typeNames)
+        for i in xrange(NB_BUCKETS - 1, -1, -1):
+            activationValues = [nodeState.getActivationValue()
+                                for typeName, buckets in typedBuckets
+                                for nodeState in buckets[i].itervalues()]
+            if activationValues:
+                return max(activationValues)
+        raise ValueError("No node state of types %s" % (typeNames,))
+
+    def getActivated(self, typeNames, threshold):
+        """Get the node states of the types in typeNames whose activation
+        value is greater than threshold
+
+        Return a list of tuples ((symbol, type), node state)"""
+        return [(nodeId, nodeState)
+                for nodeId, nodeState in
+                self.iterNodeStates(typeNames, getActivationBucket(threshold))
+                if nodeState.getActivationValue() > threshold]
+
+    def getMostActivated(self, typeNames, number):
+        """Get the number most activated node states of the types in
+        typeNames
+
+        Return a list of tuples ((symbol, type), node state), the most
+        activated first"""
+        nodeStates = []
+        bucket = None
+        for nodeId, nodeState in self.iterNodeStates(typeNames):
+            av = nodeState.getActivationValue()
+            if len(nodeStates) >= number and getActivationBucket(av) != bucket:
+                break
+            bucket = getActivationBucket(av)
+            nodeStates.append((nodeId, nodeState))
+        return heapq.nlargest(number, nodeStates,
+                              key=lambda item: item[1].getActivationValue())
+
+
+class SparseState(State):
+    """A State which holds only the nodes which were activated.
+
+    It can be used instead of a State:
+    - reading an activation value does not create a NodeState (a node
+      without NodeState has an activation value of 0),
+    - NodeStates are checked once, when they are added,
+    - NodeStates are indexed by node type, so that getting the activated
+      nodes of a type does not scan the whole Concept Network,
+    - and by activation value (see ActivationIndex), so that getting the
+      most activated nodes of a type does not scan all its NodeStates.
+    """
+
+    def __init__(self, stateId):
+        State.__init__(self, stateId)
+        self.typedNodeState = {}    # node type -> node symbol -> node state
+        self.activations = ActivationIndex()
+
+    def fromState(cls, state):
+        """Build a SparseState holding the NodeStates of state"""
+        sparseState = cls(state.id)
+        for (symbol, type), nodeState in state.nodeState.iteritems():
+            sparseState.addNodeState(symbol, type, nodeState)
+        return sparseState
+    fromState = classmethod(fromState)
+
+    def __getstate__(self):
+        "The indexes are not saved"
+        state = self.__dict__.copy()
+        del state["typedNodeState"]
+        del state["activations"]
+        return state
+
+    def __setstate__(self, state):
+        "Rebuild the indexes"
+        self.__dict__.update(state)
+        self.typedNodeState = {}
+        self.activations = ActivationIndex()
+        for (symbol, type), nodeState in self.nodeState.iteritems():
+            self.typedNodeState.setdefault(type, {})[symbol] = nodeState
+            self.activations.add(symbol, type, nodeState)
+
+    def addNodeState(self, symbol, type, nodeState):
+        """Add the nodeState of the node which symbol and type are given
+
+        return the node state"""
+        if not hasTypeName(nodeState, "NodeState"):
+            raise ConceptNetworkStateBadType(
+                "The state of \"" + symbol + "\" is not a NodeState!"
+            )
+        oldNodeState = self.nodeState.get((symbol, type))
+        if oldNodeState is not None:
+            self.activations.remove(symbol, type, oldNodeState)
+        self.nodeState[(symbol, type)] = nodeState
+        self.typedNodeState.setdefault(type, {})[symbol] = nodeState
+        self.activations.add(symbol, type, nodeState)
+        return nodeState
+
+    def removeNodeState(self, symbol, type="basic"):
+        """Remove the state of the node which symbol and type are given
+
+        return the removed node state"""
+        nodeState = self.nodeState.pop((symbol, type))
+        symbols = self.typedNodeState[type]
+        del symbols[symbol]
+        if not symbols:
+            del self.typedNodeState[type]
+        self.activations.remove(symbol, type, nodeState)
+        return nodeState
+
+    def setNodeStateActivationValue(self, nodeState, activationValue,
+                                    symbol, type="basic"):
+        """Set the activationValue of nodeState, the state of the node
+        which symbol and type are given, and move it in the activation
+        index"""
+        oldActivationValue = nodeState.getActivationValue()
+        nodeState.setActivationValue(activationValue)
+        self.activations.move(symbol, type, nodeState, oldActivationValue)
+
+    def getNodeState(self, symbol, type="basic"):
+        """Get the the state of the node which symbol is given.
+
+        If the state did not exist, it is created with default arguments.
+        """
+        try:
+            return self.nodeState[(symbol, type)]
+        except KeyError:
+            return self.addNodeState(symbol, type, self.createNodeState())
+
+    def getNodeActivationValue(self, symbol, type="basic"):
+        """Get the activationValue of the node which symbol is given.
+
+        Nodes without state have an activation value of 0."""
+        nodeState = self.nodeState.get((symbol, type))
+        if nodeState is None:
+            return 0
+        return nodeState.getActivationValue()
+
+    def getNodeOldActivationValue(self, symbol, type="basic"):
+        """Get the old activationValue of the node which symbol is given.
+
+        Nodes without state have an old activation value of 0."""
+        nodeState = self.nodeState.get((symbol, type))
+        if nodeState is None:
+            return 0
+        return nodeState.getOldActivationValue()
+
+    def getTypedNodeStates(self, typeNames):
+        """Get the node states of the nodes whose type is in typeNames
+
+        Return a list of tuples ((symbol, type), node state)"""
+        return [((symbol, typeName), nodeState)
+                for typeName, symbols in self.typedNodeState.iteritems()
+                if typeName in typeNames
+                for symbol, nodeState in symbols.iteritems()]
+
+    def getMaximumActivationValue(self, cn, typeNames):
+        """Get the maximum activation value of the state, within nodes of types given by typeNames
+
+        typeNames: names of the types to take into account
+        cn:        Concept Network containing the nodes"""
+        return self.activations.getMaximum(typeNames)
+
+    def getActivatedTypedNodes(self, cn, typeNames, threshold=90):
+        """Get the activated nodes of cn.
+
+        The returned nodes must be in the list of typeNames, and
+        have an activation value greater than threshold
+
+        Return a list of tuples (node,activation value)"""
+        nodes = []
+        for nodeId, nodeState in self.activations.getActivated(typeNames,
+                                                               threshold):
+            if nodeId in cn.node:
+                nodes.append((cn.node[nodeId], nodeState.getActivationValue()))
+        return nodes
+
+    def getMostActivatedTypedNodes(self, cn, typeNames, number):
+        """Get the number most activated nodes of cn, whose type is in
+        typeNames
+
+        Return a list of tuples (node, activation value), the most
+        activated first"""
+        nodeStates = self.activations.getMostActivated(typeNames, number)
+        return [(cn.node[nodeId], nodeState.getActivationValue())
+                for nodeId, nodeState in nodeStates if nodeId in cn.node]
+
+    def checkNodes(self):
+        "NodeStates are checked when they are added"
+        pass
+
+
 class NodeState:
     """The state of a node (activation value, old activation value, age)
 
@@ -717,22 +1496,149 @@ class NodeState:
     def getAge(self):
         return self.age
 
+    def compact(self):
+        "Get a compact copy of the node state (see CompactNodeState)"
+        nodeState = CompactNodeState(self.activationValue, self.age)
+        nodeState.oldActivationValue = self.oldActivationValue
+        return nodeState
+
+
+class Slotted(object):
+    """Base class of the compact classes, which attributes are slots
+    (they have no __dict__, which saves memory).
+
+    The compactOf class attribute is the class it is a compact variant
+    of: it has the same methods (see hasTypeName)."""
+    __slots__ = ()
+
+    def __getstate__(self):
+        "Get the values of the slots"
+        state = {}
+        for cls in self.__class__.__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.iteritems():
+            setattr(self, name, value)
+
+
+class CompactNode(Slotted):
+    """A Node using less memory.
+
+    Types of nodes derived from it set the typeName and decay class
+    attributes."""
+    __slots__ = ("symbol", "occ", "outgoingLinks", "incomingLinks",
+                 "labelingLinks", "id")
+    compactOf = Node
+    typeName = "basic"
+    decay = 40
+
+    def __init__(self, symbol, occ=1):
+        self.symbol = symbol
+        self.occ = occ
+        self.outgoingLinks = LinkSet()
+        self.incomingLinks = LinkSet()
+        self.labelingLinks = LinkSet()
+
+    incrementOcc = Node.incrementOcc.im_func
+    addNode = Node.addNode.im_func
+    getSymbol = Node.getSymbol.im_func
+    getOcc = Node.getOcc.im_func
+    addOutgoingLink = Node.addOutgoingLink.im_func
+    addIncomingLink = Node.addIncomingLink.im_func
+    addLabelingLink = Node.addLabelingLink.im_func
+    removeOutgoingLink = Node.removeOutgoingLink.im_func
+    removeIncomingLink = Node.removeIncomingLink.im_func
+    removeLabelingLink = Node.removeLabelingLink.im_func
+    show = Node.show.im_func
+
+    def getTypeName(self):
+        return self.typeName
+
+    def getDecay(self):
+        "Get the decay rate of this node"
+        return self.decay
+
+    def compact(self):
+        return self
+
+
+class CompactLink(Slotted):
+    "A Link using less memory"
+    __slots__ = ("coOcc", "fro", "to", "label")
+    compactOf = Link
+
+    __init__ = Link.__init__.im_func
+    incrementCoOcc = Link.incrementCoOcc.im_func
+    getCoOcc = Link.getCoOcc.im_func
+    getWeight = Link.getWeight.im_func
+    getNodeFrom = Link.getNodeFrom.im_func
+    getNodeTo = Link.getNodeTo.im_func
+    getNodeLabel = Link.getNodeLabel.im_func
+    show = Link.show.im_func
+
+
+class CompactNodeState(Slotted):
+    "A NodeState using less memory"
+    __slots__ = ("oldActivationValue", "activationValue", "age")
+    compactOf = NodeState
+
+    __init__ = NodeState.__init__.im_func
+    setActivationValue = NodeState.setActivationValue.im_func
+    getActivationValue = NodeState.getActivationValue.im_func
+    ageActivationValues = NodeState.ageActivationValues.im_func
+    getOldActivationValue = NodeState.getOldActivationValue.im_func
+    resetAge = NodeState.resetAge.im_func
+    incrementAge = NodeState.incrementAge.im_func
+    getAge = NodeState.getAge.im_func
+
+    def compact(self):
+        return self
+
+
+class CompactConceptNetwork(ConceptNetwork):
+    """A ConceptNetwork using CompactNodes and CompactLinks.
+
+    The nodes added are replaced by their compact copy (see Node.compact)
+    when they are not in the network yet.
+    Use compactNetwork to convert a ConceptNetwork."""
+    def addNode(self, node):
+        if (node.getSymbol(), node.getTypeName()) not in self.node:
+            node = node.compact()
+        return ConceptNetwork.addNode(self, node)
+
+    def internNode(self, node):
+        i = self.findNodeId(node)
+        if i is None:
+            i = ConceptNetwork.internNode(self, node.compact())
+        return i
+
+    def createLink(self, nodeFrom, nodeTo, nodeLabel, coOcc=1):
+        return CompactLink(nodeFrom, nodeTo, nodeLabel, coOcc)
+
 
 class Temperature:
     "Class for chosing among weighted items according to a temperature"
-    def __init__(self, temperature, influence=2):
+    def __init__(self, temperature, influence=2, rng=None):
         """Initialize the temperature value
 
         The higher, the more deterministic the choices
-        (0<= temperature <= 100)"""
+        (0<= temperature <= 100)
+
+        rng: random number generator (a random.Random, for reproducible
+             choices), instead of the random module"""
         if temperature < 0 or temperature > 100:
             raise TemperatureBadValue("Bad temperature! (must be in [0,100])")
         self.value = temperature
         self.influence = influence
+        self.random = rng or random
 
     def randomize(self):
         t = time.time()
-        random.seed(t)
+        self.random.seed(t)
 
     def setValue(self, value):
         self.value = value
@@ -740,41 +1646,101 @@ class Temperature:
     def getValue(self):
         return self.value
 
-    def chooseWeightedItem(self, items):
-        """Choose and return one node among the weighted items given,
-        according to the temperature value
+    def getUrgencies(self, items):
+        """Get the weights of the items, according to the temperature value
 
         items: list of tuples (item, weight)
 
-        Each item must have a getSymbol() method, which returns a string.
-
-        returns the chosen item"""
+        returns the list of the urgencies of the items (>= 0)"""
         nb = len(items)
-        T = (self.value - 50) / 50.0
         if nb == 0:
             raise TemperatureNoItems("No items were given!")
+        T = (self.value - 50) / 50.0
         total = sum([weight for (item, weight) in items])
         avg = total / float(nb)
-        ur = {}
-
-        urgencySum = 0
+        urgencies = []
         for (item, weight) in items:
             urgency = weight + T * self.influence * (avg - weight)
             if urgency < 0:
                 urgency = 0
-            urgencySum += urgency
-            ur[item.getSymbol()] = urgencySum
+            urgencies.append(urgency)
+        return urgencies
 
-        if urgencySum < 1:
-            urgencySum = 1
-        choice = random.randint(0, int(urgencySum))
+    def chooseWeightedItem(self, items, urgencies=None):
+        """Choose and return one node among the weighted items given,
+        according to the temperature value
 
-        for (item, weight) in items:
-            symbol = item.getSymbol()
-            urgency = ur[symbol]
-            if choice <= urgency:
-                return item
-        return items[0][0]
+        items:     list of tuples (item, weight)
+        urgencies: urgencies of the items, when already computed (see
+                   getUrgencies)
+
+        The cumulative urgencies are computed once, and the choice is found
+        by a binary search. When no item has an urgency, the first one is
+        chosen.
+
+        returns the chosen item"""
+        cumulative = []
+        urgencySum = 0
+        if urgencies is None:
+            urgencies = self.getUrgencies(items)
+        for urgency in urgencies:
+            urgencySum += urgency
+            cumulative.append(urgencySum)
+        if not urgencySum:
+            return items[0][0]
+        choice = self.random.random() * urgencySum
+        return items[bisect_right(cumulative, choice)][0]
+
+    def getSampler(self, items):
+        """Get an AliasSampler of the items, according to the temperature
+        value (to choose several times among the same items)"""
+        return AliasSampler(items, self.getUrgencies(items), self.random)
+
+
+class AliasSampler:
+    """Choice among weighted items, in constant time (Walker's alias method).
+
+    Building the tables takes a time proportional to the number of items:
+    it is worth it when several choices are made among the same items."""
+    def __init__(self, items, weights=None, rng=None):
+        """items:   list of tuples (item, weight)
+        weights: weights of the items, used instead of the ones in items
+                 (default: the ones in items)
+        rng:     random number generator (default: random module)"""
+        if not items:
+            raise TemperatureNoItems("No items were given!")
+        if weights is None:
+            weights = [weight for (item, weight) in items]
+        self.items = [item for (item, weight) in items]
+        self.random = rng or random
+        nb = len(items)
+        total = float(sum(weights))
+        if not total:
+            weights = [1] * nb
+            total = float(nb)
+        self.probability = [weight * nb / total for weight in weights]
+        self.alias = range(nb)
+        small = [i for i in range(nb) if self.probability[i] < 1]
+        large = [i for i in range(nb) if self.probability[i] >= 1]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self.alias[less] = more
+            self.probability[more] -= 1 - self.probability[less]
+            if self.probability[more] < 1:
+                small.append(more)
+            else:
+                large.append(more)
+        # Rounding errors
+        for i in small + large:
+            self.probability[i] = 1
+
+    def choose(self):
+        "Choose and return one item"
+        i = int(self.random.random() * len(self.items))
+        if self.random.random() < self.probability[i]:
+            return self.items[i]
+        return self.items[self.alias[i]]
 
 
 # main
@@ -34,6 +34,8 @@ __copyright__ = "Copyright (c) 2008 François Parmentier"
 __license__   = "GPL"
 
 from ConceptNetwork import *
+import pickle
+import random
 import unittest
 
 
@@ -171,6 +173,36 @@ class ConceptNetworkTest(unittest.TestCase):
         conceptNetwork.fastPropagateActivations(state,2)
         self.assertEqual(True,state.getNodeActivationValue("To1") > 50)
 
+    def testFrontierPropagation(self):
+        "Test the propagation from the activated nodes"
+        conceptNetwork = ConceptNetwork()
+        nodeFrom = conceptNetwork.addNode(Node("From"))
+        nodeTo1  = conceptNetwork.addNode(Node("To1"))
+        nodeTo2  = conceptNetwork.addNode(Node("To2"))
+        conceptNetwork.addLink(nodeFrom, nodeTo1)
+        conceptNetwork.addLink(nodeTo2, nodeFrom)
+        state = SparseState(1)
+        conceptNetwork.addState(state)
+        state.setNodeActivationValue(100,"From","basic")
+        conceptNetwork.frontierPropagateActivations(state,2)
+        self.assertTrue(state.getNodeActivationValue("To1") > 50)
+        # To2 is not activated, so it does not influence From
+        self.assertEqual(set([("From", "basic"), ("To1", "basic")]),
+                         set(state.nodeState))
+
+    def testFrontierPropagationEviction(self):
+        "Nodes whose activation falls below epsilon are removed from the state"
+        conceptNetwork = ConceptNetwork()
+        nodeFrom = conceptNetwork.addNode(Node("From"))
+        nodeTo1  = conceptNetwork.addNode(Node("To1"))
+        conceptNetwork.addLink(nodeFrom, nodeTo1)
+        state = SparseState(1)
+        conceptNetwork.addState(state)
+        state.setNodeActivationValue(100,"From","basic")
+        for _ in range(5):
+            conceptNetwork.frontierPropagateActivations(state,2,epsilon=5)
+        self.assertEqual({}, state.nodeState)
+
     def testDumpLoad(self):
         "Test the saving of the Concept Network"
         conceptNetwork = ConceptNetwork()
@@ -206,6 +238,166 @@ class ConceptNetworkTest(unittest.TestCase):
         nodeLoaded = cnLoaded.getNode("To1")
         self.assertTrue(nodeLoaded)
 
+    def testAddLinkTwiceStoredOnce(self):
+        "A link added twice is stored once in the nodes' links"
+        cn = ConceptNetwork()
+        nodeFrom = Node("From")
+        nodeTo   = Node("To")
+        nodeLabel= Node("Label")
+        cn.addLink(nodeFrom, nodeTo, nodeLabel)
+        link = cn.addLink(nodeFrom, nodeTo, nodeLabel)
+        self.assertEqual(2, link.getCoOcc())
+        self.assertEqual([link], cn.getLinksFrom(nodeFrom))
+        self.assertEqual([link], cn.getLinksTo(nodeTo))
+        self.assertEqual([link], cn.getLinksLabeled(nodeLabel))
+
+    def testAddLinkNodesCopies(self):
+        "Links between copies of nodes are attached to the network's nodes"
+        cn = ConceptNetwork()
+        nodeFrom = cn.addNode(Node("From"))
+        nodeTo   = cn.addNode(Node("To"))
+        copyFrom = Node("From")
+        self.assertEqual(nodeFrom, cn.addNode(copyFrom))
+        link = cn.addLink(copyFrom, Node("To"))
+        self.assertEqual(nodeFrom, link.getNodeFrom())
+        self.assertTrue(link in nodeFrom.outgoingLinks)
+        self.assertTrue(link in nodeTo.incomingLinks)
+        self.assertEqual(0, len(copyFrom.outgoingLinks))
+
+    def testLoadListsOfLinks(self):
+        "Networks pickled with lists of links are compacted when loaded"
+        cn = ConceptNetwork()
+        nodeFrom = cn.addNode(Node("From"))
+        nodeTo   = cn.addNode(Node("To"))
+        link = cn.addLink(nodeFrom, nodeTo)
+        cn.addLink(nodeFrom, nodeTo)
+        # Older networks: one list item per co-occurrence
+        nodeFrom.outgoingLinks = [link, link]
+        nodeTo.incomingLinks = [link, link]
+        del cn.compacted
+        cnLoaded = pickle.loads(pickle.dumps(cn, 0))
+        nodeLoaded = cnLoaded.getNode("From")
+        self.assertTrue(isinstance(nodeLoaded.outgoingLinks, LinkSet))
+        self.assertEqual(1, len(nodeLoaded.outgoingLinks))
+        self.assertEqual(1, len(cnLoaded.getNode("To").incomingLinks))
+        self.assertEqual(2, cnLoaded.getLink(nodeFrom, nodeTo).getCoOcc())
+
+    def testLoadStringKeyedLinks(self):
+        "Networks pickled with links keyed by symbols get integer ids"
+        cn = ConceptNetwork()
+        nodeFrom = cn.addNode(Node("From"))
+        nodeTo   = cn.addNode(Node("To"))
+        nodeLabel = cn.addNode(Node("Label"))
+        cn.addLink(nodeFrom, nodeTo)
+        cn.addLink(nodeFrom, nodeTo, nodeLabel)
+        # Older networks: links keyed by the symbols and types
+        cn.link = dict([((link.fro.getSymbol(), link.fro.getTypeName(),
+                          link.to.getSymbol(), link.to.getTypeName(),
+                          link.label and link.label.getSymbol(),
+                          link.label and link.label.getTypeName()), link)
+                        for link in cn.link.values()])
+        del cn.nodeId
+        del cn.nodeById
+        cnLoaded = pickle.loads(pickle.dumps(cn, 2))
+        nodeFrom = cnLoaded.getNode("From")
+        self.assertEqual(2, len(cnLoaded.link))
+        self.assertEqual(1, cnLoaded.getLink(nodeFrom, cnLoaded.getNode("To"),
+                                             cnLoaded.getNode("Label")).getCoOcc())
+        cnLoaded.addLink(nodeFrom, cnLoaded.getNode("To"))
+        self.assertEqual(2, len(cnLoaded.link))
+        self.assertEqual(2, cnLoaded.getLink(nodeFrom, Node("To")).getCoOcc())
+
+    def testNodeAddedAfterLink(self):
+        "A node linked to before being added is the node of its links"
+        cn = ConceptNetwork()
+        nodeFrom = cn.addNode(Node("From"))
+        cn.addLink(nodeFrom, Node("To"))
+        nodeTo = cn.addNode(Node("To"))
+        self.assertEqual(nodeTo, cn.nodeById[cn.findNodeId(Node("To"))])
+        self.assertEqual(2, cn.addLink(nodeFrom, nodeTo).getCoOcc())
+
+    def testLinkKey(self):
+        "Link keys give back the nodes' ids"
+        self.assertEqual((3, 0, None), splitLinkKey(linkKey(3, 0)))
+        self.assertEqual((3, 0, 0), splitLinkKey(linkKey(3, 0, 0)))
+        self.assertNotEqual(linkKey(3, 0), linkKey(3, 0, 0))
+
+    def testRemoveLink(self):
+        "A link removed is removed from its nodes too"
+        cn = ConceptNetwork()
+        nodeFrom = cn.addNode(Node("From"))
+        nodeTo = cn.addNode(Node("To"))
+        nodeLabel = cn.addNode(Node("Label"))
+        cn.addLink(nodeFrom, nodeTo)
+        link = cn.addLink(nodeFrom, nodeTo, nodeLabel)
+        self.assertEqual(link, cn.removeLink(nodeFrom, nodeTo, nodeLabel))
+        self.assertEqual(1, len(cn.link))
+        self.assertEqual([cn.getLink(nodeFrom, nodeTo)],
+                         list(nodeFrom.outgoingLinks))
+        self.assertEqual(1, len(nodeTo.incomingLinks))
+        self.assertEqual(0, len(nodeLabel.labelingLinks))
+        self.assertRaises(KeyError, cn.getLink, nodeFrom, nodeTo, nodeLabel)
+        self.assertRaises(KeyError, cn.removeLink, nodeFrom, nodeTo,
+                          nodeLabel)
+        self.assertEqual(1, cn.addLink(nodeFrom, nodeTo, nodeLabel).getCoOcc())
+
+    def testUnknownLinkNode(self):
+        "There is no link from, to, or through a node never added"
+        cn = ConceptNetwork()
+        nodeFrom = cn.addNode(Node("From"))
+        nodeTo = cn.addNode(Node("To"))
+        cn.addLink(nodeFrom, nodeTo)
+        unknown = Node("Unknown")
+        self.assertRaises(KeyError, cn.getLink, nodeFrom, unknown)
+        self.assertRaises(KeyError, cn.getLink, unknown, nodeTo)
+        self.assertRaises(KeyError, cn.getLink, nodeFrom, nodeTo, unknown)
+        self.assertRaises(KeyError, cn.removeLink, unknown, nodeTo)
+        self.assertEqual(1, len(cn.link))
+
+    def testRemoveNode(self):
+        """A node removed is removed with its links, and its node states;
+        added again, it is a new node"""
+        cn = ConceptNetwork()
+        nodes = [cn.addNode(Node("n%d" % i)) for i in range(4)]
+        cn.addLink(nodes[0], nodes[1])
+        cn.addLink(nodes[1], nodes[1])
+        cn.addLink(nodes[1], nodes[2])
+        cn.addLink(nodes[2], nodes[3], nodes[1])
+        cn.addLink(nodes[2], nodes[3])
+        state = SparseState(1)
+        state.fullyActivate("n1")
+        state.fullyActivate("n2")
+        cn.addState(state)
+        cn.weights.getWeights(nodes[2])
+        self.assertEqual(nodes[1], cn.removeNode(Node("n1")))
+        self.assertFalse(cn.hasNode(nodes[1]))
+        self.assertTrue(cn.hasNode(nodes[2]))
+        self.assertRaises(ConceptNetworkUnknownNode, cn.getNode, "n1")
+        self.assertEqual(1, len(cn.link))
+        self.assertEqual(0, len(nodes[0].outgoingLinks))
+        self.assertEqual(0, len(nodes[2].incomingLinks))
+        self.assertEqual(["n3"], [link.getNodeTo().getSymbol()
+                                  for link in nodes[2].outgoingLinks])
+        self.assertEqual([("n2", "basic")], state.nodeState.keys())
+        self.assertEqual([(("n3", "basic"), 1.0, None)],
+                         cn.weights.getWeights(nodes[2]))
+        cn.fastPropagateActivations(state)
+        node = cn.addNode(Node("n1"))
+        self.assertTrue(cn.hasNode(node))
+        self.assertEqual(1, cn.addLink(nodes[0], node).getCoOcc())
+        self.assertEqual(5, len(cn.nodeById))
+        self.assertEqual(None, cn.nodeById[1])
+
+    def testRemoveNodeCompact(self):
+        "Nodes and links of compact networks can be removed"
+        cn = compactNetwork(ConceptNetwork())
+        nodeFrom = cn.addNode(Node("From"))
+        nodeTo = cn.addNode(Node("To"))
+        cn.addLink(nodeFrom, nodeTo)
+        cn.removeNode(nodeTo)
+        self.assertEqual(0, len(cn.link))
+        self.assertEqual(0, len(nodeFrom.outgoingLinks))
+
     def testRemoveState(self):
         "Test ConceptNetwork.removeStatesExcept()"
         conceptNetwork = ConceptNetwork()
@@ -250,6 +442,25 @@ class LinkTest(unittest.TestCase):
         self.assertEqual(2, link.getCoOcc())
 
 
+class LinkSetTest(unittest.TestCase):
+    "Test the LinkSet class"
+    def testAddRemove(self):
+        "Links are stored once, in insertion order"
+        links = LinkSet()
+        link1 = Link(Node("1"), Node("2"))
+        link2 = Link(Node("2"), Node("3"))
+        link3 = Link(Node("3"), Node("1"))
+        self.assertTrue(links.add(link1))
+        self.assertTrue(links.add(link2))
+        self.assertFalse(links.add(link1))
+        links.add(link3)
+        self.assertEqual([link1, link2, link3], list(links))
+        links.remove(link1)
+        self.assertFalse(link1 in links)
+        self.assertEqual(2, len(links))
+        self.assertEqual(set([link2, link3]), set(links))
+
+
 class StateTest(unittest.TestCase):
     "Test the State class"
     def testCreateState(self):
@@ -278,6 +489,41 @@ class StateTest(unittest.TestCase):
         link = cn.addLink(nodeFrom,nodeTo,nodeLabel)
         self.assertEqual(1,link.getWeight(state))
 
+    def testLinkLabeledWeightTyped(self):
+        "The label of a link is found with its type, without creating its state"
+        class TokenNode(Node):
+            def getTypeName(self):
+                return "token"
+        cn    = ConceptNetwork()
+        state = State(1)
+        nodeFrom = cn.addNode(Node("From", 2))
+        link = cn.addLink(nodeFrom, Node("To"), TokenNode("Label"))
+        self.assertEqual(0.5, link.getWeight(state))
+        self.assertEqual({}, state.nodeState)
+        state.setNodeActivationValue(50, "Label", "token")
+        self.assertEqual(0.75, link.getWeight(state))
+
+    def testWeightCache(self):
+        "The weights are cached, until the co-occurrence or occurrence changes"
+        cn    = ConceptNetwork()
+        nodeFrom = cn.addNode(Node("From"))
+        cn.addNode(Node("To"))
+        cn.addLink(nodeFrom, Node("To"))
+        self.assertEqual([(("To", "basic"), 1.0, None)],
+                         cn.weights.getWeights(nodeFrom))
+        cn.weights.getWeights(nodeFrom)
+        self.assertEqual((1, 1), (cn.weights.hits, cn.weights.misses))
+        cn.addNode(Node("From"))
+        self.assertEqual([(("To", "basic"), 0.5, None)],
+                         cn.weights.getWeights(nodeFrom))
+        cn.addLink(Node("From"), Node("To"))
+        self.assertEqual([(("To", "basic"), 1.0, None)],
+                         cn.weights.getWeights(nodeFrom))
+        self.assertEqual(3, cn.weights.getStats()["misses"])
+        loaded = pickle.loads(pickle.dumps(cn, 2))
+        self.assertEqual([loaded.weights], loaded.listeners)
+        self.assertEqual(0, loaded.weights.getStats()["hits"])
+
     def testGetNodeStateTyped(self):
         "Test getting a node state with a type"
         cn    = ConceptNetwork()
@@ -308,6 +554,182 @@ class StateTest(unittest.TestCase):
         self.assertRaises(KeyError,state.nodeState.__getitem__,("From","basic"))
 
 
+class SparseStateTest(unittest.TestCase):
+    "Test the SparseState class"
+    def testReadDoesNotCreate(self):
+        "Reading the activation value of an unknown node creates nothing"
+        state = SparseState(1)
+        self.assertEqual(0, state.getNodeActivationValue("Salut"))
+        self.assertEqual(0, state.getNodeOldActivationValue("Salut"))
+        self.assertEqual({}, state.nodeState)
+
+    def testBadNodeState(self):
+        "Only NodeStates can be added"
+        state = SparseState(1)
+        self.assertRaises(ConceptNetworkStateBadType,
+                          state.addNodeState, "Salut", "basic", 100)
+
+    def testActivatedTypedNodes(self):
+        "Activated nodes are found by type"
+        cn    = ConceptNetwork()
+        node1 = cn.addNode(Node("Salut"))
+        node2 = cn.addNode(Node("Hello"))
+        state = SparseState(1)
+        cn.addState(state)
+        state.setNodeActivationValue(100, "Salut")
+        state.setNodeActivationValue(50, "Hello")
+        state.setNodeActivationValue(95, "Nimp", "token")
+        self.assertEqual(100, state.getMaximumActivationValue(cn, "basic"))
+        self.assertEqual([(node1, 100)],
+                         state.getActivatedTypedNodes(cn, "basic", 90))
+        state.clean()
+        state.setNodeActivationValue(0, "Salut")
+        self.assertEqual(sorted([(node1, 100), (node2, 50)]),
+                         sorted(state.getActivatedTypedNodes(cn, ["basic"], 0)))
+
+    def testRemoveNodeState(self):
+        "A removed node state is removed from the type index"
+        state = SparseState(1)
+        state.setNodeActivationValue(100, "Salut", "token")
+        state.removeNodeState("Salut", "token")
+        self.assertEqual({}, state.nodeState)
+        self.assertEqual({}, state.typedNodeState)
+
+    def testFromStateAndPickle(self):
+        "A State can be converted, and the type index is rebuilt when loaded"
+        state = State(1)
+        state.setNodeActivationValue(100, "Salut", "token")
+        sparseState = SparseState.fromState(state)
+        loaded = pickle.loads(pickle.dumps(sparseState, 0))
+        self.assertEqual(1, loaded.id)
+        self.assertEqual(["Salut"], loaded.typedNodeState["token"].keys())
+        self.assertEqual(100, loaded.getNodeActivationValue("Salut", "token"))
+
+    def testSamePropagation(self):
+        "A SparseState propagates like a State"
+        cn = ConceptNetwork()
+        nodes = [cn.addNode(Node(symbol)) for symbol in "abcde"]
+        for i in range(len(nodes)):
+            cn.addLink(nodes[i], nodes[(i + 1) % len(nodes)])
+            cn.addLink(nodes[i], nodes[(i + 3) % len(nodes)])
+        state = State(1)
+        sparseState = SparseState(2)
+        state.setNodeActivationValue(100, "a")
+        sparseState.setNodeActivationValue(100, "a")
+        for _ in range(3):
+            cn.fastPropagateActivations(state)
+            cn.fastPropagateActivations(sparseState)
+            for symbol in "abcde":
+                self.assertAlmostEqual(state.getNodeActivationValue(symbol),
+                                       sparseState.getNodeActivationValue(symbol))
+
+    def checkActivationIndex(self, cn, state):
+        "The activation index gives the same nodes as a scan of the state"
+        for typeName in ("basic", "token"):
+            scanned = [(cn.node[nodeId], nodeState.getActivationValue())
+                       for nodeId, nodeState in state.nodeState.iteritems()
+                       if nodeId[1] == typeName]
+            if not scanned:
+                continue
+            self.assertEqual(max([av for node, av in scanned]),
+                             state.getMaximumActivationValue(cn, typeName))
+            for threshold in (-1, 0, 12.5, 50, 90):
+                self.assertEqual(sorted([(av, node.getSymbol())
+                                         for node, av in scanned
+                                         if av > threshold]),
+                                 sorted([(av, node.getSymbol()) for node, av in
+                                         state.getActivatedTypedNodes(cn, typeName,
+                                                                      threshold)]))
+            mostActivated = state.getMostActivatedTypedNodes(cn, [typeName], 3)
+            self.assertEqual(sorted([av for node, av in scanned], reverse=True)[:3],
+                             [av for node, av in mostActivated])
+
+    def testActivationIndex(self):
+        "The activation index follows the changes of the activation values"
+        rng = random.Random(1)
+        cn = ConceptNetwork()
+        class TokenNode(Node):
+            def getTypeName(self):
+                return "token"
+        nodes = [cn.addNode(Node("n%d" % i)) for i in range(20)] + \
+                [cn.addNode(TokenNode("t%d" % i)) for i in range(20)]
+        for i in range(100):
+            cn.addLink(rng.choice(nodes), rng.choice(nodes))
+        state = SparseState(1)
+        for node in rng.sample(nodes, 5):
+            state.setNodeActivationValue(rng.uniform(1, 100), node.getSymbol(),
+                                         node.getTypeName())
+        self.checkActivationIndex(cn, state)
+        for _ in range(5):
+            cn.frontierPropagateActivations(state, epsilon=5)
+            self.checkActivationIndex(cn, state)
+            cn.fastPropagateActivations(state)
+            self.checkActivationIndex(cn, state)
+        state = pickle.loads(pickle.dumps(state, 2))
+        self.checkActivationIndex(cn, state)
+        compactState(state)
+        state.clean()
+        self.checkActivationIndex(cn, state)
+
+
+class CompactTest(unittest.TestCase):
+    "Test the compact classes"
+    def buildNetwork(self):
+        cn = ConceptNetwork()
+        nodes = [cn.addNode(Node("n%d" % i)) for i in range(5)]
+        for i in range(5):
+            cn.addLink(nodes[i], nodes[(i + 1) % 5])
+            cn.addLink(nodes[i], nodes[(i + 2) % 5], nodes[0])
+        cn.addLink(nodes[0], nodes[1])
+        return cn
+
+    def testCompactNetwork(self):
+        "A compact network has the same nodes and links"
+        cn = self.buildNetwork()
+        compactCn = compactNetwork(cn)
+        self.assertEqual(len(cn.node), len(compactCn.node))
+        self.assertEqual(len(cn.link), len(compactCn.link))
+        nodeFrom = compactCn.getNode("n0")
+        self.assertTrue(isinstance(nodeFrom, CompactNode))
+        self.assertFalse(hasattr(nodeFrom, "__dict__"))
+        link = compactCn.getLink(nodeFrom, compactCn.getNode("n1"))
+        self.assertTrue(isinstance(link, CompactLink))
+        self.assertEqual(2, link.getCoOcc())
+        self.assertEqual(2, len(nodeFrom.outgoingLinks))
+        self.assertTrue(isinstance(compactCn.addLink(nodeFrom, Node("New")),
+                                   CompactLink))
+        self.assertTrue(isinstance(compactCn.addNode(Node("New")), CompactNode))
+
+    def testSamePropagation(self):
+        "A compact network propagates the same activation values"
+        cn = self.buildNetwork()
+        state = State(1)
+        state.setNodeActivationValue(100, "n0")
+        cn.addState(state)
+        compactCn = compactNetwork(pickle.loads(pickle.dumps(cn)))
+        compactState = compactCn.getState(1)
+        self.assertTrue(isinstance(compactState.getNodeState("n0"), CompactNodeState))
+        for _ in range(3):
+            cn.fastPropagateActivations(state)
+            compactCn.fastPropagateActivations(compactState)
+        for i in range(5):
+            self.assertAlmostEqual(state.getNodeActivationValue("n%d" % i),
+                                   compactState.getNodeActivationValue("n%d" % i))
+        self.assertTrue(isinstance(compactState.getNodeState("n4"), CompactNodeState))
+
+    def testPickle(self):
+        "Compact networks can be pickled"
+        for protocol in (0, 2):
+            compactCn = pickle.loads(pickle.dumps(compactNetwork(self.buildNetwork()),
+                                                  protocol))
+            nodeFrom = compactCn.getNode("n0")
+            self.assertEqual(1, nodeFrom.getOcc())
+            self.assertEqual(2, compactCn.getLink(nodeFrom,
+                                                  compactCn.getNode("n1")).getCoOcc())
+            self.assertTrue(nodeFrom is
+                            iter(nodeFrom.outgoingLinks).next().getNodeFrom())
+
+
 class TemperatureTest(unittest.TestCase):
     "Test the Temperature class"
     def testChooseWeightedItems(self):
@@ -328,6 +750,46 @@ class TemperatureTest(unittest.TestCase):
         l = [(node,100),(node2,1)]
         self.assertEqual(node,temperature.chooseWeightedItem(l))
 
+    def testFloatWeights(self):
+        "Weights below 1 are not truncated"
+        temperature = Temperature(50, rng=random.Random(1))
+        node = Node("1")
+        node2 = Node("2")
+        l = [(node,0.0),(node2,0.5)]
+        for i in range(20):
+            self.assertEqual(node2,temperature.chooseWeightedItem(l))
+
+    def testSameSymbol(self):
+        "Items with the same symbol are different choices"
+        temperature = Temperature(50, rng=random.Random(1))
+        node = Node("1")
+        node2 = Node("1")
+        l = [(node,1),(node2,0)]
+        for i in range(20):
+            self.assertTrue(temperature.chooseWeightedItem(l) is node)
+
+    def testSeed(self):
+        "Choices made with the same seed are the same"
+        l = [(Node(str(i)),i) for i in range(100)]
+        choices = []
+        for _ in range(2):
+            temperature = Temperature(50, rng=random.Random(42))
+            choices.append([temperature.chooseWeightedItem(l)
+                            for i in range(10)])
+        self.assertEqual(choices[0], choices[1])
+
+    def testSampler(self):
+        "The alias sampler chooses the items according to their weights"
+        temperature = Temperature(50, rng=random.Random(1))
+        nodes = [Node("1"), Node("2"), Node("3")]
+        sampler = temperature.getSampler(zip(nodes, [0, 1, 3]))
+        counts = dict((node, 0) for node in nodes)
+        for i in range(4000):
+            counts[sampler.choose()] += 1
+        self.assertEqual(0, counts[nodes[0]])
+        self.assertTrue(800 < counts[nodes[1]] < 1200)
+        self.assertTrue(2800 < counts[nodes[2]] < 3200)
+
 
 if __name__ == "__main__":
 	unittest.main()
@@ -31,14 +31,25 @@ __copyright__ = "Copyright (c) 2008 François Parmentier"
 __license__ = "GPL"
 
 from ConceptNetwork import *
-from Entry import Entry
+from Entry import Entry, getTokens
+from Instruments import Instruments
+from Journal import Journal
+from StateManager import loadState, getStateFilename
+from SuccessorCache import getSuccessorCache
+from math import log
 from time import localtime
+import time
 import os
 import sys
 import locale
 
 ENCODING = locale.getdefaultlocale()[1]
 DEFAULT_ENCODING = sys.getdefaultencoding()
+# Punctuation glued to the previous (or next) token in the sentences
+NO_SPACE_BEFORE = (",", ".", ":", "!", "?", "'", ")", "-")
+NO_SPACE_AFTER  = ("'", "(", "-")
+# Weight of the tokens of no weight, in the log-probabilities
+MIN_WEIGHT = 1e-6
 
 
 class TokenNode(Node):
@@ -103,6 +114,10 @@ class TokenNode(Node):
                                self.getMiddleOccurrence(),
                                self.getEndOccurrence())
 
+    def compact(self):
+        return CompactTokenNode(self.getSymbol(), self.getOcc(), self.__beg,
+                                self.__mid, self.__end)
+
 
 class SentenceNode(Node):
     """A sentence node.
@@ -136,6 +151,11 @@ class SentenceNode(Node):
                                self.beg
                                )
 
+    def compact(self):
+        node = CompactSentenceNode(self.getSymbol(), self.getOcc())
+        node.beg = self.beg
+        return node
+
 
 class ExpressionNode(Node):
     """An expression node.
@@ -154,6 +174,9 @@ class ExpressionNode(Node):
     def getDecay(self):
         return self.__decay
 
+    def compact(self):
+        return CompactExpressionNode(self.getSymbol(), self.getOcc())
+
 
 class SentimentNode(Node):
     """A sentiment node.
@@ -170,6 +193,9 @@ class SentimentNode(Node):
     def getDecay(self):
         return self.__decay
 
+    def compact(self):
+        return CompactSentimentNode(self.getSymbol(), self.getOcc())
+
 
 class UttererNode(Node):
     """An utterer node.
@@ -211,31 +237,200 @@ class UttererNode(Node):
                                self.__lastTime[2]
                                )
 
+    def compact(self):
+        node = CompactUttererNode(self.getSymbol(), self.getOcc())
+        node.lastTime = self.__lastTime
+        return node
+
+
+class CompactTokenNode(CompactNode):
+    "A TokenNode using less memory"
+    __slots__ = ("beg", "mid", "end")
+    compactOf = TokenNode
+    typeName = "token"
+    decay = 20
+
+    def __init__(self, symbol, occ=1, beg=0, mid=0, end=0):
+        CompactNode.__init__(self, symbol, occ)
+        self.beg = beg
+        self.mid = mid
+        self.end = end
+
+    def addNode(self, node):
+        """Add beg, mid, and end of the node to self."""
+        CompactNode.addNode(self, node)
+        self.beg += node.getBeginningOccurrence()
+        self.mid += node.getMiddleOccurrence()
+        self.end += node.getEndOccurrence()
+
+    def getBeginningOccurrence(self):
+        return self.beg
+
+    def getMiddleOccurrence(self):
+        return self.mid
+
+    def getEndOccurrence(self):
+        return self.end
+
+    def incrementBeginningOccurrence(self):
+        self.beg += 1
+        return self.beg
+
+    def incrementMiddleOccurrence(self):
+        self.mid += 1
+        return self.mid
+
+    def incrementEndOccurrence(self):
+        self.end += 1
+        return self.end
+
+    show = TokenNode.show.im_func
+
+
+class CompactSentenceNode(CompactNode):
+    "A SentenceNode using less memory"
+    __slots__ = ("beg",)
+    compactOf = SentenceNode
+    typeName = "sentence"
+    decay = 25
+
+    def __init__(self, symbol, occ=1):
+        CompactNode.__init__(self, symbol, occ)
+        self.beg = 0
+
+    def addNode(self, node):
+        CompactNode.addNode(self, node)
+        self.beg += node.beg
+
+    show = SentenceNode.show.im_func
+
+
+class CompactExpressionNode(CompactNode):
+    "An ExpressionNode using less memory"
+    __slots__ = ()
+    compactOf = ExpressionNode
+    typeName = "expression"
+    decay = 20
+
+
+class CompactSentimentNode(CompactNode):
+    "A SentimentNode using less memory"
+    __slots__ = ()
+    compactOf = SentimentNode
+    typeName = "sentiment"
+    decay = 5
+
+
+class CompactUttererNode(CompactNode):
+    "An UttererNode using less memory"
+    __slots__ = ("lastTime",)
+    compactOf = UttererNode
+    typeName = "utterer"
+    decay = 35
+
+    def __init__(self, symbol, occ=1):
+        CompactNode.__init__(self, symbol, occ)
+        self.lastTime = time.localtime()
+
+    def getLastTime(self):
+        """Get the last time the utterer talked"""
+        return self.lastTime
+
+    def addNode(self, node):
+        """Update the last time the utterer talked."""
+        CompactNode.addNode(self, node)
+        self.lastTime = time.localtime()
+
+    def show(self):
+        """Display the node
+        Display the last time the utterer talked"""
+        print "%10s (%8s): %d (%d/%d/%d)" % (self.getSymbol(),
+                               self.getTypeName(),
+                               self.getOcc(),
+                               self.lastTime[0],
+                               self.lastTime[1],
+                               self.lastTime[2]
+                               )
+
 
 class Ector:
     "The ECTOR class"
 
-    def __init__(self, botname="Ector", username="User"):
+    def __init__(self, botname="Ector", username="User", journal=None,
+                 cn=None, states=None):
+        """journal: when given, path prefix of the journal storing the
+                 ConceptNetwork (see Journal), instead of cn.pkl
+        cn:      when given, ConceptNetwork shared with other Ectors
+                 (their users' states are in it too); it is not loaded
+        states:  when given, StateManager of cn, loading and saving the
+                 states of the users"""
         self.botname = botname
         self.username = username
-        if os.path.exists("cn.pkl"):
+        self.states = states
+        # When epsilon is set, propagations start from the activated nodes
+        # only, and forget the nodes whose activation is below epsilon.
+        self.epsilon = None
+        # Random number generator of the choices (None: random module),
+        # a seeded random.Random makes the replies reproducible.
+        self.rng = None
+        # Instruments measuring the stages of the turns (None: nothing is
+        # measured), see Instruments.
+        self.instruments = None
+        self.journal = journal and Journal(journal) or None
+        if cn is not None:
+            self.cn = cn
+        elif self.journal and self.journal.exists():
+            self.cn = self.journal.load()
+        elif os.path.exists("cn.pkl"):
             f = open("cn.pkl", "r")
             self.cn = pickle.load(f)
             f.close()
+            if self.journal:
+                self.journal.create(self.cn)
+        elif self.journal:
+            self.cn = self.journal.load()
         else:
             self.cn = ConceptNetwork()
         self.loadUserState()
 
+    def compact(self):
+        """Use compact nodes, links and node states, which use less memory
+        (see CompactConceptNetwork).
+
+        The Concept Network is converted, and saved in its compact form by
+        the next dump (or in the journal)."""
+        if isinstance(self.cn, CompactConceptNetwork):
+            return
+        self.cn = compactNetwork(self.cn)
+        if self.journal:
+            self.journal.close()
+            self.journal.create(self.cn)
+
     def dump(self):
         """Save ECTOR.
 
-        Save the ConceptNetwork in cn.pkl, and the state in usernameState.pkl"""
-        # Save the ConceptNetwork
-        f = open("cn.pkl", "w")
-        self.cn.dump(f)
-        f.close()
-        # Save username's state
-        if self.username:
+        Save the ConceptNetwork in cn.pkl, and the state in usernameState.pkl
+
+        With a journal, the ConceptNetwork is already saved: the journal
+        is synced, and compacted in the background."""
+        self.dumpNetwork()
+        self.dumpState()
+
+    def dumpNetwork(self):
+        "Save the ConceptNetwork (see dump)"
+        if self.journal:
+            self.journal.flush()
+            self.journal.compact(wait=False)
+        else:
+            f = open("cn.pkl", "w")
+            self.cn.dump(f)
+            f.close()
+
+    def dumpState(self):
+        "Save the state of username in usernameState.pkl"
+        if self.username and self.states:
+            self.states.save(self.username)
+        elif self.username:
             filename = self.__getStateId()
             f = open(filename, "w")
             state = self.cn.getState(self.username)
@@ -249,7 +444,7 @@ class Ector:
 
     def __getStateId(self):
         """Create a state id from the username"""
-        return self.username + "_state.pkl"
+        return getStateFilename(self.username)
 
     def setUser(self, username):
         """Change user's name.
@@ -267,15 +462,14 @@ class Ector:
         self.botname = botname
 
     def loadUserState(self):
-        """Load the state matching username"""
-        if self.username:
-            filename = self.__getStateId()
-            if os.path.exists(filename):
-                f = open(filename, "r")
-                state = pickle.load(f)
-                f.close()
-            else:
-                state = State(self.username)
+        """Load the state matching username
+
+        When the ConceptNetwork already has it (it is shared with another
+        Ector), it is kept."""
+        if self.username and self.states:
+            self.states.getState(self.username)
+        elif self.username and self.username not in self.cn.state:
+            state = loadState(self.username, self.cn, self.__getStateId())
             self.cn.addState(state)
 
     def addEntry(self, entry):
@@ -289,12 +483,21 @@ class Ector:
 
         Return the last sentenceNode of the entry.
         """
+        instruments = self.instruments
+        if instruments:
+            start = time.time()
         state = self.cn.getState(self.username)
         e = Entry(entry, self.username, self.botname)
         sentences = e.getSentences()
+        if instruments:
+            instruments.addTime("entry", time.time() - start)
         lastSentenceNode = None
         for sentence in sentences:
+            if instruments:
+                start = time.time()
             sentenceNode = self.addSentence(sentence)
+            if instruments:
+                instruments.addTime("addSentence", time.time() - start)
             state.fullyActivate(sentence, "sentence")
             if lastSentenceNode:
                 self.cn.addLink(lastSentenceNode, sentenceNode)
@@ -322,12 +525,10 @@ class Ector:
         Return   the node of the sentence added."""
         state = self.cn.getState(self.username)
         # Activate the utterer, and add it to the concept network
-        uttererNode = UttererNode(self.username)
-        self.cn.addNode(uttererNode)
+        uttererNode = self.cn.addNode(UttererNode(self.username))
         state.fullyActivate(self.username, "utterer")
         # Add the sentence node to the concept network.
-        sentenceNode = SentenceNode(sentence)
-        self.cn.addNode(sentenceNode)
+        sentenceNode = self.cn.addNode(SentenceNode(sentence))
         #state.setNodeActivationValue(100, sentence, "sentence")
         state.fullyActivate(sentence, "sentence")
         # TODO: if the occurrence of the sentence node is only 1,
@@ -336,27 +537,13 @@ class Ector:
         # Link it to the utterer node.
         self.cn.addBidirectionalLink(uttererNode, sentenceNode)
         # Add the tokens to the concept network, link them to the sentence
-        e = Entry("None")
-        tokens = e.getTokens(sentence)
-        beginning = 1
-        middle = 0
-        end = 0
+        tokens = getTokens(sentence)
         previousTokenNode = None
-        i = 0
-        for token in tokens:
-            i += 1
-            if i == len(tokens):
-                end = 1
+        for token, beginning, middle, end in getTokenPositions(tokens):
             # Add the token node to the concept network
-            tokenNode = TokenNode(token, 1, beginning, middle, end)
-            self.cn.addNode(tokenNode)
+            tokenNode = self.cn.addNode(TokenNode(token, 1, beginning,
+                                                  middle, end))
             state.fullyActivate(token, "token")
-            if beginning:
-                beginning = 0
-                middle = 1
-            if middle and i == len(tokens) - 1:
-                middle = 0
-                end = 1
             # Link it to the previous node
             if previousTokenNode:
                 self.cn.addLink(previousTokenNode, tokenNode)
@@ -367,23 +554,39 @@ class Ector:
 
     def propagate(self, times=1):
         """Propagate the activation in the state of the utterer"""
+        instruments = self.instruments
+        if instruments:
+            start = time.time()
         state = self.cn.getState(self.username)
         for _ in range(times):
-            self.cn.fastPropagateActivations(state)
+            if self.epsilon is None:
+                counts = self.cn.fastPropagateActivations(state)
+            else:
+                counts = self.cn.frontierPropagateActivations(
+                    state, epsilon=self.epsilon)
+            if instruments and counts:
+                instruments.addCount("nodesTouched", counts[0])
+                instruments.addCount("linksTraversed", counts[1])
+        if instruments:
+            instruments.addTime("propagate", time.time() - start)
+            instruments.addCount("stateSize", len(state.nodeState))
 
     def getActivatedSentenceNode(self):
         """Get one of the most activated sentences"""
+        instruments = self.instruments
+        if instruments:
+            start = time.time()
         state = self.cn.getState(self.username)
         maximumAV = state.getMaximumActivationValue(self.cn, "sentence")
         sentences = state.getActivatedTypedNodes(self.cn, "sentence",
                                                  maximumAV - 10)
         # TODO: compute a temperature according the state's activations
-        temperature = Temperature(60)
-        if sentences:
-            sentenceNode = temperature.chooseWeightedItem(sentences)
-            return sentenceNode
-        else:
-            return ''
+        temperature = Temperature(60, rng=self.rng)
+        sentenceNode = sentences and temperature.chooseWeightedItem(sentences)
+        if instruments:
+            instruments.addTime("getActivatedSentenceNode",
+                                time.time() - start)
+        return sentenceNode or ''
 
     def showState(self, stateID):
         """Show the state matching stateID"""
@@ -397,87 +600,198 @@ class Ector:
         self.cn.getState(stateId)
         self.cn.showLinks(stateId)
 
-    def generateForward(self, phrase, temperature):
+    def generateForward(self, phrase, temperature, maxLength=None,
+                        deadline=None):
         """Generate the end of a sentence, adding tokens to the list
-        of token nodes in phrase."""
-        state = self.cn.getState(self.username)
-        outgoingLinks = phrase[-1].outgoingLinks
-        nextNodes = []
-        for link in outgoingLinks:
-            toNode = link.getNodeTo()
-            if toNode.getTypeName() == "token":
-                av = state.getNodeActivationValue(toNode.getSymbol(), "token")
-                if av == 0:
-                    av = 1
-                nbRepet = phrase.count(toNode)
-                length = len(toNode.getSymbol())
-                # If the node is not present more than 3 times
-                if nbRepet * length <= 5 * 3:
-                    repetition = 1 + nbRepet * nbRepet * length
-                    nextNodes += [(toNode, link.getCoOcc() * av / repetition)]
-        # Stop condition
-        if len(nextNodes) == 0:
-            return phrase
-        # Choose one node among the tokens following the one at the end
-        # of the phrase
-        chosenToken = temperature.chooseWeightedItem(nextNodes)
-        phrase += [chosenToken]
-
-        return self.generateForward(phrase, temperature)
-
-    def generateBackward(self, phrase, temperature):
+        of token nodes in phrase (see iterateForward).
+
+        Return phrase"""
+        for token in self.iterateForward(phrase, temperature, maxLength,
+                                         deadline):
+            pass
+        return phrase
+
+    def generateBackward(self, phrase, temperature, maxLength=None,
+                         deadline=None):
         """Generate the beginning of a sentence, adding tokens to the list
-        of token nodes in phrase."""
+        of token nodes in phrase (see iterateBackward).
+
+        Return phrase"""
+        for token in self.iterateBackward(phrase, temperature, maxLength,
+                                          deadline):
+            pass
+        return phrase
+
+    def iterateForward(self, phrase, temperature, maxLength=None,
+                       deadline=None, counts=None, activations=None,
+                       logProbs=None):
+        """Generate the end of a sentence, appending tokens to the list
+        of token nodes in phrase, and yielding them as they are chosen.
+
+        maxLength:   maximum length of phrase
+        deadline:    time (see time.time) after which no token is chosen
+        counts:      occurrences of the nodes in phrase (updated)
+        activations: activation values of the tokens (see
+                     getTokenActivations)
+        logProbs:    when given, list to which the log-probability of
+                     each choice is appended (see chooseToken)"""
+        successors = getSuccessorCache(self.cn)
+        if counts is None:
+            counts = countNodes(phrase)
+        if activations is None:
+            activations = self.getTokenActivations()
+        while not maxLength or len(phrase) < maxLength:
+            if deadline and time.time() >= deadline:
+                break
+            nodes, coOccs = successors.getSuccessors(phrase[-1])
+            nextNodes = self.weighTokens(activations, counts, nodes, coOccs,
+                                         True)
+            # Stop condition
+            if len(nextNodes) == 0:
+                break
+            # Choose one node among the tokens following the one at the end
+            # of the phrase
+            chosenToken = self.chooseToken(temperature, nextNodes, logProbs)
+            phrase.append(chosenToken)
+            counts[chosenToken] = counts.get(chosenToken, 0) + 1
+            yield chosenToken
+
+    def iterateBackward(self, phrase, temperature, maxLength=None,
+                        deadline=None, counts=None, activations=None,
+                        logProbs=None):
+        """Generate the beginning of a sentence, inserting tokens at the
+        beginning of the list of token nodes in phrase, and yielding them
+        as they are chosen (see iterateForward)."""
+        successors = getSuccessorCache(self.cn)
+        if counts is None:
+            counts = countNodes(phrase)
+        if activations is None:
+            activations = self.getTokenActivations()
+        while not maxLength or len(phrase) < maxLength:
+            if deadline and time.time() >= deadline:
+                break
+            nodes, coOccs = successors.getPredecessors(phrase[0])
+            previousNodes = self.weighTokens(activations, counts, nodes,
+                                             coOccs, False)
+            # Stop condition
+            if len(previousNodes) == 0:
+                break
+            # Choose one node among the tokens preceding the one at the
+            # beginning of the phrase
+            chosenToken = self.chooseToken(temperature, previousNodes,
+                                           logProbs)
+            phrase.insert(0, chosenToken)
+            counts[chosenToken] = counts.get(chosenToken, 0) + 1
+            yield chosenToken
+
+    def chooseToken(self, temperature, tokens, logProbs=None):
+        """Choose a token among the weighted tokens, according to the
+        temperature
+
+        logProbs: when given, list to which the log-probability of the
+                  token chosen is appended (its urgency divided by the sum
+                  of the urgencies, see Temperature.getUrgencies)
+
+        Return the token node"""
+        if logProbs is None:
+            return temperature.chooseWeightedItem(tokens)
+        urgencies = temperature.getUrgencies(tokens)
+        chosenToken = temperature.chooseWeightedItem(tokens, urgencies)
+        total = sum(urgencies)
+        for (token, weight), urgency in zip(tokens, urgencies):
+            if token is chosenToken:
+                logProbs.append(log(max(urgency, MIN_WEIGHT) /
+                                    float(max(total, MIN_WEIGHT))))
+                break
+        return chosenToken
+
+    def getTokenActivations(self):
+        """Get the activation values of the tokens of the state
+
+        Return a dictionary symbol -> activation value"""
         state = self.cn.getState(self.username)
-        incomingLinks = phrase[0].incomingLinks
-#        previousNodes    = [(link.getNodeFrom(), link.getCoOc())
-#                            for link in incomingLinks
-#                            if link.getNodeFrom().getTypeName() == "token"]
-        previousNodes = []
-        for link in incomingLinks:
-            fromNode = link.getNodeFrom()
-            if fromNode.getTypeName() == "token":
-                av = state.getNodeActivationValue(fromNode.getSymbol(), "token")
-                if av == 0:
-                    av = 1
-                nbRepet = phrase.count(fromNode)
-                length = len(fromNode.getSymbol())
-                # If the node is not present more than 3 times
-                if nbRepet * length <= 5 * 3:
-                    # repetition = 1 + nbRepet * nbRepet * length
-                    previousNodes += [(link.getNodeFrom(), link.getCoOcc() * av)]
-        # Stop condition
-        if len(previousNodes) == 0:
-            return phrase
-        # Choose one node among the tokens preceding the one at the beginning
-        # of the phrase
-        chosenToken = temperature.chooseWeightedItem(previousNodes)
-        phrase = [chosenToken] + phrase
-
-        return self.generateBackward(phrase, temperature)
-
-    def generateSentence(self, debug=False):
+        if isinstance(state, SparseState):
+            nodeStates = state.getTypedNodeStates(["token"])
+        else:
+            nodeStates = [(nodeId, nodeState)
+                          for nodeId, nodeState in state.nodeState.iteritems()
+                          if nodeId[1] == "token"]
+        return dict([(symbol, nodeState.getActivationValue())
+                     for (symbol, typeName), nodeState in nodeStates])
+
+    def weighTokens(self, activations, counts, nodes, coOccs, repetition):
+        """Weigh the token nodes which may be added to a phrase, by their
+        co-occurrence and activation value.
+
+        activations: activation values of the tokens
+        counts:      occurrences of the nodes in the phrase
+        nodes:       candidate token nodes
+        coOccs:      co-occurrences of their links with the phrase
+        repetition:  when True, the weights of the tokens already in the
+                     phrase are divided (by 1 + repetitions^2 * length)
+
+        Return a list of tuples (node, weight), without the tokens present
+        too many times in the phrase"""
+        weighted = []
+        for node, coOcc in zip(nodes, coOccs):
+            symbol = node.getSymbol()
+            av = activations.get(symbol, 0) or 1
+            nbRepet = counts.get(node, 0)
+            length = len(symbol)
+            # If the node is not present more than 3 times
+            if nbRepet * length <= 5 * 3:
+                if repetition:
+                    weighted.append((node, coOcc * av /
+                                     (1 + nbRepet * nbRepet * length)))
+                else:
+                    weighted.append((node, coOcc * av))
+        return weighted
+
+    def getActivatedTokens(self):
+        """Get the most activated token nodes
+
+        Return a list of tuples (node, activation value)"""
+        state = self.cn.getState(self.username)
+        maximumAV = state.getMaximumActivationValue(self.cn, "token")
+        return state.getActivatedTypedNodes(self.cn, "token", maximumAV - 10)
+
+    def chooseFirstToken(self, temperature):
+        "Choose a token node among the most activated"
+        return temperature.chooseWeightedItem(self.getActivatedTokens())
+
+    def generateSentence(self, debug=False, maxLength=None, timeBudget=None):
         """Get one node, generate a sentence from it forwards to the end
         of the sentence, and then generate backwards to the beginning of
         the sentence.
 
+        maxLength:  maximum number of tokens of the sentence
+        timeBudget: time (in seconds) after which no token is added
+
         Return a tuple containing the generated sentence as a string and
         the nodes of the sentence."""
-        # Choose a token node among the most activated
-        state = self.cn.getState(self.username)
-        maximumAV = state.getMaximumActivationValue(self.cn, "token")
-        tokens = state.getActivatedTypedNodes(self.cn, "token",
-                                              maximumAV - 10)
+        instruments = self.instruments
+        if instruments:
+            start = time.time()
+        deadline = timeBudget and time.time() + timeBudget
         # TODO: compute a temperature according the state's activations
-        temperature = Temperature(60)
-        chosenToken = temperature.chooseWeightedItem(tokens)
+        temperature = Temperature(60, rng=self.rng)
+        chosenToken = self.chooseFirstToken(temperature)
 
         phrase = [chosenToken]
+        counts = {chosenToken: 1}
+        activations = self.getTokenActivations()
         # Generate forwards
-        phrase = self.generateForward(phrase, temperature)
+        for token in self.iterateForward(phrase, temperature, maxLength,
+                                         deadline, counts, activations):
+            pass
         # Generate backwards
-        phrase = self.generateBackward(phrase, temperature)
+        for token in self.iterateBackward(phrase, temperature, maxLength,
+                                          deadline, counts, activations):
+            pass
         strPhrase = [token.getSymbol() for token in phrase]
+        if instruments:
+            instruments.addTime("generateSentence", time.time() - start)
+            instruments.addCount("tokensGenerated", len(phrase))
         if debug:
             return (("_".join(strPhrase)) + " (%s)" % chosenToken.getSymbol(),
                     phrase)
@@ -485,6 +799,97 @@ class Ector:
             return (self.beautifySentence(" ".join(strPhrase)),
                     phrase)
 
+    def generateSentences(self, nb, maxLength=None, timeBudget=None,
+                          score="logprob"):
+        """Generate nb candidate sentences (see generateSentence), and
+        score them.
+
+        The activation values of the tokens, and the choice of the first
+        tokens (an AliasSampler) are computed once for all the candidates.
+
+        maxLength:  maximum number of tokens of a sentence
+        timeBudget: time (in seconds) after which no token is added, and
+                    no other candidate is generated (there is at least
+                    one candidate)
+        score:      "logprob": mean log-probability of the choices of the
+                    tokens (under the urgencies of the temperature, for
+                    the first token as for the next ones),
+                    "activation": mean activation value of the tokens
+
+        Return a list of tuples (score, sentence, nodes), best first"""
+        instruments = self.instruments
+        if instruments:
+            start = time.time()
+        deadline = timeBudget and time.time() + timeBudget
+        temperature = Temperature(60, rng=self.rng)
+        tokens = self.getActivatedTokens()
+        urgencies = temperature.getUrgencies(tokens)
+        firstTokens = AliasSampler(tokens, urgencies, temperature.random)
+        total = float(sum(urgencies))
+        urgencies = dict(zip([token for (token, av) in tokens], urgencies))
+        activations = self.getTokenActivations()
+        candidates = []
+        while len(candidates) < nb:
+            if candidates and deadline and time.time() >= deadline:
+                break
+            chosenToken = firstTokens.choose()
+            phrase = [chosenToken]
+            counts = {chosenToken: 1}
+            logProbs = [log(max(urgencies[chosenToken], MIN_WEIGHT) /
+                            max(total, MIN_WEIGHT))]
+            for token in self.iterateForward(phrase, temperature, maxLength,
+                                             deadline, counts, activations,
+                                             logProbs):
+                pass
+            for token in self.iterateBackward(phrase, temperature, maxLength,
+                                              deadline, counts, activations,
+                                              logProbs):
+                pass
+            if score == "activation":
+                value = sum([activations.get(token.getSymbol(), 0)
+                             for token in phrase]) / float(len(phrase))
+            else:
+                value = sum(logProbs) / len(logProbs)
+            sentence = " ".join([token.getSymbol() for token in phrase])
+            candidates.append((value, self.beautifySentence(sentence),
+                               phrase))
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        if instruments:
+            instruments.addTime("generateSentences", time.time() - start)
+            instruments.addCount("candidates", len(candidates))
+        return candidates
+
+    def generateBestSentence(self, nb=5, maxLength=None, timeBudget=None,
+                             score="logprob"):
+        """Generate nb candidate sentences, and get the best one (see
+        generateSentences)
+
+        Return a tuple containing the sentence as a string and its nodes"""
+        value, sentence, phrase = self.generateSentences(nb, maxLength,
+                                                         timeBudget, score)[0]
+        return sentence, phrase
+
+    def streamSentence(self, maxLength=None, timeBudget=None):
+        """Generate a sentence (see generateSentence), yielding its token
+        nodes in the order of the sentence.
+
+        The beginning of the sentence is generated first (backwards), and
+        yielded at once; then the tokens of its end are yielded as soon as
+        they are chosen."""
+        deadline = timeBudget and time.time() + timeBudget
+        temperature = Temperature(60, rng=self.rng)
+        phrase = [self.chooseFirstToken(temperature)]
+        counts = countNodes(phrase)
+        activations = self.getTokenActivations()
+        for token in self.iterateBackward(phrase, temperature, maxLength,
+                                          deadline, counts, activations):
+            pass
+        for token in list(phrase):
+            yield token
+        for token in self.iterateForward(phrase, temperature, maxLength,
+                                         deadline, counts, activations):
+            yield token
+
     def beautifySentence(self, sentence):
         """Beautify a string, which is a generated sentence, where
         tokens (words and punctuation) are separated by spaces.
@@ -502,9 +907,77 @@ class Ector:
         return sentence
 
     def cleanState(self):
-        """Clean the not activated nodes states in the state"""
+        """Clean the not activated nodes states in the state, and the ones
+        of the nodes removed from the Concept Network since the state was
+        saved (see Pruner)"""
+        instruments = self.instruments
+        if instruments:
+            start = time.time()
         state = self.cn.getState(self.username)
         state.clean()
+        node = self.cn.node
+        for key in [key for key in state.nodeState if key not in node]:
+            state.removeNodeState(*key)
+        if instruments:
+            instruments.addTime("cleanState", time.time() - start)
+
+    def getStats(self):
+        """Get the statistics of the instruments (see Instruments.getStats,
+        the timers and counters are empty without instruments), and of the
+        cache of the link weights (see WeightCache.getStats)
+
+        Return a dictionary (timers, counters, weights)"""
+        if self.instruments:
+            stats = self.instruments.getStats()
+        else:
+            stats = {"timers": {}, "counters": {}}
+        stats["weights"] = self.cn.weights.getStats()
+        return stats
+
+
+def countNodes(nodes):
+    "Get the number of occurrences of each node of the list nodes"
+    counts = {}
+    for node in nodes:
+        counts[node] = counts.get(node, 0) + 1
+    return counts
+
+
+def iterateText(symbols):
+    """Join the symbols of the tokens of a sentence, like
+    Ector.beautifySentence does, as they come.
+
+    Return an iterator on the text to add for each symbol"""
+    previous = None
+    for symbol in symbols:
+        if previous is None or symbol in NO_SPACE_BEFORE or \
+           previous in NO_SPACE_AFTER:
+            yield symbol
+        else:
+            yield " " + symbol
+        previous = symbol
+
+
+def getTokenPositions(tokens):
+    """Get the position of each token in its sentence.
+
+    Return an iterator on tuples (token, beginning, middle, end), where
+    beginning, middle and end are the occurrences given to the TokenNode"""
+    beginning = 1
+    middle = 0
+    end = 0
+    i = 0
+    for token in tokens:
+        i += 1
+        if i == len(tokens):
+            end = 1
+        yield token, beginning, middle, end
+        if beginning:
+            beginning = 0
+            middle = 1
+        if middle and i == len(tokens) - 1:
+            middle = 0
+            end = 1
 
 
 def logEntry(filename, utterer, entry, encoding=ENCODING):
@@ -527,7 +1000,7 @@ def main():
     TokenNode.__decay = 20
     from optparse import OptionParser
 
-    usage = "usage: %prog [-p username][-n botname=Ector][-v|-q][-l logfilepath=ector.log][-s|-g][-h]"
+    usage = "usage: %prog [-p username][-n botname=Ector][-v|-q][-l logfilepath=ector.log][-s|-g][-e epsilon][-j journal][-m][-i][-h]"
     parser = OptionParser(usage=usage, version="%prog 0.3")
     parser.add_option("-p", "--person", dest="username", default="User",
                       help="set the name of the utterer")
@@ -545,6 +1018,16 @@ def main():
                       help="set generate reply mode on")
     parser.add_option("-d", "--debug", action="store_true", dest="debug", default=False,
                       help="set debug mode on")
+    parser.add_option("-j", "--journal", dest="journal", default=None,
+                      help="store the Concept Network in an append-only journal (path prefix)")
+    parser.add_option("-c", "--compaction", dest="compaction", type="int", default=3600,
+                      help="compact the journal every COMPACTION seconds")
+    parser.add_option("-e", "--epsilon", dest="epsilon", type="float", default=None,
+                      help="propagate from the activated nodes only, forgetting the nodes below epsilon")
+    parser.add_option("-m", "--compact", action="store_true", dest="compact", default=False,
+                      help="convert the Concept Network to compact nodes and links, using less memory")
+    parser.add_option("-i", "--instruments", action="store_true", dest="instruments", default=False,
+                      help="measure the time of the stages of each turn (see @stats)")
 
     (options, args) = parser.parse_args()
 
@@ -565,7 +1048,14 @@ def main():
         sentence_mode = False
         generate_mode = False
 
-    ector = Ector(botname, username)
+    ector = Ector(botname, username, options.journal)
+    if options.compact:
+        ector.compact()
+    if ector.journal:
+        ector.journal.startCompaction(options.compaction)
+    ector.epsilon = options.epsilon
+    if options.instruments:
+        ector.instruments = Instruments()
 
     previousSentenceNode = None
     nodes = None
@@ -579,153 +1069,179 @@ under certain conditions; type `@show c' for details.
     ector_path = os.path.dirname(sys.argv[0])
     license_path = os.path.abspath(ector_path + "/../LICENSE")
 
-    while True:
-        if stdin.closed:
-            break
-        stdout.write(username + ">")
-        entry = stdin.readline().strip()
-
-        # No Warranty
-        if entry[:7] == "@show w":
-            if not license:
-                f = open(license_path)
-                license = f.readlines()
-                f.close()
-            for i in range(257, 278):
-                stdout.write(license[i])
-        # Conditions
-        elif entry[:7] == "@show c":
-            if not license:
-                f = open(license_path)
-                license = f.readlines()
-                f.close()
-            for i in range(57, 256):
-                stdout.write(license[i])
-        elif entry[:6] == "@usage":
-            print usage.replace("%prog", "Ectory.py")
-        elif entry[:7] == "@status":
-            ector.showStatus()
-        elif entry[:8] == "@person ":
-            username = entry[8:].strip()
-            ector.setUser(username)
-        elif entry[:6] == "@name ":
-            botname = entry[6:].strip()
-            ector.setName(botname)
-        elif entry[:8] == "@version":
-            print "pyECTOR version %s" % (version)
-        elif entry[:6] == "@write":
-            ector.dump()
-        elif entry[:5] == "@quit" or entry[:5] == "@exit" or entry[:4] == "@bye":
-            return 0
-        elif entry[:10] == "@shownodes":
-            ector.cn.showNodes()
-        elif entry[:10] == "@showlinks":
-            ector.showLinks()
-        elif entry == "@showstate":
-            ector.showState(username)
-        elif entry == "@cleanstate":
-            ector.cleanState()
-        elif entry.startswith("@log "):
-            logfilename = entry[5:]
-            print "Log file: %s" % (logfilename)
-        elif entry == "@log" or entry == "@logoff":
-            print "Log off (%s)" % logfilename
-            logfilename = ''
-        elif entry.lower() == "@sentence on":
-            sentence_mode = True
-            generate_mode = False     # sentence and generate modes are not compatible
-            print "Sentence reply mode ON"
-        elif entry.lower() == "@sentence off":
-            sentence_mode = False
-            print "Sentence reply mode OFF"
-        elif entry.lower() == "@sentence":
-            print "Sentence reply mode", sentence_mode and "ON" or "OFF"
-        elif entry.lower() == "@generate on":
-            sentence_mode = False
-            generate_mode = True     # sentence and generate modes are not compatible
-            print "Generate reply mode ON"
-        elif entry.lower() == "@generate off":
-            generate_mode = False
-            print "Sentence reply mode OFF"
-        elif entry.lower() == "@generate":
-            print "Generate reply mode", generate_mode and "ON" or "OFF"
-        elif entry.lower() == "@debug on":
-            debug = True
-            print "Debug mode ON"
-        elif entry.lower() == "@debug off":
-            debug = False
-            print "Debug mode OFF"
-        elif entry.lower() == "@debug":
-            print "Debug mode", debug and "ON" or "OFF"
-        # Help
-        elif entry[:5] == "@help":
-            print """You can just start typing phrases.
-But there are some commands you can use:
- - @usage     : print the options of the Ector.py command
- - @quit      : quit
- - @exit      : quit
- - @bye       : quit
- - @person    : change the utterer name (like -p)
- - @name      : change the bot's name (like -n)
- - @version   : give the current version
- - @write     : save Ector's Concept Network and state
- - @shownodes : show the nodes of the Concept Network
- - @showlinks : show the links of the Concept Network
- - @showstate : show the state of the nodes
- - @cleanstate: clean the state from the non-activated nodes
- - @log [file]: log the entries in the file (no file turns off the logging)
- - @status    : show the status of Ector (Concept Network, states)
- - @sentence [ON|OFF]: set the sentence reply mode
- - @generate [ON|OFF]: set the generate reply mode
- - @debug [ON|OFF]: set the debug mode on or off"""
-        elif entry.startswith("@"):
-            print "There is no command", entry
-        elif entry:
-            entry = unicode(entry, ENCODING)
-            lastSentenceNode = ector.addEntry(entry)
-            if previousSentenceNode:
-                ector.cn.addLink(previousSentenceNode, lastSentenceNode)
-            elif sentence_mode:
-                # First sentence of a dialogue
-                lastSentenceNode.beg += 1
-
-            if nodes and lastSentenceNode:
-                # Make a link from the nodes of the generated
-                # sentence to the next entry.
-                # BEWARE: may make a link co-occurrence greater than the
-                # sentence node occurrence.
-                for node in nodes:
-                    ector.cn.addLink(node, lastSentenceNode)
-
-            previousSentenceNode = lastSentenceNode
-            # if log is activated, log the entry.
-            if logfilename:
-                logEntry(logfilename, username, entry)
-            # Propagate activation
-            ector.cleanState()
-            ector.propagate(2)
-#            ector.showState(username)
-             # Get the reply
-            reply = None
-            if sentence_mode:
-                # Get one of the most activated sentences
-                replyNode = ector.getActivatedSentenceNode()
-                reply = replyNode.getSymbol()
-                reply = reply.replace("@bot@",  username)
-                reply = reply.replace("@user@", botname)
-                previousSentenceNode = replyNode
-            elif generate_mode:
-                (reply, nodes) = ector.generateSentence(debug)
-                reply = reply.replace("@bot@",  username)
-                reply = reply.replace("@user@", botname)
-                previousSentenceNode = None
-            if reply:
-                print "%s>" % (ector.botname), reply.encode(ENCODING)
+    try:
+        while True:
+            if stdin.closed:
+                break
+            stdout.write(username + ">")
+            line = stdin.readline()
+            if not line:
+                # End of the input
+                break
+            entry = line.strip()
+
+            # No Warranty
+            if entry[:7] == "@show w":
+                if not license:
+                    f = open(license_path)
+                    license = f.readlines()
+                    f.close()
+                for i in range(257, 278):
+                    stdout.write(license[i])
+            # Conditions
+            elif entry[:7] == "@show c":
+                if not license:
+                    f = open(license_path)
+                    license = f.readlines()
+                    f.close()
+                for i in range(57, 256):
+                    stdout.write(license[i])
+            elif entry[:6] == "@usage":
+                print usage.replace("%prog", "Ectory.py")
+            elif entry[:7] == "@status":
+                ector.showStatus()
+            elif entry.lower() == "@stats on":
+                ector.instruments = ector.instruments or Instruments()
+                print "Instruments ON"
+            elif entry.lower() == "@stats off":
+                ector.instruments = None
+                print "Instruments OFF"
+            elif entry.lower() == "@stats reset":
+                if ector.instruments:
+                    ector.instruments.reset()
+                print "Instruments reset"
+            elif entry.lower() == "@stats":
+                if ector.instruments:
+                    ector.instruments.show()
+                else:
+                    print "Instruments OFF (@stats on to turn them on)"
+                print "Weight cache:", ector.cn.weights.getStats()
+            elif entry[:8] == "@person ":
+                username = entry[8:].strip()
+                ector.setUser(username)
+            elif entry[:6] == "@name ":
+                botname = entry[6:].strip()
+                ector.setName(botname)
+            elif entry[:8] == "@version":
+                print "pyECTOR version %s" % (version)
+            elif entry[:6] == "@write":
+                ector.dump()
+            elif entry[:5] == "@quit" or entry[:5] == "@exit" or entry[:4] == "@bye":
+                return 0
+            elif entry[:10] == "@shownodes":
+                ector.cn.showNodes()
+            elif entry[:10] == "@showlinks":
+                ector.showLinks()
+            elif entry == "@showstate":
+                ector.showState(username)
+            elif entry == "@cleanstate":
+                ector.cleanState()
+            elif entry.startswith("@log "):
+                logfilename = entry[5:]
+                print "Log file: %s" % (logfilename)
+            elif entry == "@log" or entry == "@logoff":
+                print "Log off (%s)" % logfilename
+                logfilename = ''
+            elif entry.lower() == "@sentence on":
+                sentence_mode = True
+                generate_mode = False     # sentence and generate modes are not compatible
+                print "Sentence reply mode ON"
+            elif entry.lower() == "@sentence off":
+                sentence_mode = False
+                print "Sentence reply mode OFF"
+            elif entry.lower() == "@sentence":
+                print "Sentence reply mode", sentence_mode and "ON" or "OFF"
+            elif entry.lower() == "@generate on":
+                sentence_mode = False
+                generate_mode = True     # sentence and generate modes are not compatible
+                print "Generate reply mode ON"
+            elif entry.lower() == "@generate off":
+                generate_mode = False
+                print "Sentence reply mode OFF"
+            elif entry.lower() == "@generate":
+                print "Generate reply mode", generate_mode and "ON" or "OFF"
+            elif entry.lower() == "@debug on":
+                debug = True
+                print "Debug mode ON"
+            elif entry.lower() == "@debug off":
+                debug = False
+                print "Debug mode OFF"
+            elif entry.lower() == "@debug":
+                print "Debug mode", debug and "ON" or "OFF"
+            # Help
+            elif entry[:5] == "@help":
+                print """You can just start typing phrases.
+    But there are some commands you can use:
+     - @usage     : print the options of the Ector.py command
+     - @quit      : quit
+     - @exit      : quit
+     - @bye       : quit
+     - @person    : change the utterer name (like -p)
+     - @name      : change the bot's name (like -n)
+     - @version   : give the current version
+     - @write     : save Ector's Concept Network and state
+     - @shownodes : show the nodes of the Concept Network
+     - @showlinks : show the links of the Concept Network
+     - @showstate : show the state of the nodes
+     - @cleanstate: clean the state from the non-activated nodes
+     - @log [file]: log the entries in the file (no file turns off the logging)
+     - @status    : show the status of Ector (Concept Network, states)
+     - @stats [ON|OFF|RESET]: show the times of the stages of the turns (like -i)
+     - @sentence [ON|OFF]: set the sentence reply mode
+     - @generate [ON|OFF]: set the generate reply mode
+     - @debug [ON|OFF]: set the debug mode on or off"""
+            elif entry.startswith("@"):
+                print "There is no command", entry
+            elif entry:
+                entry = unicode(entry, ENCODING)
+                lastSentenceNode = ector.addEntry(entry)
+                if previousSentenceNode:
+                    ector.cn.addLink(previousSentenceNode, lastSentenceNode)
+                elif sentence_mode:
+                    # First sentence of a dialogue
+                    lastSentenceNode.beg += 1
+
+                if nodes and lastSentenceNode:
+                    # Make a link from the nodes of the generated
+                    # sentence to the next entry.
+                    # BEWARE: may make a link co-occurrence greater than the
+                    # sentence node occurrence.
+                    for node in nodes:
+                        ector.cn.addLink(node, lastSentenceNode)
+
+                previousSentenceNode = lastSentenceNode
+                # if log is activated, log the entry.
                 if logfilename:
-                    logEntry(logfilename, botname, reply)
-        else:
-            if debug:
-                print "No entry given."
+                    logEntry(logfilename, username, entry)
+                # Propagate activation
+                ector.cleanState()
+                ector.propagate(2)
+    #            ector.showState(username)
+                 # Get the reply
+                reply = None
+                if sentence_mode:
+                    # Get one of the most activated sentences
+                    replyNode = ector.getActivatedSentenceNode()
+                    reply = replyNode.getSymbol()
+                    reply = reply.replace("@bot@",  username)
+                    reply = reply.replace("@user@", botname)
+                    previousSentenceNode = replyNode
+                elif generate_mode:
+                    (reply, nodes) = ector.generateSentence(debug)
+                    reply = reply.replace("@bot@",  username)
+                    reply = reply.replace("@user@", botname)
+                    previousSentenceNode = None
+                if reply:
+                    print "%s>" % (ector.botname), reply.encode(ENCODING)
+                    if logfilename:
+                        logEntry(logfilename, botname, reply)
+            else:
+                if debug:
+                    print "No entry given."
+    finally:
+        # Stop the compactions before the interpreter kills them
+        if ector.journal:
+            ector.journal.close()
 
 
 if __name__ == "__main__":
@@ -34,6 +34,11 @@ __copyright__ = "Copyright (c) 2008 François Parmentier"
 __license__   = "GPL"
 
 from Ector import *
+from math import log
+import os
+import random
+import shutil
+import tempfile
 import unittest
 
 
@@ -66,6 +71,171 @@ class EctorTest(unittest.TestCase):
         link     = ector.cn.getLink(doToken, youToken)
         self.assertEqual(2, link.getCoOcc())
 
+    def testTokenLinksOnce(self):
+        """The links between tokens are attached once to the token nodes of
+        the Concept Network"""
+        ector    =    Ector()
+        ector.addSentence("how do you do?")
+        ector.addSentence("do you?")
+        doToken  = ector.cn.getNode("do", "token")
+        youToken = ector.cn.getNode("you", "token")
+        link     = ector.cn.getLink(doToken, youToken)
+        self.assertEqual(1, list(doToken.outgoingLinks).count(link))
+        self.assertTrue(link in youToken.incomingLinks)
+
+    def testFrontierPropagate(self):
+        """With an epsilon, the propagation keeps only activated nodes"""
+        ector    =    Ector()
+        ector.addEntry("Hello you.")
+        ector.addEntry("How are you?")
+        ector.epsilon = 1
+        ector.propagate(2)
+        state    = ector.cn.getState(ector.username)
+        for nodeState in state.nodeState.values():
+            self.assertTrue(nodeState.getActivationValue() >= 1)
+
+    def testCompact(self):
+        """A compact Ector learns like before"""
+        ector    =    Ector()
+        compactEctor = Ector()
+        for e in (ector, compactEctor):
+            e.addEntry("Hello you.")
+        compactEctor.compact()
+        for e in (ector, compactEctor):
+            e.addEntry("How are you?")
+        you      = ector.cn.getNode("you", "token")
+        compactYou = compactEctor.cn.getNode("you", "token")
+        self.assertTrue(isinstance(compactYou, CompactTokenNode))
+        self.assertEqual(2, compactYou.getOcc())
+        self.assertEqual(you.getMiddleOccurrence(), compactYou.getMiddleOccurrence())
+        self.assertEqual(you.getEndOccurrence(), compactYou.getEndOccurrence())
+        self.assertTrue(isinstance(compactEctor.cn.getNode("How are you?", "sentence"),
+                                   CompactSentenceNode))
+        self.assertTrue(isinstance(compactEctor.cn.getNode("User", "utterer"),
+                                   CompactUttererNode))
+        compactEctor.propagate(2)
+
+    def testCompactJournalState(self):
+        """After a compaction with a journal, the user's state is loaded
+        from its file, not from the snapshot of the journal"""
+        directory = tempfile.mkdtemp()
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            ector = Ector("Ector", "Alice", journal="cn")
+            ector.addEntry("Hello you.")
+            ector.compact()
+            ector.addEntry("How are you doing today, my friend?")
+            ector.dumpState()
+            ector.journal.close()
+            saved = pickle.load(open(getStateFilename("Alice"), "rb"))
+            ector = Ector("Ector", "Alice", journal="cn")
+            ector.journal.close()
+            self.assertEqual({}, Journal("cn").readSnapshot()[1].state)
+            state = ector.cn.getState("Alice")
+            self.assertEqual(sorted(saved.nodeState), sorted(state.nodeState))
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(directory)
+
+    def testSeededReplies(self):
+        """With the same seeded random number generator, the generated
+        sentences are the same"""
+        sentences = []
+        for _ in range(2):
+            ector = Ector("Ector", "User", cn=ConceptNetwork())
+            ector.rng = random.Random(3)
+            for entry in ("Hello you.", "How are you?", "You are fine."):
+                ector.addEntry(entry)
+            ector.propagate(2)
+            sentences.append([ector.generateSentence()[0] for i in range(5)])
+        self.assertEqual(sentences[0], sentences[1])
+
+    def testGenerationLimits(self):
+        """A generated sentence is at most maxLength tokens long, and is
+        streamed in order"""
+        ector = Ector("Ector", "User", cn=ConceptNetwork())
+        ector.rng = random.Random(3)
+        for entry in ("Hello you, how are you doing today, my friend?",
+                      "You are doing fine, my friend."):
+            ector.addEntry(entry)
+        ector.propagate(2)
+        sentence, nodes = ector.generateSentence(maxLength=3)
+        self.assertTrue(1 <= len(nodes) <= 3)
+        sentence, nodes = ector.generateSentence(timeBudget=-1)
+        self.assertEqual(1, len(nodes))
+        nodes = list(ector.streamSentence())
+        symbols = [node.getSymbol() for node in nodes]
+        self.assertEqual(ector.beautifySentence(" ".join(symbols)),
+                         "".join(iterateText(symbols)))
+
+    def testCandidates(self):
+        """Candidate sentences are scored, best first"""
+        ector = Ector("Ector", "User", cn=ConceptNetwork())
+        ector.rng = random.Random(5)
+        for entry in ("Hello you, how are you?", "You are fine, I am fine.",
+                      "How are you doing?"):
+            ector.addEntry(entry)
+        ector.propagate(2)
+        for score in ("logprob", "activation"):
+            candidates = ector.generateSentences(5, score=score)
+            self.assertEqual(5, len(candidates))
+            scores = [value for (value, sentence, nodes) in candidates]
+            self.assertEqual(sorted(scores, reverse=True), scores)
+        candidates = ector.generateSentences(5, timeBudget=-1)
+        self.assertEqual(1, len(candidates))
+        sentence, nodes = ector.generateBestSentence(3)
+        self.assertTrue(nodes)
+
+    def testChooseTokenLogProb(self):
+        """The log-probability of a choice is the one of its urgency"""
+        ector = Ector("Ector", "User", cn=ConceptNetwork())
+        temperature = Temperature(60, rng=random.Random(0))
+        tokens = [("a", 1), ("b", 3)]
+        urgencies = temperature.getUrgencies(tokens)
+        for i in range(10):
+            logProbs = []
+            token = ector.chooseToken(temperature, tokens, logProbs)
+            urgency = urgencies[[t for (t, w) in tokens].index(token)]
+            self.assertAlmostEqual(log(urgency / sum(urgencies)),
+                                   logProbs[0])
+
+    def testLongChain(self):
+        """Generating a long sentence does not recurse"""
+        ector = Ector("Ector", "User", cn=ConceptNetwork())
+        ector.addEntry(" ".join(["w%d" % i for i in range(2000)]) + ".")
+        ector.propagate(1)
+        phrase = ector.generateForward([ector.cn.getNode("w0", "token")],
+                                       Temperature(60))
+        self.assertEqual(2001, len(phrase))
+
+    def testInstruments(self):
+        """With instruments, the stages of a turn are timed and counted;
+        without them, nothing is measured"""
+        ector = Ector("Ector", "User", cn=ConceptNetwork())
+        ector.addEntry("Hello you.")
+        ector.propagate(2)
+        self.assertEqual({}, ector.getStats()["timers"])
+        ector.instruments = Instruments()
+        ector.addEntry("How are you? I am fine.")
+        ector.cleanState()
+        ector.propagate(2)
+        ector.generateSentence()
+        ector.getActivatedSentenceNode()
+        stats = ector.getStats()
+        timers = stats["timers"]
+        self.assertEqual(["addSentence", "cleanState", "entry",
+                          "generateSentence", "getActivatedSentenceNode",
+                          "propagate"], sorted(timers))
+        self.assertEqual(2, timers["addSentence"]["count"])
+        self.assertEqual(1, timers["propagate"]["count"])
+        counters = stats["counters"]
+        self.assertEqual(2, counters["nodesTouched"]["count"])
+        self.assertTrue(counters["linksTraversed"]["total"] > 0)
+        state = ector.cn.getState(ector.username)
+        self.assertEqual(len(state.nodeState), counters["stateSize"]["last"])
+        self.assertTrue(stats["weights"]["hits"] > 0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -45,11 +45,65 @@ reURL      = re.compile(r"(?:http|ftp|file)://(?:[a-z0-9]+\.){1,3}[a-z0-9]+", re
 
 #r"(([a-zA-Z][0-9a-zA-Z+\\-\\.]*:)?/{0,2}[0-9a-zA-Z;/?:@&=+$\\.\\-_!~*'()%]+)?(#[0-9a-zA-Z;/?:@&=+$\\.\\-_!~*'()%]+)?"
 #r"(?:http|ftp|file)://(?:[a-z0-9]+\.){1,3}[a-z0-9]+"
-reSMILEYS  = re.compile(r"[<=>]?[X:B8][\-o]?[)(ODPp\]\[]",  re.UNICODE)
+SMILEY     = r"[<=>]?[X:B8][\-o]?[)(ODPp\]\[]"
+WORD_SEP   = r'[\.,;!?+=\-()\[\]"'+r"\':/]"
+reSMILEYS  = re.compile(SMILEY,  re.UNICODE)
 reWORDS    = re.compile(r'\b\w+\b',  re.UNICODE)
-reWORD_SEP = re.compile(r'[\.,;!?+=\-()\[\]"'+r"\':/]+",    re.UNICODE)
+reWORD_SEP = re.compile(WORD_SEP + "+",    re.UNICODE)
 reBOT      = re.compile(r'@bot@',    re.UNICODE)
 reUSER     = re.compile(r'@user@',   re.UNICODE)
+WHITESPACES = " \t\n\r\f\v"
+# Compiled patterns of the names of bots and users (see getNamePattern)
+NAME_CACHE_SIZE = 1000
+namePatterns    = {}    # name -> pattern
+# A token is either a run of word characters, smileys, @bot@ and @user@
+# (a smiley glued to a word belongs to it), or a run of separators which
+# do not begin a smiley.
+# Like when they were masked in turn, @bot@ wins over an @user@ sharing
+# its @ (in "@user@bot@", the first @ is dropped: "user@bot@").
+reTOKENS   = re.compile(r'(?:' + SMILEY + r'|@bot@|@user@(?!bot@)|\w)+|'
+                        r'(?:(?!' + SMILEY + r')' + WORD_SEP + r')+',
+                        re.UNICODE)
+
+
+def getTokens(sentence):
+    """Get the tokens of one sentence (see Entry.getTokens).
+
+    The sentence is scanned once, by reTOKENS."""
+    return reTOKENS.findall(sentence)
+
+
+def getNamePattern(name):
+    """Get the compiled regular expression finding the name in an entry.
+
+    The patterns are cached (at most NAME_CACHE_SIZE of them: the cache is
+    emptied when it is full)."""
+    pattern = namePatterns.get(name)
+    if pattern is None:
+        # The name must not be preceded or followed by a word character,
+        # to avoid replacing part of words, like director -> dir@bot@
+        # (like \b, even when the name begins or ends with another
+        # character, like "C++").
+        pattern = re.compile(r'(?<!\w)' + re.escape(name) + r'(?!\w)',
+                             re.IGNORECASE|re.LOCALE)
+        if len(namePatterns) >= NAME_CACHE_SIZE:
+            namePatterns.clear()
+        namePatterns[name] = pattern
+    return pattern
+
+
+def getNamePatterns(botname, username):
+    """Get the compiled regular expressions finding botname and username
+    in an entry (see getNamePattern)
+
+    Return a tuple (botname's pattern, username's pattern)"""
+    return getNamePattern(botname), getNamePattern(username)
+
+
+def getMaskPattern(name):
+    "Get the compiled regular expression finding the keys of a Masker"
+    return re.compile(r'azaza' + re.escape(name) + r'[0-9]+azaza')
+
 
 class Masker:
     """A class to mask some sub-strings from a string, and to unmask them later"""
@@ -59,26 +113,101 @@ class Masker:
         self.re      = re
         self.sub     = {}    # numbered keys => substrings
         self.name    = name
+        self.reKey   = getMaskPattern(name)
 
     def mask(self, toMask):
         """Mask the substrings.
         Return the string with substrings replaced by azazanameNazaza"""
-        result    = toMask
-        iterator  = self.re.finditer(toMask)
-        i         = 0
-        for match in iterator:
-            i  += 1
-            key = "azaza"+self.name+str(i)+"azaza"
-            self.sub[key]    = match.group()
-            result           = result.replace(self.sub[key], key, 1)
-        return result
+        def maskMatch(match):
+            key = "azaza"+self.name+str(len(self.sub)+1)+"azaza"
+            self.sub[key] = match.group()
+            return key
+        return self.re.sub(maskMatch, toMask)
 
     def unmask(self, toUnmask):
         """Unmask the substrings, according to self.sub"""
-        result    = toUnmask
-        for key in self.sub:
-            result = result.replace(key, self.sub[key])
-        return result
+        if not self.sub:
+            return toUnmask
+        return self.reKey.sub(lambda match: self.sub.get(match.group(),
+                                                      match.group()),
+                           toUnmask)
+
+
+def splitSentences(text, final=True):
+    """Split text into sentences (see Entry.getSentences).
+
+    The acronyms, mails and URLs are masked while the text is cut, in
+    order to avoid cutting a sentence because of their dots.
+
+    When final is False, the text following the last sentence separator
+    may be the beginning of a sentence: it is not a sentence, but the rest.
+
+    Return a tuple (sentences, rest)"""
+    maskers = [Masker(reACRONYMS, "acronym"), Masker(reMAIL, "mail"),
+               Masker(reURL, "url")]
+    for masker in maskers:
+        text = masker.mask(text)
+    # Unmask in reverse order: a mail may contain a masked acronym
+    maskers.reverse()
+    def unmask(masked):
+        for masker in maskers:
+            masked = masker.unmask(masked)
+        return masked
+    sentences = []
+    h = 0
+    for match in reSENTENCES_SEPARATORS.finditer(text):
+        sentences.append(unmask(text[h:match.end()].replace("\n"," ").strip()))
+        h = match.end()
+    rest = unmask(text[h:])
+    if final:
+        if h < len(text):
+            sentences.append(rest.replace("\n"," ").strip())
+        rest = ""
+    return sentences, rest
+
+
+def iterSentences(chunks, maxLength=10000):
+    """Split the text made of chunks (an iterable of strings, like a file)
+    into sentences, incrementally (see splitSentences).
+
+    The text is cut after the last whitespace of the chunks read (the
+    acronyms, mails and URLs have no whitespace): only the text following
+    the last sentence separator before it is kept for the next chunks.
+    It is split again only when a chunk brings a sentence separator, and
+    when it gets longer than maxLength, it is a sentence. A text without
+    whitespace is cut after maxLength characters.
+
+    Yield the non-empty sentences"""
+    rest = ""
+    separator = False   # Is there a separator in rest, not yet split?
+    for chunk in chunks:
+        rest += chunk
+        if not separator:
+            separator = reSENTENCES_SEPARATORS.search(chunk) is not None
+            if not separator and not (maxLength and len(rest) > maxLength):
+                continue
+        cut = max([rest.rfind(space) for space in WHITESPACES])
+        if cut < 0:
+            if not (maxLength and len(rest) > maxLength):
+                continue
+            # Keep the memory bounded
+            cut = maxLength - 1
+        if separator:
+            sentences, head = splitSentences(rest[:cut + 1], False)
+        else:
+            sentences, head = [], rest[:cut + 1]
+        if maxLength and len(head) >= maxLength:
+            sentences.append(head.replace("\n"," ").strip())
+            head = ""
+        rest = head + rest[cut + 1:]
+        separator = reSENTENCES_SEPARATORS.search(rest, len(head)) is not None
+        for sentence in sentences:
+            if sentence:
+                yield sentence
+    sentences, rest = splitSentences(rest)
+    for sentence in sentences:
+        if sentence:
+            yield sentence
 
 
 class Entry:
@@ -92,11 +221,7 @@ class Entry:
 
         Replace the botname in the line by "@bot@", and username by "@user@"
         """
-        # Use a re, with \b around names to avoid replacing part of words,
-        # like director -> dir@bot@.
-        # See http://docs.python.org/dev/howto/regex.html
-        reBotname  = re.compile(r'\b'+botname+r'\b',  re.IGNORECASE|re.LOCALE)
-        reUsername = re.compile(r'\b'+username+r'\b', re.IGNORECASE|re.LOCALE)
+        reBotname, reUsername = getNamePatterns(botname, username)
         self.entry = reBotname.sub('@bot@', entry)
         self.entry = reUsername.sub('@user@', self.entry)
         self.sentences = None
@@ -120,39 +245,11 @@ class Entry:
         """Split the line of the entry into sentences.
 
         Needs to extract URLs and mails: http://xxx.xx.xx/.... and ggg@ggg.kk...,
-        in order to avoid cutting a phrase because of the dots."""
+        in order to avoid cutting a phrase because of the dots
+        (see splitSentences)."""
         # If sentences are not yet computed
         if not self.sentences:
-            # Get the URL and the mails, and replace them
-            # Get the acronyms ############################
-            acronyms   = Masker(reACRONYMS, "acronym")
-            self.entry = acronyms.mask(self.entry)
-            # Get the mails ###############################
-            mails        = Masker(reMAIL, "mail")
-            self.entry   = mails.mask(self.entry)
-            # Get the URL #################################
-            urls        = Masker(reURL, "url")
-            self.entry  = urls.mask(self.entry)
-
-            # Get the indices of the sentence separators. ###########
-            idx = self.getIndices(self.entry)
-            # Build the list of sentences, from the separators.
-            self.sentences = []
-            h = 0
-            for i in idx:
-                self.sentences += [self.entry[h:i].replace("\n"," ").strip()]
-                h = i
-            if h < len(self.entry):
-                self.sentences += [self.entry[h:].replace("\n"," ").strip()]
-
-            # Replace the locations of the URL and mails with the values
-            for i in range(len(self.sentences)):
-                # Put the acronyms back
-                self.sentences[i] = acronyms.unmask(self.sentences[i])
-                # Put the mails back
-                self.sentences[i] = mails.unmask(self.sentences[i])
-                # Put the URLs back
-                self.sentences[i] = urls.unmask(self.sentences[i])
+            self.sentences, rest = splitSentences(self.entry)
         return self.sentences
 
     def getPositions(self,sentence,regex):
@@ -197,28 +294,7 @@ class Entry:
         - a smiley
         - a @bot@
         - a @user@"""
-        smileys     = Masker(reSMILEYS, "smiley")
-        sentence    = smileys.mask(sentence)
-        bots        = Masker(reBOT, "bot")
-        sentence    = bots.mask(sentence)
-        users       = Masker(reUSER, "user")
-        sentence    = users.mask(sentence)
-        # Get the words' positions
-        posWords  = self.getPositions(sentence, reWORDS)
-        # Get the separators's positions
-        posSep    = self.getPositions(sentence, reWORD_SEP)
-        # Join the positions
-        pos = posWords + posSep
-        pos.sort()
-        # Build the list of tokens from positions
-        tokens = []
-        for span in pos:
-            tokens += [sentence[span[0]:span[1]].strip()]
-        tokens    = self.getSmileys(tokens)
-        tokens    = [smileys.unmask(token) for token in tokens]
-        tokens    = [bots.unmask(token) for token in tokens]
-        tokens    = [users.unmask(token) for token in tokens]
-        return tokens
+        return getTokens(sentence)
 
 if __name__ == "__main__":
     e = Entry("Un. Deux? Trois!! Quatre.")
@@ -32,6 +32,7 @@ __copyright__ = "Copyright (c) 2008 François Parmentier"
 __license__   = "GPL"
 
 from Entry import *
+import random
 import unittest
 
 
@@ -107,6 +108,13 @@ are you?"""
         e        = Entry(line)
         self.assertEqual(["What happen with a smiley?",":)"],e.getSentences())
 
+    def testSentenceMailAcronym(self):
+        """A mail containing an acronym is unmasked"""
+        line     = "Write to J.R.R.Tolkien@mail.org. Thanks!"
+        e        = Entry(line)
+        self.assertEqual(["Write to J.R.R.Tolkien@mail.org.", "Thanks!"],
+                         e.getSentences())
+
     def testBotname(self):
         """Replace botname by '@bot@'"""
         e    = Entry("Ector is the director!")
@@ -121,6 +129,20 @@ are you?"""
         self.assertEqual(["@user@","is","the","bot","master","!"],
                          e.getTokens("@user@ is the bot master!"))
 
+    def testSpecialNames(self):
+        """Names containing special characters are replaced literally"""
+        e    = Entry("C++ and C. are not C+ nor CC", username="C++",
+                     botname="C.")
+        self.assertEqual("@user@ and @bot@ are not C+ nor CC", e.entry)
+
+    def testNamePatternsCache(self):
+        """The patterns of the names are compiled once"""
+        Entry("Hello Ector", "Bob", "Ector")
+        pattern = namePatterns["Bob"]
+        Entry("Hello Bob", "Bob", "Ector")
+        self.assertTrue(pattern is namePatterns["Bob"])
+        self.assertTrue(len(namePatterns) <= NAME_CACHE_SIZE)
+
     def testTokens(self):
         """Get the tokens of one sentence"""
         line = "This sentence is not important."
@@ -145,5 +167,144 @@ are you?"""
         self.assertEqual([u"Comment",u"ça",u"va",u"?"], e.getTokens(line))
 
 
+
+def getMaskedTokens(sentence):
+    """Get the tokens of one sentence like the former Entry.getTokens did
+    (masking the smileys, @bot@ and @user@, and then getting the words and
+    the separators separately): it is the reference of getTokens"""
+    smileys     = Masker(reSMILEYS, "smiley")
+    sentence    = smileys.mask(sentence)
+    bots        = Masker(reBOT, "bot")
+    sentence    = bots.mask(sentence)
+    users       = Masker(reUSER, "user")
+    sentence    = users.mask(sentence)
+    e           = Entry("None")
+    pos = e.getPositions(sentence, reWORDS) + \
+          e.getPositions(sentence, reWORD_SEP)
+    pos.sort()
+    tokens = [sentence[start:end].strip() for (start, end) in pos]
+    tokens    = e.getSmileys(tokens)
+    tokens    = [smileys.unmask(token) for token in tokens]
+    tokens    = [bots.unmask(token) for token in tokens]
+    tokens    = [users.unmask(token) for token in tokens]
+    return tokens
+
+
+class TokensTest(unittest.TestCase):
+    "Compare getTokens with the former tokenizer (getMaskedTokens)"
+    sentences = [u"Hello you.", u"This should work too :).", u"hello:) you",
+                 u"8) XD :-( <:) >:[ =P", u"EXPO BOX) B8-)", u"!:) ?:( ::)",
+                 u"@bot@ is @user@'s bot@bot@@user@", u"a.b,c;d!e?f+g=h-i",
+                 u"(yes) [no] \"quote\" it's 12:30", u"Comment ça va? Très bien!",
+                 u"mail: foo@bar.com http://x.org/", u"<3 <=> :o) 8o] Xo(",
+                 u"", u"   ", u"*** & % $ #", u"_under_score_ __init__",
+                 # @bot@ wins over an @user@ sharing its @
+                 u"@user@bot@", u"@bot@user@", u"@user@@user@bot@bot@",
+                 u":)botbot@user@bot@bot@user", u"@user@bot@user@user@@"]
+    alphabet = u"aXB8Do:;-()[]<=>pP@botuser!?., \t'\"é_1"
+
+    def testSentences(self):
+        """Same tokens for the sentences"""
+        for sentence in self.sentences:
+            self.assertEqual(getMaskedTokens(sentence), getTokens(sentence))
+            self.assertEqual(getMaskedTokens(sentence.encode("utf-8")),
+                             getTokens(sentence.encode("utf-8")))
+
+    def testRandomSentences(self):
+        """Same tokens for random sentences"""
+        rng = random.Random(0)
+        for i in range(2000):
+            sentence = u"".join([rng.choice(self.alphabet)
+                                 for j in range(rng.randint(1, 20))])
+            if rng.random() < 0.3:
+                sentence = sentence.replace(u"b", u"@bot@")
+            elif rng.random() < 0.3:
+                sentence = sentence.replace(u"u", u"@user@").replace(u"b",
+                                                                    u"@bot@")
+            self.assertEqual(getMaskedTokens(sentence), getTokens(sentence),
+                             repr(sentence))
+
+
+def getMaskedSentences(entry):
+    """Get the sentences of an entry like the former Entry.getSentences did
+    (masking the acronyms, mails and URLs by replacing their first
+    occurrence in the whole entry): it is the reference of splitSentences"""
+    masks = []
+    for regex, name in ((reACRONYMS, "acronym"), (reMAIL, "mail"),
+                        (reURL, "url")):
+        sub = {}
+        for i, match in enumerate(regex.finditer(entry)):
+            key = "azaza"+name+str(i+1)+"azaza"
+            sub[key] = match.group()
+            entry = entry.replace(sub[key], key, 1)
+        masks.insert(0, sub)
+    sentences = []
+    h = 0
+    for match in reSENTENCES_SEPARATORS.finditer(entry):
+        sentences.append(entry[h:match.end()].replace("\n"," ").strip())
+        h = match.end()
+    if h < len(entry):
+        sentences.append(entry[h:].replace("\n"," ").strip())
+    for i in range(len(sentences)):
+        for sub in masks:
+            for key in sub:
+                sentences[i] = sentences[i].replace(key, sub[key])
+    return sentences
+
+
+class SentencesTest(unittest.TestCase):
+    """Compare splitSentences and iterSentences with the former splitter
+    (getMaskedSentences)"""
+    pieces = [u"A.I.", u"U.S.", u"bob@mail.com", u"http://www.x.org",
+              u"x.y@b.org", u"ftp://a.b", u" ", u". ", u"\n", u"!", u"?"]
+    alphabet = u"aAbBcm.@ \n?!:/htpfo"
+
+    def getChunks(self, text, rng):
+        "Cut text into random chunks"
+        chunks = []
+        i = 0
+        while i < len(text):
+            size = rng.randint(1, 8)
+            chunks.append(text[i:i + size])
+            i += size
+        return chunks
+
+    def testRandomEntries(self):
+        """Same sentences for random entries, split at once or streamed"""
+        rng = random.Random(0)
+        for i in range(2000):
+            text = u"".join([rng.choice(rng.random() < 0.5 and self.alphabet
+                                        or self.pieces)
+                             for j in range(rng.randint(0, 40))])
+            sentences = getMaskedSentences(text)
+            self.assertEqual(sentences, Entry(text).getSentences(), repr(text))
+            self.assertEqual([sentence for sentence in sentences if sentence],
+                             list(iterSentences(self.getChunks(text, rng))),
+                             repr(text))
+
+    def testFile(self):
+        """Sentences spanning several lines of a file"""
+        from StringIO import StringIO
+        f = StringIO("Hello,\nhow are\nyou? I am in the\nU.S.\n\nSee http://www.x.org. Bye")
+        self.assertEqual(["Hello, how are you?", "I am in the U.S.  See http://www.x.org.",
+                          "Bye"],
+                         list(iterSentences(f)))
+
+    def testMaxLength(self):
+        """A text without sentence separator is cut"""
+        sentences = list(iterSentences(["word "] * 100, maxLength=40))
+        self.assertTrue(len(sentences) > 1)
+        self.assertEqual(" ".join(["word"] * 100), " ".join(sentences))
+
+    def testMaxLengthWithoutWhitespace(self):
+        """A text without whitespace is cut after maxLength characters"""
+        sentences = list(iterSentences(["abcdefghij"] * 100, maxLength=40))
+        self.assertEqual(25, len(sentences))
+        self.assertEqual(["abcdefghij" * 4] * 25, sentences)
+        sentences = list(iterSentences(["a.b"] * 100, maxLength=40))
+        self.assertTrue(max([len(sentence) for sentence in sentences]) <= 40)
+        self.assertEqual("a.b" * 100, "".join(sentences))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Timers and counters of the stages of Ector's turns.
+
+A turn of Ector tokenizes the entry, adds its sentences to the Concept
+Network, cleans the state, propagates the activation and chooses or
+generates the reply. When an Ector has Instruments, the time spent in
+each of these stages is measured, and counters (nodes touched and links
+traversed by the propagations, size of the state, tokens generated) are
+added up; without Instruments (the default), nothing is measured.
+
+The instruments may be shared by several Ectors (the sessions of a
+server): they are thread-safe.
+"""
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+import threading
+
+
+class Instruments:
+    "Times of the stages, and counters, of Ector's turns"
+    def __init__(self):
+        self.timers = {}        # stage -> [count, total, max, last]
+        self.counters = {}      # name -> [count, total, max, last]
+        self.lock = threading.Lock()
+
+    def addTime(self, stage, seconds):
+        "Add the time spent in a stage (in seconds)"
+        self.__add(self.timers, stage, seconds)
+
+    def addCount(self, name, value=1):
+        "Add a value to the counter name"
+        self.__add(self.counters, name, value)
+
+    def __add(self, table, name, value):
+        self.lock.acquire()
+        try:
+            measure = table.get(name)
+            if measure is None:
+                table[name] = [1, value, value, value]
+            else:
+                measure[0] += 1
+                measure[1] += value
+                if value > measure[2]:
+                    measure[2] = value
+                measure[3] = value
+        finally:
+            self.lock.release()
+
+    def reset(self):
+        "Forget the times and counters measured"
+        self.lock.acquire()
+        try:
+            self.timers.clear()
+            self.counters.clear()
+        finally:
+            self.lock.release()
+
+    def getStats(self):
+        """Get the statistics of the stages and counters
+
+        Return a dictionary {"timers": {stage: stats},
+        "counters": {name: stats}}, each stats being a dictionary (count,
+        total, mean, max, last); the times are in milliseconds"""
+        self.lock.acquire()
+        try:
+            timers = [(stage, [measure[0]] + [1000 * value
+                                              for value in measure[1:]])
+                      for stage, measure in self.timers.iteritems()]
+            counters = [(name, list(measure))
+                        for name, measure in self.counters.iteritems()]
+        finally:
+            self.lock.release()
+        return {"timers": dict(getMeasureStats(timers)),
+                "counters": dict(getMeasureStats(counters))}
+
+    def show(self):
+        "Show the statistics of the stages and counters"
+        stats = self.getStats()
+        for stage, timer in sorted(stats["timers"].items()):
+            print "%-24s %6d calls, mean %8.2f ms, max %8.2f ms, total %10.1f ms" % \
+                  (stage, timer["count"], timer["mean"], timer["max"],
+                   timer["total"])
+        for name, counter in sorted(stats["counters"].items()):
+            print "%-24s %6d times, mean %8.1f, max %8d, last %8d" % \
+                  (name, counter["count"], counter["mean"], counter["max"],
+                   counter["last"])
+
+
+def getMeasureStats(measures):
+    """Get the statistics of measures, a list of tuples
+    (name, [count, total, max, last])
+
+    Return an iterator on tuples (name, stats dictionary)"""
+    for name, (count, total, maximum, last) in measures:
+        yield name, {"count": count,
+                     "total": total,
+                     "mean": float(total) / count,
+                     "max": maximum,
+                     "last": last}
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Unit test for Instruments.py"""
+
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+from Instruments import *
+import threading
+import unittest
+
+
+class InstrumentsTest(unittest.TestCase):
+    "Test the Instruments class"
+    def testTimers(self):
+        """The times are added up by stage, in milliseconds"""
+        instruments = Instruments()
+        instruments.addTime("propagate", 0.002)
+        instruments.addTime("propagate", 0.004)
+        instruments.addTime("cleanState", 0.001)
+        timers = instruments.getStats()["timers"]
+        self.assertEqual(["cleanState", "propagate"], sorted(timers))
+        propagate = timers["propagate"]
+        self.assertEqual(2, propagate["count"])
+        self.assertAlmostEqual(6, propagate["total"])
+        self.assertAlmostEqual(3, propagate["mean"])
+        self.assertAlmostEqual(4, propagate["max"])
+        self.assertAlmostEqual(4, propagate["last"])
+
+    def testCounters(self):
+        """The counters keep their total, maximum and last values"""
+        instruments = Instruments()
+        for value in (3, 7, 2):
+            instruments.addCount("stateSize", value)
+        instruments.addCount("candidates")
+        counters = instruments.getStats()["counters"]
+        self.assertEqual({"count": 3, "total": 12, "mean": 4.0, "max": 7,
+                          "last": 2}, counters["stateSize"])
+        self.assertEqual(1, counters["candidates"]["total"])
+        instruments.reset()
+        self.assertEqual({"timers": {}, "counters": {}},
+                         instruments.getStats())
+
+    def testThreads(self):
+        """Instruments shared by several threads count every measure"""
+        instruments = Instruments()
+        def measure():
+            for _ in range(1000):
+                instruments.addCount("nodesTouched", 1)
+        threads = [threading.Thread(target=measure) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter = instruments.getStats()["counters"]["nodesTouched"]
+        self.assertEqual(4000, counter["count"])
+        self.assertEqual(4000, counter["total"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Append-only storage of a Concept Network.
+
+Instead of pickling the whole Concept Network at each save, a Journal
+appends each node and link added to (or removed from) the Concept Network
+to a binary journal file, as soon as they are added (or removed).
+
+From time to time, the journal is compacted: a snapshot of the Concept
+Network is built from the previous snapshot and the journal, in a
+background thread, without stopping the Concept Network's use.
+
+Files used, from a path prefix:
+- path.snapshot:  pickle of the Concept Network, with the number of the
+                  last journal segment it contains,
+- path.journal.N: journal segments, replayed after the snapshot.
+
+Each record of a segment is made of a byte (the record type), the length
+of the data (4 bytes, big-endian), and the data: a pickled tuple
+(binary protocol).
+"""
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+from ConceptNetwork import ConceptNetwork, LinkSet, ConceptNetworkError
+import copy
+import glob
+import os
+import pickle
+import struct
+import threading
+import time
+
+JOURNAL_MAGIC = "ECTORJ1\n"
+RECORD_HEADER = struct.Struct(">BI")
+NODE_RECORD = 1
+LINK_RECORD = 2
+NODE_REMOVED_RECORD = 3
+LINK_REMOVED_RECORD = 4
+PROTOCOL = 2
+
+
+class JournalError(ConceptNetworkError):
+    pass
+
+
+def nodeId(node):
+    "Get the id (symbol, type) of node, or None when there is no node"
+    return node and (node.getSymbol(), node.getTypeName()) or None
+
+
+def copyNode(node):
+    "Copy node, without its links"
+    nodeCopy = copy.copy(node)
+    nodeCopy.outgoingLinks = LinkSet()
+    nodeCopy.incomingLinks = LinkSet()
+    nodeCopy.labelingLinks = LinkSet()
+    return nodeCopy
+
+
+class Journal:
+    """A journal of the changes of a ConceptNetwork, and its snapshots.
+
+    A Journal is a listener of the ConceptNetwork it stores (see
+    ConceptNetwork.addListener).
+    """
+    def __init__(self, path, sync=False):
+        """path: prefix of the files
+        sync: when True, each record is synced to the disk (slower, but
+              safer than only flushing it)"""
+        self.path = path
+        self.sync = sync
+        self.file = None            # current journal segment
+        self.segment = 0            # number of the current segment
+        self.cn = None              # Concept Network journaled
+        self.lock = threading.Lock()            # protects self.file
+        self.compactionLock = threading.Lock()
+        self.compactor = None
+        self.compactions = []       # background compaction threads
+
+    def getSnapshotName(self):
+        return self.path + ".snapshot"
+
+    def getSegmentName(self, segment):
+        return "%s.journal.%d" % (self.path, segment)
+
+    def getSegments(self):
+        "Get the sorted numbers of the existing journal segments"
+        prefix = self.getSegmentName(0)[:-1]
+        segments = []
+        for name in glob.glob(prefix + "*"):
+            suffix = name[len(prefix):]
+            if suffix.isdigit():
+                segments += [int(suffix)]
+        return sorted(segments)
+
+    def exists(self):
+        "Tell whether a snapshot or journal segments exist"
+        return os.path.exists(self.getSnapshotName()) or bool(self.getSegments())
+
+    def readSnapshot(self):
+        """Read the snapshot.
+
+        Return a tuple (last segment contained, Concept Network)"""
+        if not os.path.exists(self.getSnapshotName()):
+            return (0, ConceptNetwork())
+        f = open(self.getSnapshotName(), "rb")
+        try:
+            return pickle.load(f)
+        finally:
+            f.close()
+
+    def writeSnapshot(self, segment, cn):
+        """Write cn as the snapshot containing the segments up to segment.
+
+        Like ConceptNetwork.dump, the snapshot holds no state (the states
+        of the users are saved in their own files); cn keeps its states.
+        The previous snapshot is replaced only once the new one is
+        completely written."""
+        snapshot = copy.copy(cn)
+        snapshot.state = {}
+        name = self.getSnapshotName()
+        f = open(name + ".tmp", "wb")
+        try:
+            pickle.dump((segment, snapshot), f, PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+        if os.name != "posix" and os.path.exists(name):
+            os.remove(name)
+        os.rename(name + ".tmp", name)
+
+    def readRecords(self, segment):
+        """Read the records of a segment.
+
+        A truncated record (at the end of a segment which was being
+        written when the program stopped) is ignored.
+
+        Return an iterator on tuples (record type, data)"""
+        f = open(self.getSegmentName(segment), "rb")
+        try:
+            if f.read(len(JOURNAL_MAGIC)) != JOURNAL_MAGIC:
+                raise JournalError("%s is not a journal" %
+                                   self.getSegmentName(segment))
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    break
+                recordType, length = RECORD_HEADER.unpack(header)
+                data = f.read(length)
+                if len(data) < length:
+                    break
+                yield recordType, pickle.loads(data)
+        finally:
+            f.close()
+
+    def replay(self, cn, segment):
+        "Apply the records of segment to the Concept Network cn"
+        for recordType, data in self.readRecords(segment):
+            if recordType == NODE_RECORD:
+                cn.addNode(data)
+            elif recordType == LINK_RECORD:
+                # Older records have no co-occurrence
+                fromId, toId, labelId, coOcc = (data + (1,))[:4]
+                nodeLabel = labelId and cn.getNode(*labelId) or None
+                cn.addLink(cn.getNode(*fromId), cn.getNode(*toId), nodeLabel,
+                           coOcc)
+            elif recordType == NODE_REMOVED_RECORD:
+                cn.removeNode(cn.getNode(*data))
+            elif recordType == LINK_REMOVED_RECORD:
+                fromId, toId, labelId = data
+                nodeLabel = labelId and cn.getNode(*labelId) or None
+                cn.removeLink(cn.getNode(*fromId), cn.getNode(*toId),
+                              nodeLabel)
+            else:
+                raise JournalError("Unknown record type %d in %s" %
+                                   (recordType, self.getSegmentName(segment)))
+
+    def load(self):
+        """Load the Concept Network from the snapshot and the journal.
+
+        Its next changes are appended to the journal.
+
+        Return the Concept Network"""
+        lastSegment, cn = self.readSnapshot()
+        segments = [segment for segment in self.getSegments()
+                    if segment > lastSegment]
+        for segment in segments:
+            self.replay(cn, segment)
+        self.attach(cn, max(segments + [lastSegment]))
+        return cn
+
+    def create(self, cn):
+        """Make cn the content of the journal.
+
+        Write it as the snapshot, remove the existing journal segments,
+        and journal its next changes."""
+        segments = self.getSegments()
+        lastSegment = max(segments + [0])
+        self.writeSnapshot(lastSegment, cn)
+        for segment in segments:
+            os.remove(self.getSegmentName(segment))
+        self.attach(cn, lastSegment)
+
+    def attach(self, cn, lastSegment):
+        "Journal the next changes of cn, in a new segment after lastSegment"
+        self.cn = cn
+        self.openSegment(lastSegment + 1)
+        cn.addListener(self)
+
+    def openSegment(self, segment):
+        "Open a new journal segment (self.lock must be held, or unneeded)"
+        self.segment = segment
+        self.file = open(self.getSegmentName(segment), "wb")
+        self.file.write(JOURNAL_MAGIC)
+        self.file.flush()
+
+    def append(self, recordType, data):
+        "Append a record to the journal"
+        data = pickle.dumps(data, PROTOCOL)
+        self.lock.acquire()
+        try:
+            self.file.write(RECORD_HEADER.pack(recordType, len(data)))
+            self.file.write(data)
+            self.file.flush()
+            if self.sync:
+                os.fsync(self.file.fileno())
+        finally:
+            self.lock.release()
+
+    def nodeAdded(self, node):
+        "Journal the node added to the Concept Network"
+        self.append(NODE_RECORD, copyNode(node))
+
+    def linkAdded(self, nodeFrom, nodeTo, nodeLabel, coOcc=1):
+        "Journal the link added to the Concept Network"
+        self.append(LINK_RECORD, (nodeId(nodeFrom), nodeId(nodeTo),
+                                  nodeId(nodeLabel), coOcc))
+
+    def nodeRemoved(self, node):
+        "Journal the node removed from the Concept Network"
+        self.append(NODE_REMOVED_RECORD, nodeId(node))
+
+    def linkRemoved(self, nodeFrom, nodeTo, nodeLabel):
+        "Journal the link removed from the Concept Network"
+        self.append(LINK_REMOVED_RECORD, (nodeId(nodeFrom), nodeId(nodeTo),
+                                          nodeId(nodeLabel)))
+
+    def flush(self):
+        "Sync the current segment to the disk"
+        self.lock.acquire()
+        try:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        finally:
+            self.lock.release()
+
+    def rotate(self):
+        """Close the current segment, and continue in a new one.
+
+        Return the number of the closed segment"""
+        self.lock.acquire()
+        try:
+            segment = self.segment
+            self.file.close()
+            self.openSegment(segment + 1)
+        finally:
+            self.lock.release()
+        return segment
+
+    def compact(self, wait=True):
+        """Write a new snapshot, containing the closed journal segments.
+
+        The new snapshot is built from the previous snapshot and the
+        journal, not from the Concept Network in use, which can go on
+        changing during the compaction.
+
+        wait: when False, the compaction is done in a background thread"""
+        if not wait:
+            thread = threading.Thread(target=self.compact)
+            thread.setDaemon(True)
+            self.compactions = [compaction for compaction in self.compactions
+                                if compaction.isAlive()] + [thread]
+            thread.start()
+            return thread
+        self.compactionLock.acquire()
+        try:
+            if not self.file:
+                # Closed
+                return
+            lastSegment = self.rotate()
+            snapshotSegment, cn = self.readSnapshot()
+            segments = [segment for segment in self.getSegments()
+                        if snapshotSegment < segment <= lastSegment]
+            for segment in segments:
+                self.replay(cn, segment)
+            self.writeSnapshot(lastSegment, cn)
+            for segment in segments:
+                os.remove(self.getSegmentName(segment))
+        finally:
+            self.compactionLock.release()
+
+    def startCompaction(self, interval):
+        """Compact the journal every interval seconds, in a background
+        thread"""
+        self.stopCompaction()
+        self.compactor = Compactor(self, interval)
+        self.compactor.start()
+
+    def stopCompaction(self):
+        "Stop the periodic compaction"
+        if self.compactor:
+            self.compactor.stop()
+            self.compactor.join()
+            self.compactor = None
+
+    def close(self):
+        """Stop journaling the changes of the Concept Network
+
+        The running compactions are waited for"""
+        self.stopCompaction()
+        for compaction in self.compactions:
+            compaction.join()
+        self.compactions = []
+        if self.cn:
+            self.cn.removeListener(self)
+            self.cn = None
+        self.lock.acquire()
+        try:
+            if self.file:
+                self.file.close()
+                self.file = None
+        finally:
+            self.lock.release()
+
+
+class Compactor(threading.Thread):
+    "A thread compacting a Journal periodically"
+    def __init__(self, journal, interval):
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+        self.journal = journal
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while True:
+            self.stopped.wait(self.interval)
+            if self.stopped.isSet():
+                break
+            self.journal.compact()
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Unit test for Journal.py
+"""
+
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+from Journal import *
+from ConceptNetwork import Node, SparseState
+from Ector import Ector, TokenNode
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class JournalTest(unittest.TestCase):
+    "Test the Journal class"
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "cn")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def fill(self, cn):
+        "Add nodes and links to cn"
+        nodeFrom = cn.addNode(Node("From"))
+        nodeTo   = cn.addNode(TokenNode("To", 1, 1, 0, 0))
+        cn.addNode(TokenNode("To", 1, 0, 0, 1))
+        cn.addLink(nodeFrom, nodeTo)
+        cn.addLink(nodeFrom, nodeTo, cn.addNode(Node("Label")))
+        cn.addLink(nodeFrom, nodeTo)
+
+    def assertFilled(self, cn):
+        "Check that cn is what fill made"
+        nodeFrom = cn.getNode("From")
+        nodeTo   = cn.getNode("To", "token")
+        self.assertEqual(3, len(cn.node))
+        self.assertEqual(2, nodeTo.getOcc())
+        self.assertEqual(1, nodeTo.getBeginningOccurrence())
+        self.assertEqual(1, nodeTo.getEndOccurrence())
+        self.assertEqual(2, cn.getLink(nodeFrom, nodeTo).getCoOcc())
+        self.assertEqual(1, cn.getLink(nodeFrom, nodeTo,
+                                       cn.getNode("Label")).getCoOcc())
+        self.assertEqual(2, len(nodeFrom.outgoingLinks))
+
+    def testReplay(self):
+        "The changes of the Concept Network are replayed when loaded"
+        journal = Journal(self.path)
+        self.assertFalse(journal.exists())
+        self.fill(journal.load())
+        journal.close()
+        journal = Journal(self.path)
+        self.assertTrue(journal.exists())
+        self.assertFilled(journal.load())
+        journal.close()
+
+    def testCompact(self):
+        "After a compaction, the snapshot holds the Concept Network"
+        journal = Journal(self.path)
+        cn = journal.load()
+        self.fill(cn)
+        journal.compact()
+        cn.addNode(Node("After"))
+        journal.close()
+        self.assertEqual([journal.segment], journal.getSegments())
+        loaded = Journal(self.path).load()
+        self.assertFilled(Journal(self.path).readSnapshot()[1])
+        self.assertEqual(1, loaded.getNode("After").getOcc())
+
+    def testBackgroundCompaction(self):
+        "Changes made during a background compaction are kept"
+        journal = Journal(self.path)
+        cn = journal.load()
+        self.fill(cn)
+        thread = journal.compact(wait=False)
+        for i in range(100):
+            cn.addNode(Node("n%d" % i))
+        thread.join()
+        journal.close()
+        loaded = Journal(self.path).load()
+        self.assertEqual(103, len(loaded.node))
+
+    def testCloseDuringCompaction(self):
+        "A closed journal waits for the compactions, and stops compacting"
+        journal = Journal(self.path)
+        self.fill(journal.load())
+        journal.startCompaction(0.01)
+        thread = journal.compact(wait=False)
+        compactor = journal.compactor
+        journal.close()
+        self.assertFalse(thread.isAlive())
+        self.assertFalse(compactor.isAlive())
+        journal.compact()
+        self.assertFilled(Journal(self.path).load())
+
+    def testRemovals(self):
+        "The nodes and links removed are removed when replayed"
+        journal = Journal(self.path)
+        cn = journal.load()
+        self.fill(cn)
+        nodeFrom = cn.getNode("From")
+        cn.removeLink(nodeFrom, cn.getNode("To", "token"))
+        cn.removeNode(cn.getNode("Label"))
+        cn.addLink(nodeFrom, cn.addNode(Node("Label")))
+        journal.close()
+        loaded = Journal(self.path).load()
+        nodeFrom = loaded.getNode("From")
+        self.assertEqual(3, len(loaded.node))
+        self.assertEqual(1, len(loaded.link))
+        self.assertEqual(1, loaded.getLink(nodeFrom,
+                                           loaded.getNode("Label")).getCoOcc())
+        self.assertEqual(1, loaded.getNode("Label").getOcc())
+
+    def testTruncatedRecord(self):
+        "A record cut by a crash is ignored"
+        journal = Journal(self.path)
+        self.fill(journal.load())
+        journal.file.write(RECORD_HEADER.pack(NODE_RECORD, 100) + "abc")
+        journal.close()
+        self.assertFilled(Journal(self.path).load())
+
+    def testCreate(self):
+        "An existing Concept Network can be stored in a journal"
+        cn = ConceptNetwork()
+        self.fill(cn)
+        journal = Journal(self.path)
+        journal.create(cn)
+        cn.addNode(Node("After"))
+        journal.close()
+        loaded = Journal(self.path).load()
+        self.assertEqual(4, len(loaded.node))
+
+    def testSnapshotWithoutStates(self):
+        "The snapshot holds no state, and the Concept Network keeps its own"
+        cn = ConceptNetwork()
+        self.fill(cn)
+        state = SparseState("Alice")
+        state.fullyActivate("From")
+        cn.addState(state)
+        journal = Journal(self.path)
+        journal.create(cn)
+        journal.close()
+        self.assertEqual({"Alice": state}, cn.state)
+        self.assertEqual({}, Journal(self.path).readSnapshot()[1].state)
+        loaded = Journal(self.path).load()
+        self.assertEqual({}, loaded.state)
+        self.assertFilled(loaded)
+
+    def testEctorJournal(self):
+        "Ector learns in its journal"
+        ector = Ector(journal=self.path)
+        ector.addEntry("Hello you.")
+        ector.journal.close()
+        ector = Ector(journal=self.path)
+        ector.journal.close()
+        self.assertEqual(1, ector.cn.getNode("Hello", "token").getOcc())
+        self.assertEqual(1, ector.cn.getLink(ector.cn.getNode("Hello", "token"),
+                                             ector.cn.getNode("you", "token")).getCoOcc())
+
+
+if __name__ == "__main__":
+    unittest.main()
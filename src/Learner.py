@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Bulk learning of a corpus by Ector.
+
+A Learner adds the entries of a corpus (a file with one entry per line)
+to a Concept Network, like Ector.addEntry does, but without activating
+any State: the occurrences of the nodes and the co-occurrences of the
+links are counted in a CountTable, which is added to the Concept Network
+every batch of lines.
+
+A ParallelLearner counts shards of the corpus in several processes, and
+merges their CountTables: the Concept Network is the same as the one of a
+Learner.
+"""
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+from Ector import Ector, TokenNode, SentenceNode, UttererNode, \
+     getTokenPositions, ENCODING
+from Entry import Entry, getTokens, getNamePatterns, iterSentences
+from collections import deque
+import multiprocessing
+import sys
+import time
+
+
+class CountTable:
+    """Nodes and links counted before being added to a Concept Network.
+
+    Nodes and links are identified by node ids (symbol, type)."""
+    def __init__(self):
+        self.node = {}      # (symbol, type)       -> node
+        self.link = {}      # (from id, to id)     -> co-occurrence
+
+    def __len__(self):
+        return len(self.node) + len(self.link)
+
+    def addNode(self, node):
+        """Count node (see ConceptNetwork.addNode)
+
+        Return the node id"""
+        key = (node.getSymbol(), node.getTypeName())
+        if key in self.node:
+            self.node[key].addNode(node)
+        else:
+            self.node[key] = node
+        return key
+
+    def addLink(self, fromId, toId, coOcc=1):
+        "Count the link going from node id fromId to node id toId"
+        self.link[(fromId, toId)] = self.link.get((fromId, toId), 0) + coOcc
+
+    def addBidirectionalLink(self, id1, id2):
+        self.addLink(id1, id2)
+        self.addLink(id2, id1)
+
+    def update(self, counts):
+        "Add the nodes and links counted in the CountTable counts"
+        for node in counts.node.itervalues():
+            self.addNode(node)
+        for (fromId, toId), coOcc in counts.link.iteritems():
+            self.addLink(fromId, toId, coOcc)
+
+    def applyTo(self, cn):
+        """Add the counted nodes and links to the Concept Network cn,
+        and empty the table"""
+        for node in self.node.itervalues():
+            cn.addNode(node)
+        for (fromId, toId), coOcc in self.link.iteritems():
+            cn.addLink(cn.getNode(*fromId), cn.getNode(*toId), None, coOcc)
+        self.node = {}
+        self.link = {}
+
+
+class Learner:
+    """Learn the entries of a corpus into a Concept Network.
+
+    The nodes and links are the ones Ector.addEntry would add (and the
+    links between the last sentences of consecutive entries, like in
+    Ector's dialogue), but no State is changed.
+    """
+    def __init__(self, cn, username="User", botname="Ector", batchSize=10000):
+        """cn:        Concept Network learning
+        batchSize: number of entries counted before adding them to cn
+                   (None: they are added by flush only)"""
+        self.cn = cn
+        self.username = username
+        self.botname = botname
+        self.batchSize = batchSize
+        self.counts = CountTable()
+        self.firstSentenceId = None     # last sentence of the first entry
+        self.previousSentenceId = None  # last sentence of the last entry
+        self.nbEntries = 0
+
+    def addSentence(self, sentence, username):
+        """Count the nodes and links of the sentence (see Ector.addSentence)
+
+        Return the id of the sentence node"""
+        counts = self.counts
+        uttererId = counts.addNode(UttererNode(username))
+        sentenceId = counts.addNode(SentenceNode(sentence))
+        counts.addBidirectionalLink(uttererId, sentenceId)
+        tokens = getTokens(sentence)
+        previousTokenId = None
+        for token, beginning, middle, end in getTokenPositions(tokens):
+            tokenId = counts.addNode(TokenNode(token, 1, beginning,
+                                               middle, end))
+            if previousTokenId:
+                counts.addLink(previousTokenId, tokenId)
+            previousTokenId = tokenId
+            counts.addBidirectionalLink(tokenId, sentenceId)
+        return sentenceId
+
+    def addEntry(self, entry, username=None):
+        """Count the nodes and links of the entry (see Ector.addEntry)
+
+        The last sentence of the entry is linked to the one of the
+        previous entry.
+
+        Return the id of the last sentence node"""
+        username = username or self.username
+        lastSentenceId = None
+        for sentence in Entry(entry, username, self.botname).getSentences():
+            sentenceId = self.addSentence(sentence, username)
+            if lastSentenceId:
+                self.counts.addLink(lastSentenceId, sentenceId)
+            lastSentenceId = sentenceId
+        if self.previousSentenceId and lastSentenceId:
+            self.counts.addLink(self.previousSentenceId, lastSentenceId)
+        if not self.nbEntries:
+            self.firstSentenceId = lastSentenceId
+        self.previousSentenceId = lastSentenceId
+        self.nbEntries += 1
+        if self.batchSize and self.nbEntries % self.batchSize == 0:
+            self.flush()
+        return lastSentenceId
+
+    def addText(self, chunks, username=None):
+        """Count the nodes and links of a text (an iterable of unicode
+        strings, like the lines of a document) as the ones of one entry
+        (see addEntry), but its sentences may span several chunks: they are
+        split incrementally, by iterSentences.
+
+        Return the number of sentences counted"""
+        username = username or self.username
+        reBotname, reUsername = getNamePatterns(self.botname, username)
+        lastSentenceId = None
+        nbSentences = 0
+        for sentence in iterSentences(chunks):
+            sentence = reUsername.sub('@user@', reBotname.sub('@bot@', sentence))
+            sentenceId = self.addSentence(sentence, username)
+            if lastSentenceId:
+                self.counts.addLink(lastSentenceId, sentenceId)
+            lastSentenceId = sentenceId
+            nbSentences += 1
+            if self.batchSize and nbSentences % self.batchSize == 0:
+                self.flush()
+        if self.previousSentenceId and lastSentenceId:
+            self.counts.addLink(self.previousSentenceId, lastSentenceId)
+        if lastSentenceId:
+            if not self.nbEntries:
+                self.firstSentenceId = lastSentenceId
+            self.previousSentenceId = lastSentenceId
+            self.nbEntries += 1
+        return nbSentences
+
+    def flush(self):
+        "Add the counted nodes and links to the Concept Network"
+        self.counts.applyTo(self.cn)
+
+    def learn(self, lines, log=False, encoding=ENCODING):
+        """Learn the entries of lines (an iterable, like a file).
+
+        log:      when True, the lines are in the format of Ector's log
+                  (date, utterer and entry, separated by tabs)
+        encoding: encoding of the lines
+
+        Return the number of entries learnt"""
+        nbEntries = self.count(lines, log, encoding)
+        self.flush()
+        return nbEntries
+
+    def learnText(self, lines, encoding=ENCODING):
+        """Learn lines (an iterable, like a file) as one text, whose
+        sentences may span several lines (see addText).
+
+        Return the number of sentences learnt"""
+        self.flush()
+        nbSentences = self.addText(unicode(line, encoding) for line in lines)
+        self.flush()
+        return nbSentences
+
+    def count(self, lines, log=False, encoding=ENCODING):
+        """Count the entries of lines (see learn), without adding them to
+        the Concept Network, except every batchSize entries
+
+        Return the number of entries counted"""
+        nbEntries = 0
+        for line in lines:
+            username = None
+            if log:
+                fields = line.split("\t", 2)
+                if len(fields) < 3:
+                    continue
+                username = unicode(fields[1], encoding)
+                line = fields[2]
+            entry = unicode(line.strip(), encoding)
+            if entry:
+                self.addEntry(entry, username)
+                nbEntries += 1
+        return nbEntries
+
+
+def countShard(shard):
+    """Count the lines of a shard, in a worker process of a ParallelLearner.
+
+    shard: tuple (lines, username, botname, log, encoding)
+
+    Return a tuple (CountTable, last sentence id of the first entry,
+    last sentence id of the last entry, number of entries)"""
+    lines, username, botname, log, encoding = shard
+    learner = Learner(None, username, botname, batchSize=None)
+    nbEntries = learner.count(lines, log, encoding)
+    return (learner.counts, learner.firstSentenceId,
+            learner.previousSentenceId, nbEntries)
+
+
+class ParallelLearner(Learner):
+    """A Learner counting the entries in several processes.
+
+    The corpus is cut into shards of consecutive lines, counted by a pool
+    of processes. Their CountTables are added to the Concept Network in
+    the order of the shards, with the link between the last sentences of
+    consecutive entries of two shards: the Concept Network is the same
+    as the one learnt by a Learner.
+    """
+    def __init__(self, cn, username="User", botname="Ector",
+                 shardSize=10000, processes=None):
+        """shardSize: number of lines of a shard
+        processes: number of worker processes (default: number of CPUs)"""
+        Learner.__init__(self, cn, username, botname, batchSize=None)
+        self.shardSize = shardSize
+        self.processes = processes or multiprocessing.cpu_count()
+
+    def getShards(self, lines, log, encoding):
+        "Cut lines into shards (see countShard)"
+        shard = []
+        for line in lines:
+            shard.append(line)
+            if len(shard) == self.shardSize:
+                yield (shard, self.username, self.botname, log, encoding)
+                shard = []
+        if shard:
+            yield (shard, self.username, self.botname, log, encoding)
+
+    def merge(self, result):
+        "Add the result of countShard to the Concept Network"
+        counts, firstSentenceId, lastSentenceId, nbEntries = result
+        if not nbEntries:
+            return 0
+        if self.previousSentenceId and firstSentenceId:
+            counts.addLink(self.previousSentenceId, firstSentenceId)
+        self.previousSentenceId = lastSentenceId
+        self.nbEntries += nbEntries
+        counts.applyTo(self.cn)
+        return nbEntries
+
+    def learn(self, lines, log=False, encoding=ENCODING):
+        """Learn the entries of lines (see Learner.learn).
+
+        At most two shards per process are waiting to be counted or merged.
+
+        Return the number of entries learnt"""
+        self.flush()
+        nbEntries = 0
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            pending = deque()
+            for shard in self.getShards(lines, log, encoding):
+                pending.append(pool.apply_async(countShard, (shard,)))
+                if len(pending) >= 2 * self.processes:
+                    nbEntries += self.merge(pending.popleft().get())
+            while pending:
+                nbEntries += self.merge(pending.popleft().get())
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+        return nbEntries
+
+
+def main():
+    from optparse import OptionParser
+
+    usage = "usage: %prog [-p username][-n botname=Ector][-l|-t][-b batch][-w workers][-j journal][-h] corpus..."
+    parser = OptionParser(usage=usage, version="%prog 0.3")
+    parser.add_option("-p", "--person", dest="username", default="User",
+                      help="set the name of the utterer")
+    parser.add_option("-n", "--name", dest="botname", default="Ector",
+                      help="set the name of the bot")
+    parser.add_option("-l", "--log", action="store_true", dest="log", default=False,
+                      help="the corpus files are Ector's logs (date, utterer and entry separated by tabs)")
+    parser.add_option("-t", "--text", action="store_true", dest="text", default=False,
+                      help="each corpus file is one text, whose sentences may span several lines")
+    parser.add_option("-b", "--batch", dest="batch", type="int", default=10000,
+                      help="add the nodes and links to the Concept Network every BATCH entries")
+    parser.add_option("-j", "--journal", dest="journal", default=None,
+                      help="store the Concept Network in an append-only journal (path prefix)")
+    parser.add_option("-w", "--workers", dest="workers", type="int", default=1,
+                      help="count the entries in WORKERS processes (by shards of BATCH lines)")
+    parser.add_option("-e", "--encoding", dest="encoding", default=ENCODING or "utf-8",
+                      help="encoding of the corpus files")
+
+    (options, args) = parser.parse_args()
+    if not args:
+        parser.error("no corpus file given")
+    if options.log and options.text:
+        parser.error("options -l and -t are mutually exclusive")
+
+    ector = Ector(options.botname.capitalize(), options.username, options.journal)
+    if options.workers > 1:
+        learner = ParallelLearner(ector.cn, ector.username, ector.botname,
+                                  options.batch, options.workers)
+    else:
+        learner = Learner(ector.cn, ector.username, ector.botname, options.batch)
+    for filename in args:
+        start = time.time()
+        if filename == "-":
+            f = sys.stdin
+        else:
+            f = open(filename, "r")
+        if options.text:
+            nbSentences = learner.learnText(f, options.encoding)
+        else:
+            nbEntries = learner.learn(f, options.log, options.encoding)
+        if f is not sys.stdin:
+            f.close()
+        if options.text:
+            print "%s: %d sentences learnt in %.1f s" % (filename, nbSentences,
+                                                          time.time() - start)
+        else:
+            print "%s: %d entries learnt in %.1f s" % (filename, nbEntries,
+                                                        time.time() - start)
+    if ector.journal:
+        ector.journal.close()
+    else:
+        ector.dump()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
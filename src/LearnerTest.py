@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Unit test for Learner.py
+"""
+
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+from Learner import *
+from ConceptNetwork import ConceptNetwork
+import unittest
+
+CORPUS = ["Hello Ector.",
+          "Hello, how do you do? I do fine.",
+          "",
+          "How do you do, User?",
+          "Hello you. :)"]
+
+
+def getCounts(cn):
+    """Get the occurrences of the nodes of cn, and the co-occurrences of
+    its links, by node ids"""
+    nodes = {}
+    for key, node in cn.node.iteritems():
+        occ = [node.getOcc()]
+        if node.getTypeName() == "token":
+            occ += [node.getBeginningOccurrence(), node.getMiddleOccurrence(),
+                    node.getEndOccurrence()]
+        nodes[key] = occ
+    links = {}
+    for link in cn.link.itervalues():
+        links[(link.getNodeFrom().getSymbol(), link.getNodeFrom().getTypeName(),
+               link.getNodeTo().getSymbol(), link.getNodeTo().getTypeName())] = \
+            link.getCoOcc()
+    return nodes, links
+
+
+class LearnerTest(unittest.TestCase):
+    "Test the Learner class"
+    def learnWithEctor(self, lines):
+        "Learn lines with Ector, like its dialogue does"
+        ector = Ector()
+        previousSentenceNode = None
+        for line in lines:
+            if line:
+                lastSentenceNode = ector.addEntry(unicode(line))
+                if previousSentenceNode:
+                    ector.cn.addLink(previousSentenceNode, lastSentenceNode)
+                previousSentenceNode = lastSentenceNode
+        return ector.cn
+
+    def testSameAsEctor(self):
+        "The learnt nodes and links are the ones of Ector.addEntry"
+        for batchSize in (1, 2, 100):
+            cn = ConceptNetwork()
+            learner = Learner(cn, batchSize=batchSize)
+            self.assertEqual(4, learner.learn(CORPUS, encoding="utf-8"))
+            self.assertEqual(getCounts(self.learnWithEctor(CORPUS)), getCounts(cn))
+
+    def testNoState(self):
+        "Learning does not activate any node"
+        cn = ConceptNetwork()
+        Learner(cn).learn(CORPUS, encoding="utf-8")
+        self.assertEqual({}, cn.state)
+
+    def testLog(self):
+        "Entries can be read from Ector's log"
+        cn = ConceptNetwork()
+        lines = ["2008/11/11 - 10:00:00\tBill\tHello Ector.\n",
+                 "not a log line\n",
+                 "2008/11/11 - 10:00:05\tEctor\tHello Bill.\n"]
+        self.assertEqual(2, Learner(cn).learn(lines, log=True, encoding="utf-8"))
+        self.assertEqual(1, cn.getNode("Bill", "utterer").getOcc())
+        self.assertEqual(1, cn.getNode("@bot@", "token").getOcc())
+        self.assertEqual(1, cn.getNode("Hello Bill.", "sentence").getOcc())
+
+    def testText(self):
+        "A text is learnt like one entry, even when its sentences span lines"
+        lines = ["Hello Ector,\n", "how do you do? I do\n", "\n", "fine. Bye\n"]
+        cn = ConceptNetwork()
+        self.assertEqual(3, Learner(cn, batchSize=1).learnText(lines, "utf-8"))
+        entryCn = ConceptNetwork()
+        Learner(entryCn).learn([" ".join(line.strip() for line in lines)],
+                               encoding="utf-8")
+        self.assertEqual(getCounts(entryCn), getCounts(cn))
+        self.assertEqual(1, cn.getNode("Hello @bot@, how do you do?",
+                                       "sentence").getOcc())
+
+
+class ParallelLearnerTest(unittest.TestCase):
+    "Test the ParallelLearner class"
+    def testSameAsLearner(self):
+        "A ParallelLearner learns the same nodes and links as a Learner"
+        lines = CORPUS * 5
+        cn = ConceptNetwork()
+        Learner(cn).learn(lines, encoding="utf-8")
+        for shardSize in (1, 3, 100):
+            parallelCn = ConceptNetwork()
+            learner = ParallelLearner(parallelCn, shardSize=shardSize, processes=2)
+            self.assertEqual(20, learner.learn(lines, encoding="utf-8"))
+            self.assertEqual(getCounts(cn), getCounts(parallelCn))
+
+
+class CountTableTest(unittest.TestCase):
+    "Test the CountTable class"
+    def testApply(self):
+        "Counted nodes and links are added to the Concept Network"
+        cn = ConceptNetwork()
+        counts = CountTable()
+        hello = counts.addNode(TokenNode("Hello", 1, 1, 0, 0))
+        counts.addNode(TokenNode("Hello", 1, 0, 0, 1))
+        you = counts.addNode(TokenNode("you"))
+        counts.addLink(hello, you)
+        counts.addLink(hello, you, 2)
+        counts.applyTo(cn)
+        self.assertEqual(0, len(counts))
+        helloNode = cn.getNode("Hello", "token")
+        self.assertEqual(2, helloNode.getOcc())
+        self.assertEqual(1, helloNode.getEndOccurrence())
+        self.assertEqual(3, cn.getLink(helloNode, cn.getNode("you", "token")).getCoOcc())
+
+    def testUpdate(self):
+        "Count tables are merged by adding their counts"
+        counts1 = CountTable()
+        counts2 = CountTable()
+        for counts in (counts1, counts2):
+            hello = counts.addNode(TokenNode("Hello"))
+            you = counts.addNode(TokenNode("you"))
+            counts.addLink(hello, you)
+        counts1.update(counts2)
+        self.assertEqual(2, counts1.node[("Hello", "token")].getOcc())
+        self.assertEqual(2, counts1.link[(hello, you)])
+
+
+if __name__ == "__main__":
+    unittest.main()
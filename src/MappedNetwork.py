@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Memory-mapped, read-only Concept Network.
+
+writeMappedNetwork saves a Concept Network in a columnar binary file,
+which a MappedNetwork opens with mmap: getNode, getLinksFrom, getLinksTo
+and the propagation read the mapped file directly, without loading the
+nodes and links as python objects.
+
+The file begins with the magic string, followed by the offset and the
+number of items of each column (in COLUMNS order, 8 bytes each).
+All numbers are little-endian.
+The nodes' columns are indexed by node id, the links' columns by link id
+(the links are sorted by node from, see SparseNetwork).
+"""
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+from ConceptNetwork import ConceptNetworkError, ConceptNetworkUnknownNode
+from SparseNetwork import SparseNetwork, NO_LABEL, UNKNOWN_DECAY
+import mmap
+import struct
+
+MAPPED_MAGIC = "ECTORMN1"
+# (name, struct format of an item)
+COLUMNS = [
+    ("symbolStart", "q"),   # nodes + 1: offset of the symbol in "symbols"
+    ("unicode",     "B"),   # nodes: 1 when the symbol is unicode (utf-8)
+    ("type",        "i"),   # nodes: index of the type name in "types"
+    ("occ",         "q"),   # nodes
+    ("decay",       "i"),   # nodes (UNKNOWN_DECAY: only linked to)
+    ("nbIncomings", "i"),   # nodes
+    ("influenced",  "i"),   # nodes ids receiving influence
+    ("sorted",      "i"),   # nodes ids, sorted by (type, symbol)
+    ("rowStart",    "q"),   # nodes + 1: first outgoing link
+    ("column",      "i"),   # links: node to
+    ("weight",      "d"),   # links: weight without label
+    ("coOcc",       "q"),   # links
+    ("label",       "i"),   # links: label index, or NO_LABEL
+    ("labelNode",   "i"),   # labels: node id of the label
+    ("inStart",     "q"),   # nodes + 1: first incoming link in "inLink"
+    ("inLink",      "q"),   # links: link ids, sorted by node to
+    ("linkFrom",    "i"),   # links: node from
+    ("symbols",     "c"),   # symbols, concatenated
+    ("types",       "c"),   # type names, separated by newlines
+]
+HEADER = struct.Struct("<8s" + "qq" * len(COLUMNS))
+
+
+class MappedNetworkError(ConceptNetworkError):
+    pass
+
+
+def encodeSymbol(symbol):
+    """Get the bytes of a symbol, and whether it is unicode"""
+    if isinstance(symbol, unicode):
+        return symbol.encode("utf-8"), 1
+    return symbol, 0
+
+
+def writeMappedNetwork(cn, filename):
+    """Write the Concept Network cn in the file which name is given,
+    in the format read by MappedNetwork"""
+    sparse = SparseNetwork(cn)
+    nbNodes = sparse.getNbNodes()
+    nbLinks = sparse.getNbLinks()
+
+    types = []
+    typeIndex = {}
+    encoded = []
+    for symbol, typeName in sparse.key:
+        if typeName not in typeIndex:
+            typeIndex[typeName] = len(types)
+            types.append(typeName)
+        encoded.append(encodeSymbol(symbol))
+    symbolStart = [0]
+    for symbolBytes, _ in encoded:
+        symbolStart.append(symbolStart[-1] + len(symbolBytes))
+    nodeType = [typeIndex[typeName] for _, typeName in sparse.key]
+    sortedIds = sorted(range(nbNodes),
+                       key=lambda i: (nodeType[i], encoded[i][0]))
+
+    linkFrom = []
+    for i in xrange(nbNodes):
+        linkFrom += [i] * (sparse.rowStart[i + 1] - sparse.rowStart[i])
+    inLink = sorted(range(nbLinks), key=lambda k: sparse.column[k])
+    inStart = [0] * (nbNodes + 1)
+    for k in xrange(nbLinks):
+        inStart[sparse.column[k] + 1] += 1
+    for i in xrange(nbNodes):
+        inStart[i + 1] += inStart[i]
+
+    values = {
+        "symbolStart": symbolStart,
+        "unicode":     [isUnicode for _, isUnicode in encoded],
+        "type":        nodeType,
+        "occ":         sparse.occ,
+        "decay":       sparse.decay,
+        "nbIncomings": sparse.nbIncomings,
+        "influenced":  sparse.influenced,
+        "sorted":      sortedIds,
+        "rowStart":    sparse.rowStart,
+        "column":      sparse.column,
+        "weight":      sparse.weight,
+        "coOcc":       sparse.coOcc,
+        "label":       sparse.label,
+        "labelNode":   sparse.labelNode,
+        "inStart":     inStart,
+        "inLink":      inLink,
+        "linkFrom":    linkFrom,
+        "symbols":     "".join([symbolBytes for symbolBytes, _ in encoded]),
+        "types":       "\n".join([typeName.encode("utf-8") for typeName in types]),
+    }
+
+    f = open(filename, "wb")
+    try:
+        offset = HEADER.size
+        directory = []
+        data = []
+        for name, format in COLUMNS:
+            if format == "c":
+                columnData = values[name]
+            else:
+                columnData = struct.pack("<%d%s" % (len(values[name]), format),
+                                         *values[name])
+            directory += [offset, len(values[name])]
+            data.append(columnData)
+            offset += len(columnData)
+        f.write(HEADER.pack(MAPPED_MAGIC, *directory))
+        for columnData in data:
+            f.write(columnData)
+    finally:
+        f.close()
+
+
+class Column:
+    """A column of a mapped file, read as a sequence of numbers"""
+    def __init__(self, buffer, offset, format, length):
+        self.buffer = buffer
+        self.offset = offset
+        self.item = struct.Struct("<" + format)
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if i < 0 or i >= self.length:
+            raise IndexError("column index out of range")
+        return self.item.unpack_from(self.buffer, self.offset + i * self.item.size)[0]
+
+    def __iter__(self):
+        unpack = self.item.unpack_from
+        size = self.item.size
+        for position in xrange(self.offset, self.offset + self.length * size, size):
+            yield unpack(self.buffer, position)[0]
+
+
+class MappedNetwork(SparseNetwork):
+    """A read-only Concept Network, mapped from a file written by
+    writeMappedNetwork.
+
+    Nodes and links are MappedNode and MappedLink, which read the mapped
+    file when asked for their values.
+    """
+    def __init__(self, filename):
+        f = open(filename, "rb")
+        try:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+        header = HEADER.unpack_from(self.buffer, 0)
+        if header[0] != MAPPED_MAGIC:
+            raise MappedNetworkError("%s is not a mapped Concept Network" % filename)
+        self.blob = {}
+        for n, (name, format) in enumerate(COLUMNS):
+            offset, length = header[1 + 2 * n], header[2 + 2 * n]
+            if format == "c":
+                self.blob[name] = (offset, length)
+            else:
+                setattr(self, name, Column(self.buffer, offset, format, length))
+        offset, length = self.blob["types"]
+        self.types = [typeName.decode("utf-8") for typeName
+                      in self.buffer[offset:offset + length].split("\n")]
+
+    def close(self):
+        "Unmap the file"
+        self.buffer.close()
+
+    def getSymbolBytes(self, i):
+        "Get the bytes of the symbol of node i"
+        offset = self.blob["symbols"][0]
+        return self.buffer[offset + self.symbolStart[i]:
+                           offset + self.symbolStart[i + 1]]
+
+    def getNodeKey(self, i):
+        "Get the node id (symbol, type) of the integer id i"
+        symbol = self.getSymbolBytes(i)
+        if self.unicode[i]:
+            symbol = symbol.decode("utf-8")
+        return (symbol, str(self.types[self.type[i]]))
+
+    def findNodeId(self, key):
+        """Get the integer id of the node which id (symbol, type) is given,
+        with a binary search on the sorted node ids.
+
+        Return None when the node is unknown"""
+        symbol, typeName = key
+        if typeName not in self.types:
+            return None
+        wanted = (self.types.index(typeName), encodeSymbol(symbol)[0])
+        low, high = 0, len(self.sorted)
+        while low < high:
+            middle = (low + high) // 2
+            i = self.sorted[middle]
+            if (self.type[i], self.getSymbolBytes(i)) < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self.sorted):
+            i = self.sorted[low]
+            if (self.type[i], self.getSymbolBytes(i)) == wanted:
+                return i
+        return None
+
+    def getNbLinks(self):
+        "Get the number of links"
+        return len(self.column)
+
+    def getNode(self, symbol, type="basic"):
+        """Get the node from the concept network whose symbol and type are given
+
+        str symbol: symbol of the node
+        str type:   name of the wanted type"""
+        i = self.findNodeId((symbol, type))
+        if i is None or self.decay[i] == UNKNOWN_DECAY:
+            raise ConceptNetworkUnknownNode("Unknown node: \"" + symbol + "\" (" + type + ")")
+        return MappedNode(self, i)
+
+    def getLinksFrom(self, nodeFrom):
+        """Get links that go from nodeFrom
+        nodeFrom is a MappedNode"""
+        i = nodeFrom.id
+        return [MappedLink(self, k)
+                for k in xrange(self.rowStart[i], self.rowStart[i + 1])]
+
+    def getLinksTo(self, nodeTo):
+        """Get links that go to nodeTo
+        nodeTo is a MappedNode"""
+        i = nodeTo.id
+        return [MappedLink(self, self.inLink[k])
+                for k in xrange(self.inStart[i], self.inStart[i + 1])]
+
+
+class MappedNode:
+    """A node of a MappedNetwork
+
+    It has the same getters as ConceptNetwork.Node."""
+    def __init__(self, network, id):
+        self.network = network
+        self.id = id
+
+    def __eq__(self, other):
+        return isinstance(other, MappedNode) and \
+               self.network is other.network and self.id == other.id
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def getSymbol(self):
+        "Get the symbol of the node"
+        return self.network.getNodeKey(self.id)[0]
+
+    def getTypeName(self):
+        return self.network.getNodeKey(self.id)[1]
+
+    def getOcc(self):
+        return self.network.occ[self.id]
+
+    def getDecay(self):
+        "Get the decay rate of this node"
+        return self.network.decay[self.id]
+
+
+class MappedLink:
+    """A link of a MappedNetwork
+
+    It has the same getters as ConceptNetwork.Link."""
+    def __init__(self, network, id):
+        self.network = network
+        self.id = id
+
+    def getCoOcc(self):
+        return self.network.coOcc[self.id]
+
+    def getWeight(self, state=None):
+        """Compute the weight of the link, and return it
+
+        state: state of the concept network used to compute the weight"""
+        weight = self.network.weight[self.id]
+        label = self.network.label[self.id]
+        if label != NO_LABEL and state:
+            labelKey = self.network.getNodeKey(self.network.labelNode[label])
+            labelState = state.nodeState.get(labelKey)
+            if labelState is not None:
+                weight += (1 - weight) * labelState.getActivationValue() / 100
+        return weight
+
+    def getNodeFrom(self):
+        return MappedNode(self.network, self.network.linkFrom[self.id])
+
+    def getNodeTo(self):
+        return MappedNode(self.network, self.network.column[self.id])
+
+    def getNodeLabel(self):
+        label = self.network.label[self.id]
+        if label == NO_LABEL:
+            return None
+        return MappedNode(self.network, self.network.labelNode[label])
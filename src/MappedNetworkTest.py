@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Unit test for MappedNetwork.py
+"""
+
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+from MappedNetwork import *
+from ConceptNetwork import *
+from SparseNetworkTest import randomNetwork
+from Ector import Ector
+import copy
+import os
+import tempfile
+import unittest
+
+
+class MappedNetworkTest(unittest.TestCase):
+    "Test the MappedNetwork class"
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp()
+        os.close(fd)
+        self.networks = []
+
+    def tearDown(self):
+        for network in self.networks:
+            network.close()
+        os.remove(self.filename)
+
+    def map(self, cn):
+        "Write cn in the mapped file, and map it"
+        writeMappedNetwork(cn, self.filename)
+        network = MappedNetwork(self.filename)
+        self.networks.append(network)
+        return network
+
+    def testNodesAndLinks(self):
+        "Nodes and links are read from the mapped file"
+        ector = Ector()
+        ector.addEntry(u"Hello, how do you do? I do fine, très bien.")
+        mapped = self.map(ector.cn)
+        self.assertEqual(len(ector.cn.node), len(mapped.sorted))
+        for (symbol, typeName), node in ector.cn.node.iteritems():
+            mappedNode = mapped.getNode(symbol, typeName)
+            self.assertEqual(symbol, mappedNode.getSymbol())
+            self.assertEqual(typeName, mappedNode.getTypeName())
+            self.assertEqual(node.getOcc(), mappedNode.getOcc())
+            self.assertEqual(len(ector.cn.getLinksTo(node)),
+                             len(mapped.getLinksTo(mappedNode)))
+            if symbol:
+                links = mapped.getLinksFrom(mappedNode)
+                self.assertEqual(len(node.outgoingLinks), len(links))
+                for link in links:
+                    self.assertEqual(mappedNode, link.getNodeFrom())
+        do = mapped.getNode("do", "token")
+        link = [link for link in mapped.getLinksFrom(mapped.getNode("you", "token"))
+                if link.getNodeTo() == do][0]
+        self.assertEqual(1, link.getCoOcc())
+        self.assertRaises(ConceptNetworkUnknownNode, mapped.getNode, "Nimp")
+
+    def testSamePropagation(self):
+        "The propagation gives the same values as fastPropagateActivations"
+        cn = randomNetwork(50, 300)
+        mapped = self.map(cn)
+        state = State(1)
+        for i in range(0, 50, 7):
+            state.setNodeActivationValue(100, "n%d" % i)
+        mappedState = copy.deepcopy(state)
+        for _ in range(3):
+            cn.fastPropagateActivations(state)
+            mapped.fastPropagateActivations(mappedState)
+            for key in state.nodeState:
+                self.assertAlmostEqual(state.getNodeActivationValue(*key),
+                                       mappedState.getNodeActivationValue(*key), 7)
+
+    def testBadFile(self):
+        "A file which is not a mapped network raises an exception"
+        f = open(self.filename, "wb")
+        f.write("\0" * HEADER.size)
+        f.close()
+        self.assertRaises(MappedNetworkError, MappedNetwork, self.filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Pruning of the nodes and links of a Concept Network.
+
+A Concept Network only grows: each entry learnt adds nodes and links, or
+increments their occurrences, so that its memory and the time of its
+propagations grow with every dialogue. A Pruner removes the nodes and
+links rarely used, under a PruningPolicy:
+- the nodes occurring less than minOcc times,
+- the links co-occurring less than minCoOcc times,
+- when maxAge is given, only the ones not used (learnt again) for maxAge
+  seconds,
+- the nodes of a type beyond maxNodes[type] (the least occurring ones).
+
+Removing a node removes its links (see ConceptNetwork.removeNode), and
+the listeners of the Concept Network (Journal, caches) are told about
+each removal.
+
+A pruning pass goes over the nodes by steps of a few of them (see
+Pruner.step), which may be run in a background thread: each step is
+applied by an execute function (SharedNetwork.write for a shared
+network), so that no reader sees a node being removed.
+
+The times of the last uses are kept by the Pruner (a listener of the
+Concept Network) only when maxAge is given. They are not saved: the nodes
+and links not used since the Pruner was created are as old as it.
+"""
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+from ConceptNetwork import linkKey, ConceptNetworkBadParameter
+import heapq
+import threading
+import time
+
+
+class PruningPolicy:
+    "What a Pruner removes (see the module)"
+    def __init__(self, minOcc=None, minCoOcc=None, maxAge=None,
+                 maxNodes=None, typeNames=None, keepActivated=True):
+        """minOcc:        nodes occurring less are removed
+        minCoOcc:      links co-occurring less are removed
+        maxAge:        only the nodes and links not used for maxAge
+                       seconds are removed
+        maxNodes:      dictionary type name -> maximum number of nodes of
+                       this type
+        typeNames:     types of the nodes removed under minOcc and maxAge,
+                       and of the nodes the links removed come from
+                       (None: all types)
+        keepActivated: when True, the nodes in a state of the Concept
+                       Network are kept"""
+        self.minOcc = minOcc
+        self.minCoOcc = minCoOcc
+        self.maxAge = maxAge
+        self.maxNodes = maxNodes or {}
+        self.typeNames = typeNames
+        self.keepActivated = keepActivated
+
+    def hasType(self, node):
+        "Tell whether the type of node is one of typeNames"
+        return self.typeNames is None or node.getTypeName() in self.typeNames
+
+    def isPrunableNode(self, node, age):
+        "Tell whether node, not used for age seconds, is to be removed"
+        if self.minOcc is None and self.maxAge is None:
+            return False
+        if self.minOcc is not None and node.getOcc() >= self.minOcc:
+            return False
+        return (self.maxAge is None or age > self.maxAge) and \
+               self.hasType(node)
+
+    def isPrunableLink(self, link, age):
+        "Tell whether link, not used for age seconds, is to be removed"
+        if self.minCoOcc is None and self.maxAge is None:
+            return False
+        if self.minCoOcc is not None and link.getCoOcc() >= self.minCoOcc:
+            return False
+        return (self.maxAge is None or age > self.maxAge) and \
+               self.hasType(link.getNodeFrom())
+
+
+def parseMaxNodes(text):
+    """Parse the maximum numbers of nodes of types, like
+    "token:100000,sentence:20000"
+
+    Return a dictionary type name -> maximum number of nodes"""
+    maxNodes = {}
+    for item in text.split(","):
+        try:
+            typeName, number = item.split(":")
+            maxNodes[typeName.strip()] = int(number)
+        except ValueError:
+            raise ConceptNetworkBadParameter("Bad maximum number of nodes: %s"
+                                             % item)
+    return maxNodes
+
+
+def applyNow(function, *args):
+    "Call function(*args) (execute function of a Pruner without lock)"
+    return function(*args)
+
+
+class Pruner:
+    """Removes the nodes and links of a Concept Network under a policy
+    (see the module)."""
+    def __init__(self, cn, policy):
+        self.cn = cn
+        self.policy = policy
+        self.created = time.time()
+        self.nodeUse = {}       # node id -> time of its last use
+        self.linkUse = {}       # linkKey -> time of its last use
+        self.pending = []       # (symbol, type) of the nodes of the pass
+        self.passes = 0
+        self.removedNodes = 0
+        self.removedLinks = 0
+        self.thread = None
+        if policy.maxAge is not None:
+            cn.addListener(self)
+
+    def nodeAdded(self, node):
+        "The node is used"
+        self.nodeUse[self.cn.findNodeId(node)] = time.time()
+
+    def linkAdded(self, nodeFrom, nodeTo, nodeLabel, coOcc):
+        "The link is used"
+        self.linkUse[self.getLinkKey(nodeFrom, nodeTo, nodeLabel)] = \
+            time.time()
+
+    def nodeRemoved(self, node):
+        self.nodeUse.pop(self.cn.findNodeId(node), None)
+
+    def linkRemoved(self, nodeFrom, nodeTo, nodeLabel):
+        self.linkUse.pop(self.getLinkKey(nodeFrom, nodeTo, nodeLabel), None)
+
+    def getLinkKey(self, nodeFrom, nodeTo, nodeLabel):
+        labelId = None
+        if nodeLabel:
+            labelId = self.cn.findNodeId(nodeLabel)
+        return linkKey(self.cn.findNodeId(nodeFrom),
+                       self.cn.findNodeId(nodeTo), labelId)
+
+    def getNodeAge(self, node, now):
+        "Get the number of seconds since the last use of node"
+        return now - self.nodeUse.get(self.cn.findNodeId(node), self.created)
+
+    def getLinkAge(self, link, now):
+        "Get the number of seconds since the last use of link"
+        return now - self.linkUse.get(self.cn.getLinkKey(link), self.created)
+
+    def getActivatedNodes(self):
+        "Get the (symbol, type) of the nodes in the states of the network"
+        activated = set()
+        if self.policy.keepActivated:
+            for state in self.cn.state.values():
+                activated.update(state.nodeState)
+        return activated
+
+    def pruneNode(self, node, now):
+        """Remove the outgoing links of node to be removed, and node when it
+        is to be removed"""
+        policy = self.policy
+        for link in list(node.outgoingLinks):
+            if policy.isPrunableLink(link, self.getLinkAge(link, now)):
+                self.cn.removeLink(link.getNodeFrom(), link.getNodeTo(),
+                                   link.getNodeLabel())
+        if policy.isPrunableNode(node, self.getNodeAge(node, now)):
+            self.cn.removeNode(node)
+
+    def pruneTypes(self, activated, now):
+        """Remove the least occurring (and least recently used) nodes of the
+        types having more than their maximum number of nodes"""
+        for typeName, maximum in self.policy.maxNodes.iteritems():
+            nodes = [node for (symbol, type), node in self.cn.node.iteritems()
+                     if type == typeName]
+            if len(nodes) <= maximum:
+                continue
+            candidates = [node for node in nodes
+                          if (node.getSymbol(), typeName) not in activated]
+            for node in heapq.nsmallest(
+                    len(nodes) - maximum, candidates,
+                    key=lambda node: (node.getOcc(),
+                                      -self.getNodeAge(node, now))):
+                self.cn.removeNode(node)
+
+    def step(self, batchSize=1000, now=None):
+        """Prune batchSize nodes of the current pass (and their outgoing
+        links), beginning a new pass when there is none. At the end of a
+        pass, the types having too many nodes are pruned.
+
+        now: time of the pruning (see time.time)
+
+        Return a tuple (number of nodes removed, number of links removed)"""
+        if now is None:
+            now = time.time()
+        if not self.pending:
+            self.pending = self.cn.node.keys()
+        nbNodes = len(self.cn.node)
+        nbLinks = len(self.cn.link)
+        activated = self.getActivatedNodes()
+        for _ in xrange(min(batchSize, len(self.pending))):
+            key = self.pending.pop()
+            node = self.cn.node.get(key)
+            if node is not None and key not in activated:
+                self.pruneNode(node, now)
+        if not self.pending:
+            self.pruneTypes(activated, now)
+            self.passes += 1
+        nbNodes -= len(self.cn.node)
+        nbLinks -= len(self.cn.link)
+        self.removedNodes += nbNodes
+        self.removedLinks += nbLinks
+        return nbNodes, nbLinks
+
+    def prune(self, now=None):
+        """Do a whole pruning pass (finishing the current one, if any)
+
+        Return a tuple (number of nodes removed, number of links removed)"""
+        nbNodes, nbLinks = self.step(len(self.cn.node), now)
+        while self.pending:
+            nodes, links = self.step(len(self.pending), now)
+            nbNodes += nodes
+            nbLinks += links
+        return nbNodes, nbLinks
+
+    def start(self, interval, batchSize=1000, execute=applyNow):
+        """Do a pruning step every interval seconds, in a background thread
+
+        execute: function called with the step and its arguments, which
+                 applies it (see SharedNetwork.write)"""
+        self.stop()
+        self.thread = PrunerThread(self, interval, batchSize, execute)
+        self.thread.start()
+
+    def stop(self):
+        "Stop the background pruning"
+        if self.thread:
+            self.thread.stop()
+            self.thread = None
+
+    def getStats(self):
+        """Get the statistics of the pruning
+
+        Return a dictionary (passes, nodes, links, pending), nodes and
+        links being the numbers of nodes and links removed"""
+        return {"passes": self.passes,
+                "nodes": self.removedNodes,
+                "links": self.removedLinks,
+                "pending": len(self.pending)}
+
+
+class PrunerThread(threading.Thread):
+    "A thread doing the steps of a Pruner periodically"
+    def __init__(self, pruner, interval, batchSize, execute):
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+        self.pruner = pruner
+        self.interval = interval
+        self.batchSize = batchSize
+        self.execute = execute
+        self.stopped = threading.Event()
+
+    def run(self):
+        while True:
+            self.stopped.wait(self.interval)
+            if self.stopped.isSet():
+                break
+            self.execute(self.pruner.step, self.batchSize)
+
+    def stop(self):
+        self.stopped.set()
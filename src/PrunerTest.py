@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Unit test for Pruner.py"""
+
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+from Pruner import *
+from ConceptNetwork import ConceptNetwork, SparseState
+from Ector import Ector
+import time
+import unittest
+
+
+class PrunerTest(unittest.TestCase):
+    "Test the Pruner class"
+    def setUp(self):
+        self.ector = Ector("Ector", "User", cn=ConceptNetwork())
+        for entry in ("Hello you.", "How are you?", "Hello there."):
+            self.ector.addEntry(entry)
+        self.cn = self.ector.cn
+
+    def assertConsistent(self, cn):
+        "Check that the links of the nodes are the links of cn"
+        links = set()
+        for node in cn.node.itervalues():
+            for link in node.outgoingLinks:
+                self.assertTrue(cn.hasNode(link.getNodeTo()))
+                self.assertTrue(link in link.getNodeTo().incomingLinks)
+                links.add(link)
+            for link in node.incomingLinks:
+                self.assertTrue(link in link.getNodeFrom().outgoingLinks)
+            for link in node.labelingLinks:
+                self.assertTrue(link.getNodeLabel() is node)
+        self.assertEqual(set(cn.link.values()), links)
+
+    def testMinOcc(self):
+        """The nodes occurring less than minOcc are removed, with their
+        links"""
+        nbLinks = len(self.cn.link)
+        pruner = Pruner(self.cn, PruningPolicy(minOcc=2,
+                                               keepActivated=False))
+        self.assertEqual((7, nbLinks - 2), pruner.prune())
+        self.assertEqual([".", "Hello", "User", "you"],
+                         sorted([symbol for (symbol, type) in self.cn.node]))
+        self.assertConsistent(self.cn)
+        self.assertEqual({"passes": 1, "nodes": 7, "links": nbLinks - 2,
+                          "pending": 0}, pruner.getStats())
+
+    def testMinCoOcc(self):
+        """The links co-occurring less than minCoOcc are removed, the
+        nodes are kept"""
+        self.ector.addEntry("Hello you.")
+        nbNodes = len(self.cn.node)
+        pruner = Pruner(self.cn, PruningPolicy(minCoOcc=2,
+                                               typeNames=["token"],
+                                               keepActivated=False))
+        nodes, links = pruner.prune()
+        self.assertEqual(0, nodes)
+        self.assertEqual(nbNodes, len(self.cn.node))
+        for link in self.cn.link.itervalues():
+            self.assertTrue(link.getCoOcc() >= 2 or
+                            link.getNodeFrom().getTypeName() != "token")
+        self.assertEqual([u"Hello you.", u"you"],
+                         sorted([link.getNodeTo().getSymbol() for link in
+                                 self.cn.getNode("Hello", "token").outgoingLinks]))
+        self.assertEqual(0, len(self.cn.getNode("there", "token").outgoingLinks))
+        self.assertConsistent(self.cn)
+
+    def testMaxAge(self):
+        """Only the nodes and links not used for maxAge seconds are
+        removed"""
+        cn = ConceptNetwork()
+        ector = Ector("Ector", "User", cn=cn)
+        pruner = Pruner(cn, PruningPolicy(minOcc=2, maxAge=60,
+                                          keepActivated=False))
+        ector.addEntry("Hello you.")
+        now = time.time()
+        self.assertEqual((0, 0), pruner.prune(now))
+        pruner.nodeUse[cn.findNodeId(cn.getNode("you", "token"))] -= 120
+        self.assertEqual(1, pruner.prune(now)[0])
+        self.assertFalse(("you", "token") in cn.node)
+        self.assertConsistent(cn)
+
+    def testMaxNodes(self):
+        """The least occurring nodes of a type beyond its maximum are
+        removed"""
+        pruner = Pruner(self.cn, PruningPolicy(maxNodes={"token": 3},
+                                               keepActivated=False))
+        pruner.prune()
+        self.assertEqual([".", "Hello", "you"],
+                         sorted([symbol for (symbol, type) in self.cn.node
+                                 if type == "token"]))
+        self.assertEqual(3, len([type for (symbol, type) in self.cn.node
+                                 if type == "sentence"]))
+        self.assertConsistent(self.cn)
+        self.assertEqual({"token": 10, "sentence": 2},
+                         parseMaxNodes("token:10, sentence:2"))
+        self.assertRaises(ConceptNetworkBadParameter, parseMaxNodes, "token")
+
+    def testKeepActivated(self):
+        """The nodes in a state are kept"""
+        self.cn.removeAllStates()
+        state = SparseState("User")
+        state.fullyActivate("there", "token")
+        self.cn.addState(state)
+        Pruner(self.cn, PruningPolicy(minOcc=2)).prune()
+        self.assertTrue(("there", "token") in self.cn.node)
+        self.assertFalse(("How", "token") in self.cn.node)
+
+    def testSteps(self):
+        """A pass is done by steps, and the dialogue goes on between them"""
+        pruner = Pruner(self.cn, PruningPolicy(minOcc=2,
+                                               typeNames=["token"],
+                                               keepActivated=False))
+        nbNodes = len(self.cn.node)
+        pruner.step(3)
+        self.assertEqual(nbNodes - 3, len(pruner.pending))
+        self.ector.addEntry("How are you?")
+        while pruner.step(3) and pruner.pending:
+            pass
+        self.assertEqual(1, pruner.passes)
+        self.assertTrue(("How", "token") in self.cn.node)
+        self.assertFalse(("there", "token") in self.cn.node)
+        self.assertConsistent(self.cn)
+        self.ector.propagate(2)
+        self.ector.generateSentence()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,623 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Multi-user network server for Ector.
+
+An EctorServer hosts one ConceptNetwork, shared by the sessions of all
+its users; each user has their own State in it.
+
+Two protocols are served, each connection or request in its own thread
+(so that a slow reply does not stop the other sessions from being read):
+- a line-based TCP protocol: each line sent (in UTF-8) is an entry, or a
+  command (@person, @sentence, @generate, @stream, @latency, @states,
+  @stats, @write, @quit), and gets Ector's reply in one line (streamed as
+  it is generated, with @stream on),
+- HTTP/JSON: POST /entry with {"user": ..., "entry": ...} gets
+  {"reply": ..., "latency": ...}; GET /stats gets the latency statistics.
+
+The latency of each request (from its reception to its reply) is
+measured. When the owner Ector has Instruments, the times of the stages
+of the replies are measured too (@stats, GET /instruments).
+
+The rarely used nodes and links of the ConceptNetwork may be pruned in the
+background, by steps applied like the writes (see Pruner).
+"""
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+from Ector import Ector, logEntry, iterateText
+from ConceptNetwork import TemperatureNoItems
+from Instruments import Instruments
+from Pruner import Pruner, PruningPolicy, parseMaxNodes
+from SharedNetwork import SharedNetwork
+from StateManager import StateManager, isValidStateId
+from collections import deque
+import BaseHTTPServer
+import Queue
+import SocketServer
+import json
+import sys
+import threading
+import time
+
+
+def getPercentile(sortedValues, percent):
+    "Get the percentile of a sorted list of values"
+    if not sortedValues:
+        return 0
+    return sortedValues[int(round(percent / 100.0 * (len(sortedValues) - 1)))]
+
+
+class LatencyStats:
+    "Latencies of the requests (the percentiles are the ones of the last ones)"
+    def __init__(self, size=1000):
+        self.latencies = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, latency):
+        "Add the latency of a request (in seconds)"
+        self.lock.acquire()
+        try:
+            self.latencies.append(latency)
+            self.count += 1
+            self.total += latency
+        finally:
+            self.lock.release()
+
+    def getStats(self):
+        """Get the statistics of the latencies, in milliseconds
+
+        Return a dictionary (count, mean, p50, p95, p99, max)"""
+        self.lock.acquire()
+        try:
+            latencies = sorted(self.latencies)
+            count, total = self.count, self.total
+        finally:
+            self.lock.release()
+        stats = {"count": count,
+                 "mean": count and 1000 * total / count or 0,
+                 "max": latencies and 1000 * latencies[-1] or 0}
+        for percent in (50, 95, 99):
+            stats["p%d" % percent] = 1000 * getPercentile(latencies, percent)
+        return stats
+
+
+class Session:
+    """The dialogue of one user with Ector.
+
+    It answers the entries like the dialogue of Ector's main: the entry is
+    learnt (a write of the shared network), then the reply is computed (a
+    read)."""
+    def __init__(self, owner, username, states, sentenceMode=False,
+                 maxLength=None, timeBudget=None, candidates=1):
+        """owner:      Ector holding the ConceptNetwork
+        states:     StateManager of the ConceptNetwork
+        maxLength:  maximum number of tokens of a generated reply
+        timeBudget: time (in seconds) after which a generated reply stops
+        candidates: number of replies generated, the best being chosen
+                    (see Ector.generateSentences)"""
+        self.ector = Ector(owner.botname, username, cn=owner.cn,
+                           states=states)
+        self.ector.epsilon = owner.epsilon
+        self.ector.instruments = owner.instruments
+        self.sentenceMode = sentenceMode
+        self.maxLength = maxLength
+        self.timeBudget = timeBudget
+        self.candidates = candidates
+        self.previousSentenceNode = None
+        self.nodes = None
+        # A user may have several connections
+        self.lock = threading.Lock()
+        self.acquired = False
+
+    def learn(self, entry):
+        """Learn the entry (and link it to the previous sentence)
+
+        The state of the user is acquired, until the reply is computed"""
+        ector = self.ector
+        ector.states.acquire(ector.username)
+        self.acquired = True
+        lastSentenceNode = ector.addEntry(entry)
+        # The nodes of the previous reply may have been pruned since
+        if self.previousSentenceNode:
+            if ector.cn.hasNode(self.previousSentenceNode):
+                ector.cn.addLink(self.previousSentenceNode, lastSentenceNode)
+        elif self.sentenceMode:
+            # First sentence of a dialogue
+            lastSentenceNode.beg += 1
+        if self.nodes and lastSentenceNode:
+            # Link the nodes of the generated sentence to the entry
+            for node in self.nodes:
+                if ector.cn.hasNode(node):
+                    ector.cn.addLink(node, lastSentenceNode)
+        self.previousSentenceNode = lastSentenceNode
+
+    def reply(self, output=None):
+        """Get the reply of Ector to the last entry
+
+        output: when given, function called with each part of a generated
+                reply, as soon as it is generated (it should not block,
+                the ConceptNetwork being read)
+
+        Return the reply (None when there is no reply)"""
+        ector = self.ector
+        ector.cleanState()
+        ector.propagate(2)
+        reply = None
+        try:
+            if self.sentenceMode:
+                replyNode = ector.getActivatedSentenceNode()
+                if replyNode:
+                    reply = replyNode.getSymbol()
+                self.previousSentenceNode = replyNode or None
+            elif self.candidates > 1:
+                (reply, self.nodes) = ector.generateBestSentence(
+                    self.candidates, self.maxLength, self.timeBudget)
+                self.previousSentenceNode = None
+                if output:
+                    output(self.personalize(reply))
+            elif output:
+                reply = self.streamReply(output)
+                self.previousSentenceNode = None
+            else:
+                (reply, self.nodes) = ector.generateSentence(
+                    False, self.maxLength, self.timeBudget)
+                self.previousSentenceNode = None
+        except TemperatureNoItems:
+            pass
+        return reply and self.personalize(reply)
+
+    def streamReply(self, output):
+        """Generate a reply, giving its parts to output as they are
+        generated (see reply)
+
+        Return the reply"""
+        self.nodes = []
+        def getSymbols():
+            for node in self.ector.streamSentence(self.maxLength,
+                                                  self.timeBudget):
+                self.nodes.append(node)
+                yield node.getSymbol()
+        texts = []
+        for text in iterateText(getSymbols()):
+            text = self.personalize(text)
+            output(text)
+            texts.append(text)
+        return "".join(texts)
+
+    def personalize(self, reply):
+        "Replace @bot@ and @user@ in the reply"
+        reply = reply.replace("@bot@",  self.ector.username)
+        return reply.replace("@user@", self.ector.botname)
+
+    def answer(self, entry, shared, output=None):
+        """Learn the entry, and get the reply of Ector
+
+        shared: SharedNetwork of the ConceptNetwork
+        output: function streaming the reply (see streamAnswer)
+
+        Return the reply (None when there is no reply)"""
+        self.lock.acquire()
+        try:
+            shared.write(self.learn, entry)
+            if output:
+                return self.streamAnswer(shared, output)
+            return shared.read(self.reply)
+        finally:
+            if self.acquired:
+                self.ector.states.release(self.ector.username)
+                self.acquired = False
+            self.lock.release()
+
+    def streamAnswer(self, shared, output):
+        """Get the reply, giving its parts to output as they are generated
+
+        The reply is generated in another thread, reading the
+        ConceptNetwork, while output is called in this one: a slow output
+        (a socket) does not keep the writer and the other readers waiting.
+
+        Return the reply (None when there is no reply)"""
+        parts = Queue.Queue()
+        result = {}
+        def generate():
+            try:
+                result["reply"] = shared.read(self.reply, parts.put)
+            except:
+                result["error"] = sys.exc_info()
+            parts.put(None)
+        thread = threading.Thread(target=generate)
+        thread.setDaemon(True)
+        thread.start()
+        try:
+            part = parts.get()
+            while part is not None:
+                output(part)
+                part = parts.get()
+        finally:
+            # The state of the user is released only once the reply is done
+            thread.join()
+        if "error" in result:
+            raise result["error"][0], result["error"][1], result["error"][2]
+        return result["reply"]
+
+
+class EctorServer:
+    """A server of Ector, for several users at the same time.
+
+    The sessions share the ConceptNetwork of the owner Ector, through a
+    SharedNetwork: the replies are computed in parallel, and the entries
+    are learnt by its writer thread.
+
+    The states of the users are loaded on demand by a StateManager, which
+    keeps at most capacity of them (plus the ones in use)."""
+    def __init__(self, owner, sentenceMode=False, logname=None, verbose=False,
+                 capacity=1000, directory=None, maxLength=None,
+                 timeBudget=None, candidates=1):
+        """owner:      Ector holding the ConceptNetwork (and its journal)
+        logname:    when given, file where the dialogues are logged
+        capacity:   number of users' states kept in memory
+        directory:  directory of the users' states files
+        maxLength:  maximum number of tokens of a generated reply
+        timeBudget: time (in seconds) after which a generated reply stops
+        candidates: number of replies generated, the best being chosen"""
+        self.owner = owner
+        self.sentenceMode = sentenceMode
+        self.maxLength = maxLength
+        self.timeBudget = timeBudget
+        self.candidates = candidates
+        self.logname = logname
+        self.verbose = verbose
+        self.shared = SharedNetwork(owner.cn)
+        self.states = StateManager(owner.cn, capacity, directory)
+        self.lock = threading.Lock()    # of sessions
+        self.sessions = {}              # username -> Session
+        self.latency = LatencyStats()
+        self.pruner = None
+        self.servers = []
+
+    def getSession(self, username):
+        "Get the session of username, creating it when needed"
+        self.lock.acquire()
+        try:
+            if username not in self.sessions:
+                # The state of the user is added to the ConceptNetwork
+                self.sessions[username] = self.shared.write(
+                    Session, self.owner, username, self.states,
+                    self.sentenceMode, self.maxLength, self.timeBudget,
+                    self.candidates)
+            return self.sessions[username]
+        finally:
+            self.lock.release()
+
+    def setSentenceMode(self, username, sentenceMode):
+        "Set the reply mode of username (sentence or generate)"
+        self.getSession(username).sentenceMode = sentenceMode
+
+    def answer(self, username, entry, output=None):
+        """Learn the entry of username, and get the reply of Ector
+
+        output: function streaming the reply (see Session.streamAnswer)
+
+        Return a tuple (reply, latency in seconds)"""
+        start = time.time()
+        reply = self.getSession(username).answer(entry, self.shared, output)
+        latency = time.time() - start
+        self.latency.add(latency)
+        if self.logname:
+            logEntry(self.logname, username, entry)
+            if reply:
+                logEntry(self.logname, self.owner.botname, reply)
+        if self.verbose:
+            print "%s: %.1f ms" % (username.encode("utf-8"), 1000 * latency)
+        return reply, latency
+
+    def startPruning(self, policy, interval, batchSize=1000):
+        """Prune the ConceptNetwork under policy (a PruningPolicy), by
+        steps of batchSize nodes every interval seconds, applied by the
+        writer of the SharedNetwork
+
+        Return the Pruner"""
+        self.stopPruning()
+        self.pruner = self.shared.write(Pruner, self.owner.cn, policy)
+        self.pruner.start(interval, batchSize, self.shared.write)
+        return self.pruner
+
+    def stopPruning(self):
+        "Stop the pruning of the ConceptNetwork"
+        if self.pruner:
+            self.pruner.stop()
+
+    def getPruningStats(self):
+        "Get the statistics of the pruning (see Pruner.getStats)"
+        return self.pruner and self.pruner.getStats() or {}
+
+    def dump(self):
+        "Save the ConceptNetwork, and the states of the users"
+        # Dumping removes the states from the ConceptNetwork for a while
+        self.shared.write(self.owner.dumpNetwork)
+        self.shared.write(self.states.flush)
+
+    def serve(self, server):
+        "Serve the requests of server (a SocketServer) in a thread"
+        server.ectorServer = self
+        self.servers.append(server)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.setDaemon(True)
+        thread.start()
+        return server
+
+    def serveTcp(self, host, port):
+        """Serve the line-based TCP protocol on host:port
+
+        Return the SocketServer"""
+        return self.serve(ThreadingTCPServer((host, port), LineHandler))
+
+    def serveHttp(self, host, port):
+        """Serve HTTP/JSON on host:port
+
+        Return the SocketServer"""
+        return self.serve(ThreadingHTTPServer((host, port), JsonHandler))
+
+    def shutdown(self):
+        "Stop serving"
+        self.stopPruning()
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        self.servers = []
+        self.shared.stop()
+        self.states.close()
+
+
+class ThreadingTCPServer(SocketServer.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class LineHandler(SocketServer.StreamRequestHandler):
+    """A TCP connection: each line is an entry, or a command:
+    - @person name: change the name of the utterer (User by default)
+    - @sentence on, @generate on: change the reply mode
+    - @stream on, @stream off: write the generated replies as they are
+      generated
+    - @latency: get the latency statistics
+    - @states: get the statistics of the users' states in memory
+    - @stats: get the times of the stages of the replies (see
+      Ector.getStats)
+    - @pruning: get the statistics of the pruning (see Pruner.getStats)
+    - @write: save the ConceptNetwork and the states
+    - @quit: close the connection"""
+    def write(self, line):
+        self.wfile.write(line.encode("utf-8") + "\n")
+
+    def writeText(self, text):
+        self.wfile.write(text.encode("utf-8"))
+
+    def handle(self):
+        server = self.server.ectorServer
+        username = u"User"
+        stream = False
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            entry = unicode(line.strip(), "utf-8", "replace")
+            if entry.startswith("@person "):
+                name = entry[8:].strip()
+                if isValidStateId(name):
+                    username = name
+                    self.write(u"Hello %s" % username)
+                else:
+                    self.write(u"Bad user name %s" % name)
+            elif entry.lower() == "@sentence on":
+                server.setSentenceMode(username, True)
+                self.write(u"Sentence reply mode ON")
+            elif entry.lower() == "@generate on":
+                server.setSentenceMode(username, False)
+                self.write(u"Generate reply mode ON")
+            elif entry.lower() in ("@stream on", "@stream off"):
+                stream = entry.lower() == "@stream on"
+                self.write(u"Streaming %s" % (stream and "ON" or "OFF"))
+            elif entry == "@latency":
+                self.write(json.dumps(server.latency.getStats()).decode("utf-8"))
+            elif entry == "@states":
+                self.write(json.dumps(server.states.getStats()).decode("utf-8"))
+            elif entry == "@stats":
+                self.write(json.dumps(server.owner.getStats()).decode("utf-8"))
+            elif entry == "@pruning":
+                self.write(json.dumps(server.getPruningStats()).decode("utf-8"))
+            elif entry == "@write":
+                server.dump()
+                self.write(u"Saved")
+            elif entry in ("@quit", "@exit", "@bye"):
+                break
+            elif entry.startswith("@"):
+                self.write(u"There is no command %s" % entry)
+            elif entry and stream:
+                server.answer(username, entry, self.writeText)
+                self.write(u"")
+            elif entry:
+                reply, latency = server.answer(username, entry)
+                self.write(reply or u"")
+
+
+class JsonHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """HTTP/JSON requests:
+    - POST /entry {"user": ..., "entry": ..., "mode": "sentence"|"generate"}
+      returns {"reply": ..., "latency": ...} (latency in milliseconds)
+    - GET /stats returns the latency statistics
+    - GET /states returns the statistics of the users' states in memory
+    - GET /instruments returns the times of the stages of the replies
+      (see Ector.getStats)
+    - GET /pruning returns the statistics of the pruning"""
+    def sendJson(self, code, data):
+        body = json.dumps(data)
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self.sendJson(200, self.server.ectorServer.latency.getStats())
+        elif self.path == "/states":
+            self.sendJson(200, self.server.ectorServer.states.getStats())
+        elif self.path == "/instruments":
+            self.sendJson(200, self.server.ectorServer.owner.getStats())
+        elif self.path == "/pruning":
+            self.sendJson(200, self.server.ectorServer.getPruningStats())
+        else:
+            self.sendJson(404, {"error": "unknown path %s" % self.path})
+
+    def do_POST(self):
+        try:
+            self.postEntry()
+        except Exception, e:
+            # The client gets an answer, even when the server fails
+            self.sendJson(500, {"error": "%s: %s" % (e.__class__.__name__, e)})
+
+    def postEntry(self):
+        server = self.server.ectorServer
+        if self.path != "/entry":
+            self.sendJson(404, {"error": "unknown path %s" % self.path})
+            return
+        try:
+            length = int(self.headers.getheader("Content-Length", 0))
+            data = json.loads(self.rfile.read(length))
+            username = data.get("user", u"User")
+            entry = data["entry"].strip()
+        except (ValueError, KeyError, AttributeError):
+            self.sendJson(400, {"error": "bad request"})
+            return
+        if not isValidStateId(username):
+            self.sendJson(400, {"error": "bad user name"})
+            return
+        if not entry:
+            # Like in Ector's dialogue, an empty entry is not learnt
+            self.sendJson(400, {"error": "empty entry"})
+            return
+        if "mode" in data:
+            server.setSentenceMode(username, data["mode"] == "sentence")
+        reply, latency = server.answer(username, entry)
+        self.sendJson(200, {"reply": reply, "latency": 1000 * latency})
+
+    def log_message(self, format, *args):
+        if self.server.ectorServer.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+def main():
+    from optparse import OptionParser
+
+    usage = "usage: %prog [-n botname=Ector][-H host][-t port][-w port][-s|-g][-l logfilepath][-e epsilon][-j journal][-c capacity][-L length][-b budget][-k candidates][-i][-P interval][--min-occ occ][--min-cooc cooc][--max-age age][--max-nodes type:number,...][-v][-h]"
+    parser = OptionParser(usage=usage, version="%prog 0.3")
+    parser.add_option("-n", "--name", dest="botname", default="Ector",
+                      help="set the name of the bot")
+    parser.add_option("-H", "--host", dest="host", default="localhost",
+                      help="listen on HOST")
+    parser.add_option("-t", "--tcp", dest="tcp", type="int", default=7777,
+                      help="serve the line protocol on port TCP (0: don't)")
+    parser.add_option("-w", "--http", dest="http", type="int", default=8080,
+                      help="serve HTTP/JSON on port HTTP (0: don't)")
+    parser.add_option("-s", "--sentence", action="store_true", dest="sentence", default=False,
+                      help="set sentence reply mode on")
+    parser.add_option("-g", "--generate", action="store_false", dest="sentence",
+                      help="set generate reply mode on")
+    parser.add_option("-l", "--log", dest="logname", default=None,
+                      help="log the dialogues in log file")
+    parser.add_option("-e", "--epsilon", dest="epsilon", type="float", default=None,
+                      help="propagate from the activated nodes only, forgetting the nodes below epsilon")
+    parser.add_option("-j", "--journal", dest="journal", default=None,
+                      help="store the Concept Network in an append-only journal (path prefix)")
+    parser.add_option("-c", "--capacity", dest="capacity", type="int", default=1000,
+                      help="keep the states of CAPACITY users in memory")
+    parser.add_option("-L", "--length", dest="length", type="int", default=None,
+                      help="generate replies of at most LENGTH tokens")
+    parser.add_option("-b", "--budget", dest="budget", type="float", default=None,
+                      help="stop generating a reply after BUDGET milliseconds")
+    parser.add_option("-k", "--candidates", dest="candidates", type="int", default=1,
+                      help="generate CANDIDATES replies, and choose the best one")
+    parser.add_option("-i", "--instruments", action="store_true", dest="instruments", default=False,
+                      help="measure the time of the stages of the replies (see @stats)")
+    parser.add_option("-P", "--prune", dest="prune", type="float", default=None,
+                      help="prune the Concept Network by steps of 1000 nodes every PRUNE seconds")
+    parser.add_option("--min-occ", dest="minOcc", type="int", default=None,
+                      help="prune the nodes occurring less than MINOCC times")
+    parser.add_option("--min-cooc", dest="minCoOcc", type="int", default=None,
+                      help="prune the links co-occurring less than MINCOOC times")
+    parser.add_option("--max-age", dest="maxAge", type="float", default=None,
+                      help="prune only the nodes and links not used for MAXAGE hours")
+    parser.add_option("--max-nodes", dest="maxNodes", default=None,
+                      help="keep at most MAXNODES nodes of types (like token:100000,sentence:20000)")
+    parser.add_option("-v", "--verbose", action="store_true", dest="verbose", default=False,
+                      help="print the latency of each request")
+
+    (options, args) = parser.parse_args()
+
+    owner = Ector(options.botname.capitalize(), None, options.journal)
+    owner.epsilon = options.epsilon
+    if options.instruments:
+        owner.instruments = Instruments()
+    server = EctorServer(owner, options.sentence, options.logname,
+                         options.verbose, options.capacity, None,
+                         options.length,
+                         options.budget and options.budget / 1000.0,
+                         options.candidates)
+    if options.prune:
+        policy = PruningPolicy(options.minOcc, options.minCoOcc,
+                               options.maxAge and options.maxAge * 3600,
+                               options.maxNodes and parseMaxNodes(options.maxNodes),
+                               ["token", "sentence", "expression"])
+        server.startPruning(policy, options.prune)
+    if options.tcp:
+        server.serveTcp(options.host, options.tcp)
+        print "Line protocol on %s:%d" % (options.host, options.tcp)
+    if options.http:
+        server.serveHttp(options.host, options.http)
+        print "HTTP/JSON on %s:%d" % (options.host, options.http)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    server.dump()
+    server.shutdown()
+    if owner.journal:
+        owner.journal.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
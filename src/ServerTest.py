@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Unit test for Server.py
+
+Test the sessions of the EctorServer, and its protocols.
+"""
+
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+from Server import *
+from ConceptNetwork import ConceptNetwork
+import json
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+import urllib2
+
+
+class EctorServerTest(unittest.TestCase):
+    "Test the EctorServer class"
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.owner  = Ector("Ector", None, cn=ConceptNetwork())
+        self.server = EctorServer(self.owner, capacity=2,
+                                  directory=self.directory)
+
+    def tearDown(self):
+        self.server.shutdown()
+        shutil.rmtree(self.directory)
+
+    def testSharedNetwork(self):
+        """The users share the Concept Network, with their own states"""
+        self.server.answer(u"Alice", u"Hello Ector.")
+        self.server.answer(u"Bob", u"How are you?")
+        cn = self.owner.cn
+        self.assertTrue(cn.getNode(u"Hello @bot@.", "sentence"))
+        self.assertTrue(cn.getNode(u"How are you?", "sentence"))
+        self.assertTrue(u"Alice" in cn.state)
+        self.assertTrue(u"Bob" in cn.state)
+        self.assertTrue(self.server.getSession(u"Alice").ector.cn is cn)
+
+    def testSentenceReply(self):
+        """In sentence mode, the reply is a known sentence"""
+        self.server.setSentenceMode(u"Alice", True)
+        reply, latency = self.server.answer(u"Alice", u"Hello Ector.")
+        self.assertEqual(u"Hello Alice.", reply)
+        self.assertTrue(latency >= 0)
+
+    def testLatency(self):
+        """Each request's latency is measured"""
+        self.server.answer(u"Alice", u"Hello.")
+        self.server.answer(u"Alice", u"Hello again.")
+        stats = self.server.latency.getStats()
+        self.assertEqual(2, stats["count"])
+        self.assertTrue(stats["max"] >= stats["p50"] >= 0)
+
+    def testConcurrentUsers(self):
+        """Entries of users in several threads are all learnt"""
+        def talk(username):
+            for _ in range(5):
+                self.server.answer(username, u"Hello you.")
+        threads = [threading.Thread(target=talk, args=(u"User%d" % i,))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        sentence = self.owner.cn.getNode(u"Hello you.", "sentence")
+        self.assertEqual(20, sentence.getOcc())
+
+    def testSlowStream(self):
+        """A slow streamed reply does not block the other users"""
+        self.server.answer(u"Alice", u"Hello Ector, how are you?")
+        streaming = threading.Event()
+        proceed = threading.Event()
+        def output(text):
+            streaming.set()
+            proceed.wait(5)
+        alice = threading.Thread(target=self.server.answer,
+                                 args=(u"Alice", u"Fine, and you?", output))
+        alice.start()
+        try:
+            self.assertTrue(streaming.wait(5))
+            bob = threading.Thread(target=self.server.answer,
+                                   args=(u"Bob", u"How are you?"))
+            bob.start()
+            bob.join(2)
+            self.assertFalse(bob.isAlive())
+        finally:
+            proceed.set()
+            alice.join()
+        self.assertTrue(self.owner.cn.getNode(u"How are you?", "sentence"))
+
+    def testCandidates(self):
+        """The best of several generated replies is chosen"""
+        self.server.candidates = 3
+        self.server.answer(u"Alice", u"Hello Ector, how are you?")
+        reply, latency = self.server.answer(u"Alice", u"Fine, and you?")
+        self.assertTrue(reply)
+        self.assertEqual(3, self.server.getSession(u"Alice").candidates)
+
+    def testStates(self):
+        """Only capacity states stay in memory, the others are reloaded"""
+        self.server.answer(u"Alice", u"Hello Ector.")
+        for username in (u"Bob", u"Carol", u"Dave"):
+            self.server.answer(username, u"How are you?")
+        self.assertFalse(u"Alice" in self.owner.cn.state)
+        self.server.answer(u"Alice", u"Fine.")
+        self.assertTrue(u"Alice" in self.owner.cn.state)
+        stats = self.server.states.getStats()
+        self.assertEqual(2, stats["states"])
+        self.assertTrue(stats["evictions"] >= 3)
+
+    def testTcp(self):
+        """The line protocol replies one line per entry"""
+        tcp = self.server.serveTcp("localhost", 0)
+        s = socket.create_connection(tcp.server_address)
+        f = s.makefile("rw", 0)
+        f.write("@person ../Alice\n")
+        self.assertEqual("Bad user name ../Alice\n", f.readline())
+        f.write("@person Alice\n")
+        self.assertEqual("Hello Alice\n", f.readline())
+        f.write("@sentence on\n")
+        f.readline()
+        f.write("Hello Ector.\n")
+        self.assertEqual("Hello Alice.\n", f.readline())
+        f.write("@generate on\n")
+        f.readline()
+        f.write("@stream on\n")
+        self.assertEqual("Streaming ON\n", f.readline())
+        f.write("Hello Ector.\n")
+        self.assertTrue(f.readline().endswith("\n"))
+        f.write("@quit\n")
+        self.assertEqual("", f.readline())
+        f.close()
+        s.close()
+
+    def testHttp(self):
+        """The HTTP/JSON protocol replies the entries, and the stats"""
+        http = self.server.serveHttp("localhost", 0)
+        url = "http://%s:%d" % http.server_address
+        data = json.dumps({"user": "Alice", "entry": "Hello Ector.",
+                           "mode": "sentence"})
+        reply = json.loads(urllib2.urlopen(url + "/entry", data).read())
+        self.assertEqual(u"Hello Alice.", reply["reply"])
+        stats = json.loads(urllib2.urlopen(url + "/stats").read())
+        self.assertEqual(1, stats["count"])
+        data = json.dumps({"user": "../Alice", "entry": "Hello Ector."})
+        try:
+            urllib2.urlopen(url + "/entry", data)
+            self.fail("a user name with a path was accepted")
+        except urllib2.HTTPError, e:
+            self.assertEqual(400, e.code)
+        data = json.dumps({"user": "Alice", "entry": "  ", "mode": "sentence"})
+        try:
+            urllib2.urlopen(url + "/entry", data)
+            self.fail("an empty entry was accepted")
+        except urllib2.HTTPError, e:
+            self.assertEqual(400, e.code)
+        self.server.answer = None       # fails
+        data = json.dumps({"user": "Alice", "entry": "Hello Ector."})
+        try:
+            urllib2.urlopen(url + "/entry", data)
+            self.fail("a failed request was answered with a success")
+        except urllib2.HTTPError, e:
+            self.assertEqual(500, e.code)
+
+    def testInstruments(self):
+        """The sessions share the instruments of the owner, which are
+        scraped with @stats or GET /instruments"""
+        self.owner.instruments = Instruments()
+        self.server.answer(u"Alice", u"Hello Ector.")
+        self.server.answer(u"Bob", u"How are you?")
+        http = self.server.serveHttp("localhost", 0)
+        url = "http://%s:%d" % http.server_address
+        stats = json.loads(urllib2.urlopen(url + "/instruments").read())
+        self.assertEqual(2, stats["timers"]["propagate"]["count"])
+        self.assertEqual(2, stats["timers"]["entry"]["count"])
+        tcp = self.server.serveTcp("localhost", 0)
+        s = socket.create_connection(tcp.server_address)
+        f = s.makefile("rw", 0)
+        f.write("@stats\n")
+        stats = json.loads(f.readline())
+        self.assertEqual(2, stats["counters"]["stateSize"]["count"])
+        f.close()
+        s.close()
+
+    def testPruning(self):
+        """The Concept Network is pruned in the background, and the
+        sessions go on with the nodes of their previous replies removed"""
+        self.server.setSentenceMode(u"Alice", True)
+        self.server.answer(u"Alice", u"Hello Ector.")
+        self.server.answer(u"Bob", u"How are you?")
+        policy = PruningPolicy(minOcc=2, typeNames=["token", "sentence"],
+                               keepActivated=False)
+        pruner = self.server.startPruning(policy, 0.01, 5)
+        for _ in range(500):
+            if pruner.passes:
+                break
+            time.sleep(0.01)
+        self.server.stopPruning()
+        self.assertTrue(pruner.passes)
+        cn = self.owner.cn
+        self.assertEqual(set(["utterer"]),
+                         set([type for (symbol, type) in cn.node]))
+        self.assertEqual(pruner.removedNodes,
+                         self.server.getPruningStats()["nodes"])
+        reply, latency = self.server.answer(u"Alice", u"Hello again.")
+        self.assertEqual(u"Hello again.", reply)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Sharing of a Concept Network between threads.
+
+Nothing in a ConceptNetwork is safe to be changed by a thread while
+another one reads it (a propagation iterating over the nodes or the links
+would fail, or see a link without its nodes).
+
+A SharedNetwork gives two kinds of access to a Concept Network:
+- reads (propagations, generation of sentences, in the states of the
+  users) are done in parallel, under a ReadWriteLock,
+- writes (addition of the entries' nodes and links) are queued, and
+  applied in order by a single writer thread: all the writes waiting are
+  applied in one batch, in which no read is done.
+
+The version of the SharedNetwork is incremented after each batch.
+"""
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+from ConceptNetwork import ConceptNetworkError
+import Queue
+import sys
+import threading
+
+
+class SharedNetworkError(ConceptNetworkError):
+    pass
+
+
+class ReadWriteLock:
+    """A lock held by several readers, or by one writer.
+
+    A waiting writer has priority over the readers arriving after it, so
+    that writes are not delayed forever by overlapping reads."""
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writing = False
+        self.waitingWriters = 0
+
+    def acquireRead(self):
+        self.condition.acquire()
+        try:
+            while self.writing or self.waitingWriters:
+                self.condition.wait()
+            self.readers += 1
+        finally:
+            self.condition.release()
+
+    def releaseRead(self):
+        self.condition.acquire()
+        try:
+            self.readers -= 1
+            if not self.readers:
+                self.condition.notifyAll()
+        finally:
+            self.condition.release()
+
+    def acquireWrite(self):
+        self.condition.acquire()
+        try:
+            self.waitingWriters += 1
+            while self.writing or self.readers:
+                self.condition.wait()
+            self.waitingWriters -= 1
+            self.writing = True
+        finally:
+            self.condition.release()
+
+    def releaseWrite(self):
+        self.condition.acquire()
+        try:
+            self.writing = False
+            self.condition.notifyAll()
+        finally:
+            self.condition.release()
+
+
+class Write:
+    "A write waiting in the queue of a SharedNetwork"
+    def __init__(self, function, args):
+        self.function = function
+        self.args = args
+        self.result = None
+        self.excInfo = None
+        self.done = threading.Event()
+
+    def apply(self):
+        try:
+            self.result = self.function(*self.args)
+        except:
+            self.excInfo = sys.exc_info()
+
+    def wait(self):
+        "Wait for the write to be applied, and return its result"
+        self.done.wait()
+        if self.excInfo:
+            raise self.excInfo[0], self.excInfo[1], self.excInfo[2]
+        return self.result
+
+
+class SharedNetwork:
+    """A Concept Network shared between threads (see the module).
+
+    The functions given to read and write get their arguments; they
+    should use the Concept Network only during their call."""
+    def __init__(self, cn, maxBatch=1000):
+        """cn:       shared Concept Network
+        maxBatch: maximum number of writes applied in one batch"""
+        self.cn = cn
+        self.maxBatch = maxBatch
+        self.lock = ReadWriteLock()
+        self.queue = Queue.Queue()
+        self.version = 0
+        self.nbBatches = 0
+        self.nbWrites = 0
+        self.writer = threading.Thread(target=self.applyWrites)
+        self.writer.setDaemon(True)
+        self.writer.start()
+
+    def read(self, function, *args):
+        """Call function(*args), while no write is applied
+
+        Return its result"""
+        self.lock.acquireRead()
+        try:
+            return function(*args)
+        finally:
+            self.lock.releaseRead()
+
+    def write(self, function, *args):
+        """Queue the call to function(*args), and wait for it to be
+        applied by the writer thread
+
+        Return its result (or raise its exception)"""
+        return self.writeLater(function, *args).wait()
+
+    def writeLater(self, function, *args):
+        """Queue the call to function(*args)
+
+        Return the Write queued (whose wait method returns the result)"""
+        if not self.writer:
+            raise SharedNetworkError("The shared network is stopped")
+        write = Write(function, args)
+        self.queue.put(write)
+        return write
+
+    def applyWrites(self):
+        "Apply the queued writes by batches, until stop (writer thread)"
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.maxBatch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Queue.Empty:
+                    break
+            stopping = None in batch
+            batch = [write for write in batch if write]
+            self.lock.acquireWrite()
+            try:
+                for write in batch:
+                    write.apply()
+                self.version += 1
+                self.nbBatches += 1
+                self.nbWrites += len(batch)
+            finally:
+                self.lock.releaseWrite()
+            for write in batch:
+                write.done.set()
+            if stopping:
+                break
+
+    def stop(self):
+        "Apply the writes queued, and stop the writer thread"
+        if self.writer:
+            writer, self.writer = self.writer, None
+            self.queue.put(None)
+            writer.join()
+            # Writes queued while stopping
+            while not self.queue.empty():
+                write = self.queue.get()
+                if write:
+                    write.apply()
+                    write.done.set()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Unit test for SharedNetwork.py
+
+Test the ReadWriteLock, and the reads and writes of a SharedNetwork.
+"""
+
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+
+from SharedNetwork import *
+from ConceptNetwork import ConceptNetwork, Node
+import threading
+import time
+import unittest
+
+
+class ReadWriteLockTest(unittest.TestCase):
+    "Test the ReadWriteLock class"
+    def testReaders(self):
+        """Several readers hold the lock at the same time"""
+        lock = ReadWriteLock()
+        lock.acquireRead()
+        reader = threading.Thread(target=lock.acquireRead)
+        reader.start()
+        reader.join(1)
+        self.assertFalse(reader.isAlive())
+        self.assertEqual(2, lock.readers)
+
+    def testWriter(self):
+        """A writer waits for the readers, and the next readers wait for it"""
+        lock = ReadWriteLock()
+        events = []
+        lock.acquireRead()
+        def write():
+            lock.acquireWrite()
+            events.append("write")
+            lock.releaseWrite()
+        def read():
+            lock.acquireRead()
+            events.append("read")
+            lock.releaseRead()
+        writer = threading.Thread(target=write)
+        writer.start()
+        while not lock.waitingWriters:
+            time.sleep(0.001)
+        reader = threading.Thread(target=read)
+        reader.start()
+        time.sleep(0.01)
+        self.assertEqual([], events)
+        lock.releaseRead()
+        writer.join(1)
+        reader.join(1)
+        self.assertEqual(["write", "read"], events)
+
+
+class SharedNetworkTest(unittest.TestCase):
+    "Test the SharedNetwork class"
+    def setUp(self):
+        self.shared = SharedNetwork(ConceptNetwork())
+
+    def tearDown(self):
+        self.shared.stop()
+
+    def testWrite(self):
+        """Writes are applied, and return their result"""
+        node = self.shared.write(self.shared.cn.addNode, Node("Hello"))
+        self.assertEqual("Hello", node.getSymbol())
+        self.assertEqual(1, self.shared.version)
+        self.assertEqual(node, self.shared.read(self.shared.cn.getNode,
+                                                "Hello"))
+
+    def testWriteError(self):
+        """The exception of a write is raised by write"""
+        self.assertRaises(ConceptNetworkError, self.shared.write,
+                          self.shared.cn.getNode, "Unknown")
+
+    def testBatch(self):
+        """Writes queued during a read are applied in one batch, in order"""
+        cn = self.shared.cn
+        self.shared.lock.acquireRead()
+        writes = [self.shared.writeLater(cn.addNode, Node("Hello"))
+                  for _ in range(10)]
+        self.shared.lock.releaseRead()
+        for write in writes:
+            write.wait()
+        self.assertEqual(10, cn.getNode("Hello").getOcc())
+        self.assertEqual(10, self.shared.nbWrites)
+        self.assertTrue(self.shared.nbBatches <= 2)
+
+    def testConcurrentWrites(self):
+        """Co-occurrences written by several threads are all counted"""
+        cn = self.shared.cn
+        hello = self.shared.write(cn.addNode, Node("Hello"))
+        world = self.shared.write(cn.addNode, Node("World"))
+        def write():
+            for _ in range(100):
+                self.shared.write(cn.addLink, hello, world)
+                self.shared.read(lambda: list(cn.getLinksFrom(hello)))
+        threads = [threading.Thread(target=write) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(400, cn.getLink(hello, world).getCoOcc())
+        self.assertEqual(1, len(hello.outgoingLinks))
+
+    def testStop(self):
+        """No write is accepted after stop"""
+        self.shared.stop()
+        self.assertRaises(SharedNetworkError, self.shared.write, len, ())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Array-backed propagation engine for the Concept Network.
+
+A SparseNetwork is a read-only snapshot of a ConceptNetwork, where the
+graph is kept in a compressed sparse row layout: nodes get integer ids,
+and the outgoing links of node i are the entries rowStart[i] to
+rowStart[i+1] of the column (destination node id) and weight arrays.
+
+It gives the same activation values as
+ConceptNetwork.fastPropagateActivations, but only the rows of the nodes
+having an old activation value are walked. As in fastPropagateActivations,
+every node having incoming links is still updated at each propagation (it
+gets 0.5 of influence per incoming link), so that a propagation remains
+linear in the number of nodes.
+"""
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+from array import array
+from math import log, exp
+
+from ConceptNetwork import ConceptNetworkUnknownNode
+
+NO_LABEL = -1
+UNKNOWN_DECAY = -1
+
+
+class SparseNetwork:
+    """A compressed sparse row view of a ConceptNetwork.
+
+    The snapshot is taken when the SparseNetwork is built: nodes or links
+    added to the ConceptNetwork afterwards are not seen, the SparseNetwork
+    has to be built again.
+    """
+    # - self.key is the list of the nodes' id (symbol, type), indexed by
+    #   the integer node id
+    # - self.index is a dictionary which associates a node id
+    #   (symbol, type) to its integer id
+    # - self.decay is the decay rate of each node (UNKNOWN_DECAY for the
+    #   nodes which are only known as the destination or the label of a
+    #   link), and self.occ its occurrence
+    # - self.rowStart, self.column, self.weight, self.coOcc and self.label
+    #   are the compressed sparse rows of the outgoing links.
+    #   self.label holds an index in self.labelSymbol and self.labelNode,
+    #   or NO_LABEL.
+    # - self.nbIncomings is the number of links coming to each node
+    # - self.influenced is the list of the nodes ids receiving influence
+    def __init__(self, cn):
+        self.key = []
+        self.index = {}
+        self.decay = array('l')
+        self.occ = array('l')
+        self.rowStart = array('l', [0])
+        self.column = array('l')
+        self.weight = array('d')
+        self.coOcc = array('l')
+        self.label = array('l')
+        self.labelSymbol = []
+        self.labelNode = array('l')
+        self.nbIncomings = array('l')
+        self.__build(cn)
+
+    def __addKey(self, key, decay, occ=0):
+        "Give an integer id to the node id key"
+        self.index[key] = len(self.key)
+        self.key.append(key)
+        self.decay.append(decay)
+        self.occ.append(occ)
+        self.nbIncomings.append(0)
+
+    def __build(self, cn):
+        "Fill the arrays from the nodes and links of cn"
+        labelIndex = {}         # label id      -> index in labelSymbol
+        for key, node in cn.node.iteritems():
+            self.__addKey(key, node.getDecay(), node.getOcc())
+        # Nodes which are the destination or the label of a link, but were
+        # never added to the Concept Network
+        for (symbol, typeName), node in cn.node.iteritems():
+            for link in node.outgoingLinks:
+                for linkNode in (link.getNodeTo(), link.getNodeLabel()):
+                    if not linkNode:
+                        continue
+                    key = (linkNode.getSymbol(), linkNode.getTypeName())
+                    if key not in self.index:
+                        self.__addKey(key, UNKNOWN_DECAY)
+
+        for i in xrange(len(cn.node)):
+            symbol, typeName = self.key[i]
+            node = cn.node[(symbol, typeName)]
+            # Nodes without symbol don't propagate their activation
+            if symbol:
+                for link in node.outgoingLinks:
+                    nodeTo = link.getNodeTo()
+                    j = self.index[(nodeTo.getSymbol(), nodeTo.getTypeName())]
+                    self.column.append(j)
+                    self.weight.append(link.getWeight())
+                    self.coOcc.append(link.getCoOcc())
+                    self.nbIncomings[j] += 1
+                    nodeLabel = link.getNodeLabel()
+                    if nodeLabel:
+                        labelKey = (nodeLabel.getSymbol(), nodeLabel.getTypeName())
+                        if labelKey not in labelIndex:
+                            labelIndex[labelKey] = len(self.labelSymbol)
+                            self.labelSymbol.append(labelKey[0])
+                            self.labelNode.append(self.index[labelKey])
+                        self.label.append(labelIndex[labelKey])
+                    else:
+                        self.label.append(NO_LABEL)
+            self.rowStart.append(len(self.column))
+        # Nodes only known as destinations have no outgoing links
+        for i in xrange(len(cn.node), len(self.key)):
+            self.rowStart.append(len(self.column))
+        # Nodes of the Concept Network receiving influence are always
+        # updated (even when no activated node is linked to them)
+        self.influenced = array('l', [j for j in xrange(len(cn.node))
+                                      if self.nbIncomings[j] and self.key[j][0]])
+
+    def findNodeId(self, key):
+        """Get the integer id of the node which id (symbol, type) is given
+
+        Return None when the node is unknown"""
+        return self.index.get(key)
+
+    def getNodeKey(self, i):
+        "Get the node id (symbol, type) of the integer id i"
+        return self.key[i]
+
+    def getNodeId(self, symbol, type="basic"):
+        """Get the integer id of the node which symbol and type are given
+
+        str symbol: symbol of the node
+        str type:   name of the wanted type"""
+        i = self.findNodeId((symbol, type))
+        if i is None:
+            raise ConceptNetworkUnknownNode("Unknown node: \"" + symbol + "\" (" + type + ")")
+        return i
+
+    def getNbNodes(self):
+        "Get the number of nodes (including the nodes only linked to)"
+        return len(self.decay)
+
+    def getNbLinks(self):
+        "Get the number of links"
+        return len(self.column)
+
+    def getOldActivationVector(self, state):
+        """Get the old activation values of state, indexed by node id
+
+        Return a list, where non-activated nodes are 0"""
+        vector = [0] * self.getNbNodes()
+        for key, nodeState in state.nodeState.iteritems():
+            i = self.findNodeId(key)
+            if i is not None:
+                vector[i] = nodeState.getOldActivationValue()
+        return vector
+
+    def getLabelVector(self, state):
+        """Get the activation values of the labels in state.
+
+        Like Link.getWeight, the labels are looked for with their type."""
+        vector = []
+        for i in self.labelNode:
+            nodeState = state.nodeState.get(self.getNodeKey(i))
+            vector += [nodeState and nodeState.getActivationValue() or 0]
+        return vector
+
+    def getActivatedRows(self, state):
+        """Get the sorted integer ids of the nodes of state having an old
+        activation value (the rows walked by getInfluenceVector)"""
+        rows = []
+        for key, nodeState in state.nodeState.iteritems():
+            i = self.findNodeId(key)
+            if i is not None and nodeState.getOldActivationValue():
+                rows.append(i)
+        rows.sort()
+        return rows
+
+    def getInfluenceVector(self, oldAV, labelAV, rows=None):
+        """Compute the influence coming to each node.
+
+        This is the sparse matrix-vector product of the transposed link
+        weights by the old activation values, plus 0.5 for each incoming
+        link.
+        Only the rows of the activated nodes are walked.
+
+        oldAV:   old activation value of each node
+        labelAV: activation value of each label
+        rows:    sorted ids of the nodes having an old activation value
+                 (see getActivatedRows), looked for in oldAV when not given
+
+        Return a list of the influences, indexed by node id"""
+        influence = [0.5 * nb for nb in self.nbIncomings]
+        rowStart = self.rowStart
+        column = self.column
+        weight = self.weight
+        label = self.label
+        if rows is None:
+            rows = [i for i, ov in enumerate(oldAV) if ov]
+        for i in rows:
+            ov = oldAV[i]
+            for k in xrange(rowStart[i], rowStart[i + 1]):
+                w = weight[k]
+                if label[k] != NO_LABEL:
+                    w += (1 - w) * labelAV[label[k]] / 100
+                influence[column[k]] += ov * w
+        return influence
+
+    def fastPropagateActivations(self, state,
+                                 normalNumberComingLinks=2,
+                                 memoryPerf=100):
+        """Propagates activation values within state.
+
+        Same as ConceptNetwork.fastPropagateActivations, on the arrays.
+
+        state: in which activation values are found and changed
+        normalNumberComingLinks "normal" number of links for the
+                            whole influence to be taken into account
+        memoryPerf: memory performance (the higher, the better)
+
+        Return a tuple (number of nodes updated, number of links
+        traversed)"""
+        for nodeState in state.nodeState.itervalues():
+            nodeState.ageActivationValues()
+
+        oldAV = self.getOldActivationVector(state)
+        rows = self.getActivatedRows(state)
+        influence = self.getInfluenceVector(oldAV, self.getLabelVector(state),
+                                            rows)
+
+        # Nodes to update: the ones of the state, and the influenced ones
+        ids = set(self.influenced)
+        for key in state.nodeState:
+            j = self.findNodeId(key)
+            if j is None or self.decay[j] == UNKNOWN_DECAY:
+                raise ConceptNetworkUnknownNode("Unknown node: \"%s\" (%s)" % key)
+            ids.add(j)
+        ids = sorted(ids)
+        nodeStates = [state.getNodeState(*self.getNodeKey(j)) for j in ids]
+
+        # Normalisation of the influence, decay, and age terms
+        logNormal = log(normalNumberComingLinks)
+        norm = [log(normalNumberComingLinks + self.nbIncomings[j]) / logNormal
+                for j in ids]
+        decayed = [oldAV[j] - self.decay[j] * oldAV[j] / 100 for j in ids]
+        minusAge = [200 / (1 + exp(-nodeState.getAge() / memoryPerf)) - 100
+                    for nodeState in nodeStates]
+        newAV = [d + (influence[j] / n if self.nbIncomings[j] else 0) - m
+                 for j, d, n, m in zip(ids, decayed, norm, minusAge)]
+
+        for j, nodeState, av in zip(ids, nodeStates, newAV):
+            symbol, typeName = self.getNodeKey(j)
+            state.setNodeStateActivationValue(nodeState, min(max(av, 0), 100),
+                                              symbol, typeName)
+        rowStart = self.rowStart
+        return len(ids), sum([rowStart[i + 1] - rowStart[i] for i in rows])
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Unit test for SparseNetwork.py
+"""
+
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+from SparseNetwork import *
+from ConceptNetwork import *
+from Ector import Ector
+import copy
+import random
+import unittest
+
+
+def randomNetwork(nbNodes, nbLinks, seed=1):
+    "Build a Concept Network with random (and some labeled) links"
+    rnd = random.Random(seed)
+    cn = ConceptNetwork()
+    nodes = [Node("n%d" % i) for i in range(nbNodes)]
+    for node in nodes:
+        cn.addNode(node)
+    for _ in range(nbLinks):
+        nodeFrom = rnd.choice(nodes)
+        nodeTo = rnd.choice(nodes)
+        nodeLabel = rnd.random() < 0.1 and rnd.choice(nodes) or None
+        cn.addLink(nodeFrom, nodeTo, nodeLabel)
+    return cn
+
+
+class SparseNetworkTest(unittest.TestCase):
+    "Test the SparseNetwork class"
+    def assertSameStates(self, state1, state2):
+        "Compare the activation values of two states"
+        for key in set(state1.nodeState) | set(state2.nodeState):
+            av1 = state1.getNodeActivationValue(*key)
+            av2 = state2.getNodeActivationValue(*key)
+            self.assertAlmostEqual(av1, av2, 7)
+
+    def testBuild(self):
+        "Nodes and links are in the arrays"
+        cn = randomNetwork(10, 30)
+        sparse = SparseNetwork(cn)
+        self.assertEqual(10, sparse.getNbNodes())
+        self.assertEqual(sum([len(node.outgoingLinks)
+                              for node in cn.node.values()]),
+                         sparse.getNbLinks())
+        self.assertEqual(("n3", "basic"),
+                         sparse.key[sparse.getNodeId("n3")])
+        self.assertRaises(ConceptNetworkUnknownNode, sparse.getNodeId, "Nimp")
+
+    def testSamePropagation(self):
+        "The propagation gives the same values as fastPropagateActivations"
+        cn = randomNetwork(50, 300)
+        sparse = SparseNetwork(cn)
+        state = State(1)
+        for i in range(0, 50, 7):
+            state.setNodeActivationValue(100, "n%d" % i)
+        sparseState = copy.deepcopy(state)
+        for _ in range(3):
+            cn.fastPropagateActivations(state)
+            sparse.fastPropagateActivations(sparseState)
+            self.assertSameStates(state, sparseState)
+
+    def testSameEctorPropagation(self):
+        "The propagation of an Ector gives the same values"
+        ector = Ector()
+        ector.addEntry("Hello, how do you do? I do fine.")
+        ector.addEntry("Hello you.")
+        state = ector.cn.getState(ector.username)
+        sparseState = copy.deepcopy(state)
+        sparse = SparseNetwork(ector.cn)
+        for _ in range(2):
+            ector.cn.fastPropagateActivations(state)
+            sparse.fastPropagateActivations(sparseState)
+        self.assertSameStates(state, sparseState)
+
+    def testActivatedRows(self):
+        """Only the rows of the activated nodes are walked, giving the same
+        influences as a walk of the whole vector"""
+        cn = randomNetwork(50, 300)
+        sparse = SparseNetwork(cn)
+        state = State(1)
+        for i in (3, 40, 17):
+            state.setNodeActivationValue(100, "n%d" % i)
+            state.getNodeState("n%d" % i).ageActivationValues()
+        state.setNodeActivationValue(0, "n5")
+        rows = sparse.getActivatedRows(state)
+        self.assertEqual(sorted([sparse.getNodeId("n%d" % i)
+                                 for i in (3, 40, 17)]), rows)
+        oldAV = sparse.getOldActivationVector(state)
+        labelAV = sparse.getLabelVector(state)
+        self.assertEqual(sparse.getInfluenceVector(oldAV, labelAV),
+                         sparse.getInfluenceVector(oldAV, labelAV, rows))
+        nbLinks = sum([len(cn.getNode("n%d" % i).outgoingLinks)
+                       for i in (3, 40, 17)])
+        self.assertEqual(nbLinks, sparse.fastPropagateActivations(state)[1])
+
+    def testUnknownStateNode(self):
+        "A node of the state which is not in the network raises an exception"
+        sparse = SparseNetwork(randomNetwork(5, 5))
+        state = State(1)
+        state.setNodeActivationValue(100, "Nimp")
+        self.assertRaises(ConceptNetworkUnknownNode,
+                          sparse.fastPropagateActivations, state)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Loading of the users' States on demand.
+
+Ector loads the State of its user in the Concept Network, and keeps it.
+With thousands of users, a StateManager keeps only the States of the
+users most recently used in the Concept Network (at most capacity), and
+loads the others from their files (username_state.pkl) when needed.
+
+The States evicted are written back to their files by a background
+thread, when they were used since they were loaded or saved.
+"""
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+from ConceptNetwork import SparseState, CompactConceptNetwork, compactState
+from ConceptNetwork import ConceptNetworkError
+from collections import OrderedDict
+import Queue
+import os
+import pickle
+import threading
+
+PROTOCOL = 2
+
+
+class StateManagerBadStateId(ConceptNetworkError):
+    "The id of a state can not name its file"
+    pass
+
+
+def isValidStateId(stateId):
+    """Tell whether stateId can name the file of a state: a non empty
+    name, without path separator, .. or NUL (it may come from the network)"""
+    if not isinstance(stateId, basestring) or not stateId:
+        return False
+    for forbidden in ("/", "\\", "..", "\0"):
+        if forbidden in stateId:
+            return False
+    return True
+
+
+def getStateFilename(stateId, directory=None):
+    "Get the name of the file of the state stateId (a username)"
+    if not isValidStateId(stateId):
+        raise StateManagerBadStateId("Bad state id: %r" % (stateId,))
+    filename = stateId + "_state.pkl"
+    if directory:
+        filename = os.path.join(directory, filename)
+    return filename
+
+
+def loadState(stateId, cn, filename=None, data=None):
+    """Load the state stateId, for the Concept Network cn.
+
+    filename: file of the state (a new state is created when it does not
+              exist)
+    data:     pickle of the state, instead of filename
+
+    Return a SparseState (compact when cn is a CompactConceptNetwork)"""
+    if data is not None:
+        state = pickle.loads(data)
+    elif filename and os.path.exists(filename):
+        f = open(filename, "rb")
+        state = pickle.load(f)
+        f.close()
+    else:
+        state = SparseState(stateId)
+    if not isinstance(state, SparseState):
+        state = SparseState.fromState(state)
+    if isinstance(cn, CompactConceptNetwork):
+        compactState(state)
+    return state
+
+
+def writeState(filename, data):
+    "Write the pickle of a state in its file (through a temporary file)"
+    f = open(filename + ".tmp", "wb")
+    f.write(data)
+    f.close()
+    os.rename(filename + ".tmp", filename)
+
+
+class StateManager:
+    """The States of a Concept Network, loaded on demand (see the module).
+
+    The States in use are acquired, so that they are not evicted until
+    they are released. The States got through getState may be evicted by
+    the next acquisition of another State."""
+    def __init__(self, cn, capacity=1000, directory=None):
+        """capacity:  number of States kept in the Concept Network
+        directory: directory of the States' files (default: current one)"""
+        self.cn = cn
+        self.capacity = capacity
+        self.directory = directory
+        self.lock = threading.RLock()
+        self.writing = threading.Lock() # held while a file is written
+        self.recent = OrderedDict()     # state id -> None, least recent first
+        self.users = {}                 # state id -> number of acquisitions
+        self.dirty = set()              # state ids used since their save
+        self.pending = {}               # state id -> pickle being written
+        self.queue = Queue.Queue()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writes = 0
+        self.errors = 0
+        self.writer = threading.Thread(target=self.writeStates)
+        self.writer.setDaemon(True)
+        self.writer.start()
+        for stateId in cn.state:
+            self.recent[stateId] = None
+
+    def getFilename(self, stateId):
+        return getStateFilename(stateId, self.directory)
+
+    def acquire(self, stateId):
+        """Get the state stateId, loading it when needed, and keep it in
+        the Concept Network until it is released
+
+        Return the state"""
+        self.lock.acquire()
+        try:
+            state = self.getState(stateId)
+            self.users[stateId] = self.users.get(stateId, 0) + 1
+            return state
+        finally:
+            self.lock.release()
+
+    def release(self, stateId):
+        "Release the state stateId (see acquire)"
+        self.lock.acquire()
+        try:
+            self.users[stateId] -= 1
+            if not self.users[stateId]:
+                del self.users[stateId]
+        finally:
+            self.lock.release()
+
+    def getState(self, stateId):
+        """Get the state stateId, loading it when needed (which may evict
+        the least recently used states)
+
+        Return the state"""
+        self.lock.acquire()
+        try:
+            if stateId in self.recent:
+                self.hits += 1
+                del self.recent[stateId]
+                state = self.cn.getState(stateId)
+            else:
+                self.misses += 1
+                state = loadState(stateId, self.cn,
+                                  self.getFilename(stateId),
+                                  self.pending.get(stateId))
+                self.cn.addState(state)
+            self.recent[stateId] = None
+            self.dirty.add(stateId)
+            self.evict(stateId)
+            return state
+        finally:
+            self.lock.release()
+
+    def evict(self, keep=None):
+        """Evict the least recently used states which are not acquired
+        (except the state keep)"""
+        if len(self.recent) <= self.capacity:
+            return
+        for stateId in list(self.recent):
+            if stateId not in self.users and stateId != keep:
+                self.remove(stateId)
+                self.evictions += 1
+                if len(self.recent) <= self.capacity:
+                    break
+
+    def remove(self, stateId):
+        "Remove the state stateId from the Concept Network, writing it back"
+        state = self.cn.state.pop(stateId)
+        del self.recent[stateId]
+        if stateId in self.dirty:
+            self.dirty.discard(stateId)
+            data = pickle.dumps(state, PROTOCOL)
+            self.pending[stateId] = data
+            self.queue.put((stateId, data))
+
+    def save(self, stateId):
+        """Write the state stateId in its file now
+
+        The state is pickled while the manager is locked, and written once
+        it is unlocked (like the evicted states)"""
+        self.lock.acquire()
+        try:
+            data = self.snapshot(stateId)
+        finally:
+            self.lock.release()
+        self.writePending(stateId, data)
+
+    def flush(self):
+        """Write the states used since their save, and wait for the
+        written back ones"""
+        self.lock.acquire()
+        try:
+            snapshots = [(stateId, self.snapshot(stateId))
+                         for stateId in list(self.dirty)]
+        finally:
+            self.lock.release()
+        for stateId, data in snapshots:
+            self.writePending(stateId, data)
+        self.queue.join()
+
+    def snapshot(self, stateId):
+        """Pickle the state stateId, as its pending pickle (superseding the
+        one written back, if any); self.lock must be held
+
+        Return the pickle"""
+        data = pickle.dumps(self.cn.getState(stateId), PROTOCOL)
+        self.pending[stateId] = data
+        self.dirty.discard(stateId)
+        return data
+
+    def writePending(self, stateId, data):
+        """Write the pickle data of the state stateId in its file, unless a
+        later pickle superseded it
+
+        The files are written one at a time (self.writing), without
+        holding self.lock; a pickle is still pending once the file is
+        written, in order to check that it is not superseded."""
+        self.lock.acquire()
+        try:
+            if self.pending.get(stateId) is not data:
+                return
+        finally:
+            self.lock.release()
+        self.writing.acquire()
+        try:
+            self.lock.acquire()
+            try:
+                if self.pending.get(stateId) is not data:
+                    return
+            finally:
+                self.lock.release()
+            try:
+                writeState(self.getFilename(stateId), data)
+            except EnvironmentError:
+                self.lock.acquire()
+                self.errors += 1
+                self.lock.release()
+                raise
+        finally:
+            self.writing.release()
+        self.lock.acquire()
+        try:
+            self.writes += 1
+            if self.pending.get(stateId) is data:
+                del self.pending[stateId]
+        finally:
+            self.lock.release()
+
+    def writeStates(self):
+        """Write back the evicted states (writer thread)
+
+        A state which could not be written stays pending: it is reloaded
+        from its pickle. A pickle superseded (by a later eviction or save)
+        is not written."""
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    break
+                stateId, data = item
+                try:
+                    self.writePending(stateId, data)
+                except EnvironmentError:
+                    pass
+            finally:
+                self.queue.task_done()
+
+    def close(self):
+        "Write the states used since their save, and stop the writer thread"
+        self.flush()
+        if self.writer:
+            self.queue.put(None)
+            self.writer.join()
+            self.writer = None
+
+    def getStats(self):
+        """Get the statistics of the manager
+
+        Return a dictionary (states, hits, misses, evictions, writes,
+        errors, pending)"""
+        self.lock.acquire()
+        try:
+            return {"states": len(self.recent),
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "writes": self.writes,
+                    "errors": self.errors,
+                    "pending": len(self.pending)}
+        finally:
+            self.lock.release()
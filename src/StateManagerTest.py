@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Unit test for StateManager.py
+
+Test the loading, eviction and writing back of States.
+"""
+
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+
+from StateManager import *
+from ConceptNetwork import ConceptNetwork, Node
+import shutil
+import tempfile
+import threading
+import unittest
+
+
+class StateManagerTest(unittest.TestCase):
+    "Test the StateManager class"
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cn = ConceptNetwork()
+        self.cn.addNode(Node("Hello"))
+        self.states = StateManager(self.cn, 2, self.directory)
+
+    def tearDown(self):
+        self.states.close()
+        shutil.rmtree(self.directory)
+
+    def testLoad(self):
+        """A state is created when it has no file"""
+        state = self.states.getState("Alice")
+        self.assertEqual("Alice", state.id)
+        self.assertTrue(self.cn.getState("Alice") is state)
+        self.states.getState("Alice")
+        stats = self.states.getStats()
+        self.assertEqual(1, stats["misses"])
+        self.assertEqual(1, stats["hits"])
+
+    def testEviction(self):
+        """The least recently used state is evicted, and written back"""
+        self.states.getState("Alice").fullyActivate("Hello")
+        self.states.getState("Bob")
+        self.states.getState("Alice")
+        self.states.getState("Carol")
+        self.assertEqual(["Alice", "Carol"], sorted(self.cn.state))
+        self.states.getState("Dave")
+        self.assertFalse("Alice" in self.cn.state)
+        self.states.flush()
+        self.assertTrue(os.path.exists(self.states.getFilename("Alice")))
+        state = self.states.getState("Alice")
+        self.assertEqual(100, state.getNodeActivationValue("Hello"))
+        stats = self.states.getStats()
+        self.assertEqual(3, stats["evictions"])
+        self.assertEqual(0, stats["pending"])
+
+    def testAcquire(self):
+        """An acquired state is not evicted until it is released"""
+        self.states.acquire("Alice")
+        for username in ("Bob", "Carol", "Dave"):
+            self.states.getState(username)
+        self.assertTrue("Alice" in self.cn.state)
+        self.states.release("Alice")
+        self.states.getState("Eve")
+        self.assertFalse("Alice" in self.cn.state)
+
+    def testPending(self):
+        """A state evicted is reloaded from its pickle before being written"""
+        self.states.getState("Alice").fullyActivate("Hello")
+        self.states.queue.join()
+        self.states.lock.acquire()      # the write back waits
+        try:
+            self.states.getState("Bob")
+            self.states.getState("Carol")
+            self.assertTrue("Alice" in self.states.pending)
+            state = self.states.getState("Alice")
+        finally:
+            self.states.lock.release()
+        self.assertEqual(100, state.getNodeActivationValue("Hello"))
+
+    def testFlushUnlocked(self):
+        """The states are written without locking the manager"""
+        self.states.getState("Alice").fullyActivate("Hello")
+        self.states.writing.acquire()   # the disk is slow
+        try:
+            flush = threading.Thread(target=self.states.flush)
+            flush.start()
+            bob = threading.Thread(target=self.states.getState, args=("Bob",))
+            bob.start()
+            bob.join(2)
+            self.assertFalse(bob.isAlive())
+        finally:
+            self.states.writing.release()
+        flush.join()
+        cn = ConceptNetwork()
+        state = StateManager(cn, 2, self.directory).getState("Alice")
+        self.assertEqual(100, state.getNodeActivationValue("Hello"))
+
+    def testBadStateId(self):
+        """A state id which is not a plain file name is rejected"""
+        for stateId in (u"../Alice", u"/tmp/Alice", u"a\\b", u"a\0b", u""):
+            self.assertFalse(isValidStateId(stateId))
+            self.assertRaises(StateManagerBadStateId,
+                              self.states.getState, stateId)
+        self.assertTrue(isValidStateId(u"Alice Smith"))
+
+    def testSave(self):
+        """A saved state is loaded by a new manager"""
+        self.states.getState("Alice").fullyActivate("Hello")
+        self.states.flush()
+        cn = ConceptNetwork()
+        states = StateManager(cn, 2, self.directory)
+        state = states.getState("Alice")
+        self.assertEqual(100, state.getNodeActivationValue("Hello"))
+
+    def testSaveSupersedesPending(self):
+        """A state saved after its reload is not overwritten by its older
+        pickle written back"""
+        self.states.getState("Alice").fullyActivate("Hello")
+        self.states.queue.join()
+        self.states.lock.acquire()      # the write back waits
+        try:
+            self.states.getState("Bob")
+            self.states.getState("Carol")
+            self.assertTrue("Alice" in self.states.pending)
+            state = self.states.getState("Alice")
+            state.setNodeActivationValue(50, "Hello")
+            self.states.save("Alice")
+            self.assertFalse("Alice" in self.states.pending)
+        finally:
+            self.states.lock.release()
+        self.states.queue.join()
+        cn = ConceptNetwork()
+        states = StateManager(cn, 2, self.directory)
+        state = states.getState("Alice")
+        self.assertEqual(50, state.getNodeActivationValue("Hello"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Cache of the successors and predecessors of the nodes of a type.
+
+Generating a sentence chooses, at each step, among the tokens following
+(or preceding) the last token: a SuccessorCache keeps, for each node,
+the nodes of the same type its outgoing (or incoming) links go to (or
+come from), with their co-occurrences, instead of filtering the links of
+the node at each step.
+
+The cache is a listener of the Concept Network: the entries of the nodes
+of a link added or removed are removed, and rebuilt at their next use.
+Like the WeightCache, it is emptied when it holds more than capacity
+nodes.
+"""
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+import threading
+
+# Several readers of a shared Concept Network may ask for its cache at once
+creationLock = threading.Lock()
+
+
+def getSuccessorCache(cn, typeName="token"):
+    """Get the SuccessorCache of the nodes of type typeName of cn, creating
+    it when cn has none"""
+    creationLock.acquire()
+    try:
+        for listener in cn.listeners:
+            if isinstance(listener, SuccessorCache) and \
+               listener.typeName == typeName:
+                return listener
+        return SuccessorCache(cn, typeName)
+    finally:
+        creationLock.release()
+
+
+class SuccessorCache:
+    """Successors and predecessors of the nodes of a type (see the module).
+
+    They are tuples (nodes, co-occurrences), indexed by the integer id of
+    the node."""
+    def __init__(self, cn, typeName="token", capacity=100000):
+        self.cn = cn
+        self.typeName = typeName
+        self.capacity = capacity
+        self.successors = {}        # node id -> (nodes, co-occurrences)
+        self.predecessors = {}      # node id -> (nodes, co-occurrences)
+        self.hits = 0
+        self.misses = 0
+        cn.addListener(self)
+
+    def getSuccessors(self, node):
+        """Get the nodes of typeName the outgoing links of node go to
+
+        Return a tuple (nodes, co-occurrences)"""
+        nodeId = self.cn.findNodeId(node)
+        if nodeId in self.successors:
+            self.hits += 1
+            return self.successors[nodeId]
+        self.misses += 1
+        links = [link for link in node.outgoingLinks
+                 if link.getNodeTo().getTypeName() == self.typeName]
+        successors = (tuple([link.getNodeTo() for link in links]),
+                      tuple([link.getCoOcc() for link in links]))
+        if nodeId is not None:
+            if len(self.successors) >= self.capacity:
+                self.successors.clear()
+            self.successors[nodeId] = successors
+        return successors
+
+    def getPredecessors(self, node):
+        """Get the nodes of typeName the incoming links of node come from
+
+        Return a tuple (nodes, co-occurrences)"""
+        nodeId = self.cn.findNodeId(node)
+        if nodeId in self.predecessors:
+            self.hits += 1
+            return self.predecessors[nodeId]
+        self.misses += 1
+        links = [link for link in node.incomingLinks
+                 if link.getNodeFrom().getTypeName() == self.typeName]
+        predecessors = (tuple([link.getNodeFrom() for link in links]),
+                        tuple([link.getCoOcc() for link in links]))
+        if nodeId is not None:
+            if len(self.predecessors) >= self.capacity:
+                self.predecessors.clear()
+            self.predecessors[nodeId] = predecessors
+        return predecessors
+
+    def nodeAdded(self, node):
+        "A node added has no new link"
+        pass
+
+    def linkAdded(self, nodeFrom, nodeTo, nodeLabel, coOcc):
+        "Remove the entries of the nodes of the link"
+        self.successors.pop(self.cn.findNodeId(nodeFrom), None)
+        self.predecessors.pop(self.cn.findNodeId(nodeTo), None)
+
+    def nodeRemoved(self, node):
+        "Remove the entries of the node"
+        nodeId = self.cn.findNodeId(node)
+        self.successors.pop(nodeId, None)
+        self.predecessors.pop(nodeId, None)
+
+    def linkRemoved(self, nodeFrom, nodeTo, nodeLabel):
+        "Remove the entries of the nodes of the link"
+        self.successors.pop(self.cn.findNodeId(nodeFrom), None)
+        self.predecessors.pop(self.cn.findNodeId(nodeTo), None)
+
+    def clear(self):
+        "Remove all the entries"
+        self.successors.clear()
+        self.predecessors.clear()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# pyECTOR, learning chatterbot, by François PARMENTIER
+# http://code.google.com/p/pyector/
+# Copyright (C) 2008 François PARMENTIER
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+# François PARMENTIER - parmentierf@users.sourceforge.net
+
+# $Id$
+"""Unit test for SuccessorCache.py
+
+Test the caching of the successors and predecessors of tokens.
+"""
+
+__author__    = "François Parmentier (parmentierf@users.sourceforge.net)"
+__version__   = "$Revision$"
+__date__      = "$Date$"
+__copyright__ = "Copyright (c) 2008 François Parmentier"
+__license__   = "GPL"
+
+
+from SuccessorCache import *
+from ConceptNetwork import ConceptNetwork
+from Ector import TokenNode, SentenceNode
+import threading
+import unittest
+
+
+class SuccessorCacheTest(unittest.TestCase):
+    "Test the SuccessorCache class"
+    def setUp(self):
+        self.cn = ConceptNetwork()
+        self.hello = self.cn.addNode(TokenNode("Hello"))
+        self.you = self.cn.addNode(TokenNode("you"))
+        self.sentence = self.cn.addNode(SentenceNode("Hello you"))
+        self.cn.addLink(self.hello, self.you)
+        self.cn.addBidirectionalLink(self.hello, self.sentence)
+        self.cn.addBidirectionalLink(self.you, self.sentence)
+        self.cache = getSuccessorCache(self.cn)
+
+    def testSuccessors(self):
+        """Only the tokens are successors and predecessors"""
+        self.assertEqual(((self.you,), (1,)),
+                         self.cache.getSuccessors(self.hello))
+        self.assertEqual(((self.hello,), (1,)),
+                         self.cache.getPredecessors(self.you))
+        self.assertEqual(((), ()), self.cache.getSuccessors(self.you))
+
+    def testCached(self):
+        """The successors are computed once"""
+        self.cache.getSuccessors(self.hello)
+        self.cache.getSuccessors(self.hello)
+        self.assertEqual(1, self.cache.misses)
+        self.assertEqual(1, self.cache.hits)
+        self.assertTrue(self.cache is getSuccessorCache(self.cn))
+
+    def testLinkAdded(self):
+        """Adding a link removes the entries of its nodes"""
+        self.cache.getSuccessors(self.hello)
+        self.cache.getPredecessors(self.you)
+        self.cache.getSuccessors(self.you)
+        self.cn.addLink(self.hello, self.you)
+        self.assertEqual(((self.you,), (2,)),
+                         self.cache.getSuccessors(self.hello))
+        self.assertEqual(((self.hello,), (2,)),
+                         self.cache.getPredecessors(self.you))
+        # The successors of you are kept
+        self.cache.getSuccessors(self.you)
+        self.assertEqual(5, self.cache.misses)
+        self.assertEqual(1, self.cache.hits)
+
+    def testRemoved(self):
+        """Removing a link or a node removes the entries of its nodes"""
+        self.cache.getSuccessors(self.hello)
+        self.cache.getPredecessors(self.you)
+        self.cn.removeLink(self.hello, self.you)
+        self.assertEqual(((), ()), self.cache.getSuccessors(self.hello))
+        self.assertEqual(((), ()), self.cache.getPredecessors(self.you))
+        self.cn.addLink(self.hello, self.you)
+        self.cache.getSuccessors(self.hello)
+        self.cn.removeNode(self.you)
+        self.assertEqual(((), ()), self.cache.getSuccessors(self.hello))
+
+    def testCapacity(self):
+        """The cache is emptied when it holds capacity nodes"""
+        self.cache.capacity = 1
+        self.cache.getSuccessors(self.hello)
+        self.cache.getSuccessors(self.you)
+        self.assertEqual(1, len(self.cache.successors))
+        self.cache.getSuccessors(self.you)
+        self.assertEqual(1, self.cache.hits)
+
+    def testConcurrentCreation(self):
+        """Readers asking for the cache at once share one cache"""
+        cn = ConceptNetwork()
+        caches = []
+        threads = [threading.Thread(
+                       target=lambda: caches.append(getSuccessorCache(cn)))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, len([listener for listener in cn.listeners
+                                 if isinstance(listener, SuccessorCache)]))
+        self.assertEqual(1, len(set([id(cache) for cache in caches])))
+
+
+if __name__ == "__main__":
+    unittest.main()